@@ -70,7 +70,11 @@ class LensReminderAdmin(ModelAdmin):
     list_filter = ("lens_type", "is_active")
     search_fields = ("user__email", "name")
     raw_id_fields = ("user",)
-    readonly_fields = ("created_at", "updated_at", "replacement_date", "days_until_replacement", "status")
+    list_select_related = ("user",)
+    readonly_fields = (
+        "created_at", "updated_at", "replacement_date", "remind_on",
+        "days_until_replacement", "status", "reminded_for", "reminded_at",
+    )
 
     fieldsets = (
         ("Основное", {
@@ -80,7 +84,10 @@ class LensReminderAdmin(ModelAdmin):
             "fields": ("lens_type", "custom_days", "start_date", "notify_days_before")
         }),
         ("Статус", {
-            "fields": ("replacement_date", "days_until_replacement", "status"),
+            "fields": (
+                "replacement_date", "remind_on", "days_until_replacement", "status",
+                "reminded_for", "reminded_at",
+            ),
             "classes": ("collapse",)
         }),
         ("Дополнительно", {
@@ -0,0 +1,99 @@
+"""
+JWT-аутентификация с кэшем пользователя.
+
+Стандартный JWTAuthentication загружает пользователя из БД на каждый
+запрос. CachedJWTAuthentication хранит его в кэше Django на
+AUTH_USER_CACHE_TTL секунд по ключу (id пользователя, версия).
+
+Версия хранится в кэше отдельно и увеличивается invalidate_user_cache()
+после коммита транзакции: при сохранении и удалении пользователя (смена
+пароля, is_active, is_staff и т.д., см. User.save и UserQuerySet.update)
+и при выходе (LogoutView). Старые записи после этого не читаются
+и истекают сами.
+
+Хэш пароля в кэш не попадает: у закэшированного пользователя поле password
+отложенное (читается из БД при обращении и не перезаписывается save()),
+а для CHECK_REVOKE_TOKEN рядом хранится только его md5, как в токене.
+
+Сброс виден всем процессам только при общем кэше (REDIS_URL). С кэшем
+в памяти процесса другие воркеры отдают прежнего пользователя до
+истечения TTL, поэтому без REDIS_URL TTL по умолчанию короче (см. settings).
+"""
+import copy
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def _version_key(user_id) -> str:
+    return f"auth:user:{user_id}:version"
+
+
+def user_cache_key(user_id) -> str:
+    """Ключ кэша пользователя с текущей версией"""
+    version = cache.get(_version_key(user_id), 0)
+    return f"auth:user:{user_id}:v{version}"
+
+
+def _bump_versions(user_ids):
+    for user_id in user_ids:
+        key = _version_key(user_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Версии ещё нет в кэше (или она вытеснена)
+            cache.set(key, 1, None)
+
+
+def invalidate_user_cache(*user_ids):
+    """
+    Сбрасывает кэш пользователей после коммита текущей транзакции.
+    Сброс до коммита не помогает: параллельный запрос успел бы
+    закэшировать ещё не изменённую строку.
+    """
+    if user_ids:
+        transaction.on_commit(lambda: _bump_versions(user_ids))
+
+
+def _cache_entry(user) -> tuple:
+    """(пользователь без хэша пароля, md5 хэша для CHECK_REVOKE_TOKEN)"""
+    cached = copy.copy(user)
+    cached.__dict__.pop("password", None)
+    digest = get_md5_hash_password(user.password) if api_settings.CHECK_REVOKE_TOKEN else ""
+    return cached, digest
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication, который берёт пользователя из кэша"""
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        key = user_cache_key(user_id)
+        entry = cache.get(key)
+        if entry is None:
+            user = super().get_user(validated_token)
+            cache.set(key, _cache_entry(user), settings.AUTH_USER_CACHE_TTL)
+            return user
+
+        user, password_digest = entry
+
+        # Те же проверки, что в JWTAuthentication.get_user, без запроса к БД
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != password_digest:
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
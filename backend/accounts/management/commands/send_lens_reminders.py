@@ -0,0 +1,61 @@
+"""
+Команда для рассылки напоминаний о замене линз.
+
+Выбирает напоминания, для которых наступил срок «Напоминать за»,
+и ставит письма в очередь outbox пачками. Каждое напоминание
+отмечается отправленным для текущей даты замены, поэтому команду
+можно запускать сколько угодно раз в день (например, из cron):
+повторных писем не будет. Письма отправляет run_outbox.
+
+Использование:
+    python manage.py send_lens_reminders
+    python manage.py send_lens_reminders --dry-run
+
+Опции:
+    --batch-size N      Количество напоминаний за одну транзакцию
+    --overdue-days N    Не напоминать о заменах, просроченных больше чем на N дней
+    --dry-run           Показать напоминания без отправки
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from accounts.reminders import OVERDUE_DAYS, due_reminders, send_due_reminders
+
+
+class Command(BaseCommand):
+    help = 'Рассылка напоминаний о замене линз'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Количество напоминаний за одну транзакцию (по умолчанию 200)',
+        )
+        parser.add_argument(
+            '--overdue-days',
+            type=int,
+            default=OVERDUE_DAYS,
+            help=f'Не напоминать о заменах, просроченных больше чем на N дней (по умолчанию {OVERDUE_DAYS})',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Показать напоминания без отправки',
+        )
+
+    def handle(self, *args, **options):
+        overdue_days = max(0, options['overdue_days'])
+
+        if options['dry_run']:
+            today = timezone.localdate()
+            reminders = due_reminders(today, overdue_days)
+            for reminder in reminders:
+                self.stdout.write(
+                    f'  {reminder.user.email}: {reminder.name}, замена {reminder.replacement_date:%d.%m.%Y}'
+                )
+            self.stdout.write(f'Напоминаний к отправке: {len(reminders)}')
+            return
+
+        total = send_due_reminders(max(1, options['batch_size']), overdue_days)
+        self.stdout.write(self.style.SUCCESS(f'Писем поставлено в очередь: {total}'))
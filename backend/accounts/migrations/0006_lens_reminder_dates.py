@@ -0,0 +1,72 @@
+# Generated by Django 6.0.1 on 2026-10-18 23:40
+
+from datetime import timedelta
+
+from django.db import migrations, models
+
+TYPE_DAYS = {
+    'daily': 1,
+    'weekly': 7,
+    'biweekly': 14,
+    'monthly': 30,
+    'quarterly': 90,
+}
+
+
+def fill_replacement_dates(apps, schema_editor):
+    """Дата замены и начало напоминаний для существующих напоминаний"""
+    LensReminder = apps.get_model('accounts', 'LensReminder')
+    reminders = list(LensReminder.objects.all())
+    for reminder in reminders:
+        if reminder.lens_type == 'custom':
+            days = reminder.custom_days or 30
+        else:
+            days = TYPE_DAYS.get(reminder.lens_type, 30)
+        reminder.replacement_date = reminder.start_date + timedelta(days=days)
+        reminder.remind_on = reminder.replacement_date - timedelta(days=reminder.notify_days_before)
+    LensReminder.objects.bulk_update(reminders, ['replacement_date', 'remind_on'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_add_lens_reminder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lensreminder',
+            name='replacement_date',
+            field=models.DateField(editable=False, null=True, verbose_name='Дата замены'),
+        ),
+        migrations.AddField(
+            model_name='lensreminder',
+            name='remind_on',
+            field=models.DateField(editable=False, help_text='Дата замены минус «Напоминать за»', null=True, verbose_name='Напомнить с'),
+        ),
+        migrations.AddField(
+            model_name='lensreminder',
+            name='reminded_for',
+            field=models.DateField(blank=True, editable=False, help_text='Дата замены, о которой уже отправлено письмо', null=True, verbose_name='Напоминание отправлено для замены'),
+        ),
+        migrations.AddField(
+            model_name='lensreminder',
+            name='reminded_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Напоминание отправлено'),
+        ),
+        migrations.RunPython(fill_replacement_dates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='lensreminder',
+            name='replacement_date',
+            field=models.DateField(editable=False, verbose_name='Дата замены'),
+        ),
+        migrations.AlterField(
+            model_name='lensreminder',
+            name='remind_on',
+            field=models.DateField(editable=False, help_text='Дата замены минус «Напоминать за»', verbose_name='Напомнить с'),
+        ),
+        migrations.AddIndex(
+            model_name='lensreminder',
+            index=models.Index(fields=['is_active', 'remind_on'], name='lens_reminder_due_idx'),
+        ),
+    ]
@@ -6,7 +6,30 @@ from django.utils import timezone
 from django.contrib.auth.base_user import BaseUserManager
 
 
-class UserManager(BaseUserManager):
+class UserQuerySet(models.QuerySet):
+    """
+    Массовые изменения идут в обход User.save()/delete(), поэтому
+    кэш аутентификации затронутых пользователей сбрасывается здесь
+    """
+
+    def update(self, **kwargs):
+        if set(kwargs) <= {"last_login"}:
+            return super().update(**kwargs)
+        from .authentication import invalidate_user_cache
+        user_ids = list(self.values_list("pk", flat=True))
+        updated = super().update(**kwargs)
+        invalidate_user_cache(*user_ids)
+        return updated
+
+    def delete(self):
+        from .authentication import invalidate_user_cache
+        user_ids = list(self.values_list("pk", flat=True))
+        result = super().delete()
+        invalidate_user_cache(*user_ids)
+        return result
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
     def create_user(self, email: str, password: str | None = None, **extra_fields):
         if not email:
             raise ValueError("Email is required")
@@ -49,6 +72,21 @@ class User(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return self.email
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Вход (UPDATE_LAST_LOGIN) меняет только last_login - кэш не сбрасываем
+        update_fields = kwargs.get("update_fields")
+        if self.pk and not (update_fields and set(update_fields) <= {"last_login"}):
+            from .authentication import invalidate_user_cache
+            invalidate_user_cache(self.pk)
+
+    def delete(self, *args, **kwargs):
+        user_id = self.pk
+        result = super().delete(*args, **kwargs)
+        from .authentication import invalidate_user_cache
+        invalidate_user_cache(user_id)
+        return result
+
     def get_full_name(self):
         return f"{self.first_name} {self.last_name}".strip() or self.email
 
@@ -403,6 +441,22 @@ class LensReminder(models.Model):
         blank=True
     )
 
+    # Вычисляются в save() из срока ношения, чтобы фильтровать в БД
+    replacement_date = models.DateField("Дата замены", editable=False)
+    remind_on = models.DateField(
+        "Напомнить с",
+        editable=False,
+        help_text="Дата замены минус «Напоминать за»"
+    )
+    reminded_for = models.DateField(
+        "Напоминание отправлено для замены",
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Дата замены, о которой уже отправлено письмо"
+    )
+    reminded_at = models.DateTimeField("Напоминание отправлено", null=True, blank=True, editable=False)
+
     created_at = models.DateTimeField("Создано", auto_now_add=True)
     updated_at = models.DateTimeField("Обновлено", auto_now=True)
 
@@ -410,10 +464,21 @@ class LensReminder(models.Model):
         verbose_name = "Напоминание о замене линз"
         verbose_name_plural = "Напоминания о замене линз"
         ordering = ["start_date"]
+        indexes = [
+            models.Index(fields=["is_active", "remind_on"], name="lens_reminder_due_idx"),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.user.email}"
 
+    def save(self, *args, **kwargs):
+        self.replacement_date = self.start_date + timedelta(days=self.replacement_days)
+        self.remind_on = self.replacement_date - timedelta(days=self.notify_days_before)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "replacement_date", "remind_on"}
+        super().save(*args, **kwargs)
+
     @property
     def replacement_days(self):
         """Количество дней до замены"""
@@ -421,15 +486,10 @@ class LensReminder(models.Model):
             return self.custom_days or 30
         return self.TYPE_DAYS.get(self.lens_type, 30)
 
-    @property
-    def replacement_date(self):
-        """Дата замены линз"""
-        return self.start_date + timedelta(days=self.replacement_days)
-
     @property
     def days_until_replacement(self):
         """Дней до замены"""
-        today = timezone.now().date()
+        today = timezone.localdate()
         delta = self.replacement_date - today
         return delta.days
 
@@ -459,5 +519,5 @@ class LensReminder(models.Model):
 
     def renew(self, new_start_date=None):
         """Обновить напоминание (начать новый период)"""
-        self.start_date = new_start_date or timezone.now().date()
+        self.start_date = new_start_date or timezone.localdate()
         self.save(update_fields=["start_date", "updated_at"])
@@ -0,0 +1,103 @@
+"""
+Рассылка напоминаний о замене линз.
+
+Напоминания, для которых наступила дата remind_on (дата замены минус
+«Напоминать за»), выбираются пачкой одним запросом и блокируются
+(SKIP LOCKED). Письма пачки ставятся в очередь outbox одним INSERT
+в той же транзакции, в которой напоминания отмечаются отправленными
+(reminded_for = replacement_date): повторный запуск не отправит письмо
+о той же замене ещё раз, а после продления срока напоминание снова
+станет актуальным. Письма отправляет run_outbox через одно
+SMTP-соединение на пачку.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
+from django.db.models import F, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from outbox.emails import enqueue_emails
+
+from .models import LensReminder
+
+logger = logging.getLogger("emails")
+
+# Не напоминать о заменах, просроченных больше чем на столько дней
+OVERDUE_DAYS = 7
+
+
+def due_reminders(today=None, overdue_days: int = OVERDUE_DAYS):
+    """Напоминания, о которых пора написать и ещё не написали"""
+    today = today or timezone.localdate()
+    return (
+        LensReminder.objects
+        .filter(
+            is_active=True,
+            remind_on__lte=today,
+            replacement_date__gte=today - timedelta(days=overdue_days),
+            user__is_active=True,
+        )
+        .filter(Q(reminded_for__isnull=True) | ~Q(reminded_for=F("replacement_date")))
+        .exclude(user__email="")
+        .select_related("user")
+        .order_by("remind_on", "id")
+    )
+
+
+def build_reminder_email(reminder, today) -> EmailMultiAlternatives:
+    days = (reminder.replacement_date - today).days
+    if days > 0:
+        subject = f"Через {days} дн. пора заменить линзы «{reminder.name}» — OpticPlace"
+    elif days == 0:
+        subject = f"Сегодня пора заменить линзы «{reminder.name}» — OpticPlace"
+    else:
+        subject = f"Пора заменить линзы «{reminder.name}» — OpticPlace"
+
+    site = (getattr(settings, "SITE_URL", "") or "").rstrip("/")
+    ctx = {
+        "site_name": "OpticPlace",
+        "reminder": reminder,
+        "name": reminder.user.first_name,
+        "days": days,
+        "overdue_days": -days,
+        "reminders_url": f"{site}/lens-reminders" if site else "",
+        "catalog_url": f"{site}/catalog" if site else "",
+        "support_email": getattr(settings, "SUPPORT_EMAIL", "info@opticplace.ru"),
+        "support_phone": getattr(settings, "SUPPORT_PHONE", "+7 (495) 123-45-67"),
+    }
+    msg = EmailMultiAlternatives(
+        subject=subject,
+        body=render_to_string("emails/lens_reminder.txt", ctx).strip(),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[reminder.user.email],
+        reply_to=[getattr(settings, "SUPPORT_EMAIL", "info@opticplace.ru")],
+    )
+    msg.attach_alternative(render_to_string("emails/lens_reminder.html", ctx).strip(), "text/html")
+    return msg
+
+
+def send_due_reminders(batch_size: int = 200, overdue_days: int = OVERDUE_DAYS) -> int:
+    """Ставит в очередь письма по всем актуальным напоминаниям. Возвращает их количество"""
+    today = timezone.localdate()
+    total = 0
+    while True:
+        with transaction.atomic():
+            reminders = list(
+                due_reminders(today, overdue_days)
+                .select_for_update(skip_locked=True, of=("self",))[:batch_size]
+            )
+            if not reminders:
+                break
+
+            enqueue_emails([build_reminder_email(r, today) for r in reminders], kind="lens_reminder")
+            LensReminder.objects.filter(pk__in=[r.pk for r in reminders]).update(
+                reminded_for=F("replacement_date"),
+                reminded_at=timezone.now(),
+            )
+        total += len(reminders)
+        logger.info("Lens reminders queued: %s", len(reminders))
+    return total
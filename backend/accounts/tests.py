@@ -1,3 +1,79 @@
+import pickle
+
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .authentication import user_cache_key
+from .models import User
+
+ME_URL = "/api/auth/me/"
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    """Кэш пользователя JWT-аутентификации и его сброс"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("buyer@example.com", "secret-password-1")
+        self.api = APIClient()
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+    def me(self):
+        return self.api.get(ME_URL)
+
+    def test_cached_user_served_without_query(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.me()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.me().status_code, 200)
+
+    def test_deactivation_applied_after_commit(self):
+        self.me()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.is_active = False
+            self.user.save()
+            # До коммита кэш не сброшен
+            self.assertEqual(self.me().status_code, 200)
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.me().status_code, 401)
+
+    def test_queryset_update_invalidates(self):
+        self.me()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
+
+        self.assertEqual(self.me().status_code, 401)
+
+    def test_queryset_delete_invalidates(self):
+        self.me()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).delete()
+
+        self.assertEqual(self.me().status_code, 401)
+
+    def test_password_hash_not_cached(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.me()
+
+        entry = cache.get(user_cache_key(self.user.pk))
+        self.assertNotIn(self.user.password.encode(), pickle.dumps(entry))
+
+    def test_cached_user_save_keeps_password(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.me()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.api.patch(ME_URL, {"first_name": "Анна"}, format="json")
 
-# Create your tests here.
+        self.assertEqual(response.status_code, 200, response.content)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, "Анна")
+        self.assertTrue(self.user.check_password("secret-password-1"))
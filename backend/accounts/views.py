@@ -1,5 +1,5 @@
 import logging
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage
 from django.conf import settings
 from django.template.loader import render_to_string
 from rest_framework import generics, permissions, status
@@ -8,13 +8,16 @@ from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from .serializers import (
     RegisterSerializer, MeSerializer, PasswordChangeSerializer,
     PasswordResetRequestSerializer, PasswordResetConfirmSerializer,
     PrescriptionSerializer, LensReminderSerializer
 )
 from .models import PasswordResetToken, Prescription, LensReminder
+from .authentication import invalidate_user_cache
 from .throttling import AuthRateThrottle, RegisterRateThrottle
+from outbox.emails import enqueue_email
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
@@ -75,6 +78,7 @@ class LogoutView(APIView):
             if refresh_token:
                 token = RefreshToken(refresh_token)
                 token.blacklist()
+            invalidate_user_cache(request.user.pk)
             return Response({"detail": "Вы успешно вышли из системы"})
         except Exception:
             return Response(
@@ -129,16 +133,18 @@ class PasswordResetRequestView(APIView):
 Команда OpticPlace
             """.strip()
 
-            send_mail(
-                subject=subject,
-                message=message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=[user.email],
-                fail_silently=False,
+            enqueue_email(
+                EmailMessage(
+                    subject=subject,
+                    body=message,
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    to=[user.email],
+                ),
+                kind="password_reset",
             )
-            logger.info(f"Password reset email sent to {user.email}")
+            logger.info(f"Password reset email queued for {user.email}")
         except Exception as e:
-            logger.error(f"Failed to send password reset email to {user.email}: {e}")
+            logger.error(f"Failed to queue password reset email to {user.email}: {e}")
             # Не раскрываем ошибку пользователю
 
         return Response(success_message)
@@ -276,7 +282,6 @@ class LensReminderRenewView(APIView):
             )
 
         # Получаем новую дату начала (если передана) или используем сегодня
-        from django.utils import timezone
         new_start_date = request.data.get("start_date")
         if new_start_date:
             from datetime import datetime
@@ -288,7 +293,7 @@ class LensReminderRenewView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
         else:
-            new_start_date = timezone.now().date()
+            new_start_date = timezone.localdate()
 
         reminder.renew(new_start_date)
 
@@ -300,17 +305,16 @@ class LensReminderActiveView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        reminders = LensReminder.objects.filter(
-            user=request.user,
-            is_active=True
+        # Пора напомнить или срок уже прошёл: дата замены минус
+        # «Напоминать за» наступила (remind_on хранится в БД)
+        active_reminders = list(
+            LensReminder.objects.filter(
+                user=request.user,
+                is_active=True,
+                remind_on__lte=timezone.localdate(),
+            ).order_by("replacement_date", "id")
         )
 
-        # Фильтруем те, что требуют внимания
-        active_reminders = []
-        for reminder in reminders:
-            if reminder.needs_reminder or reminder.is_overdue:
-                active_reminders.append(reminder)
-
         serializer = LensReminderSerializer(active_reminders, many=True)
         return Response({
             "count": len(active_reminders),
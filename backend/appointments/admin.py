@@ -1,16 +1,28 @@
 from unfold.admin import ModelAdmin
 from django.contrib import admin
-from .models import Appointment
+from .models import Appointment, Specialist
+from .bitrix import MAX_ATTEMPTS
+
+
+@admin.register(Specialist)
+class SpecialistAdmin(ModelAdmin):
+    list_display = ("id", "name", "service_type", "slot_minutes", "is_active", "sort")
+    list_filter = ("service_type", "is_active")
+    search_fields = ("name",)
+    list_editable = ("is_active", "sort")
+    ordering = ("sort", "id")
 
 
 @admin.register(Appointment)
 class AppointmentAdmin(ModelAdmin):
-    list_display = ("id", "full_name", "email", "phone", "service_type", "status", "desired_datetime", "created_at")
-    list_filter = ("status", "service_type", "created_at")
+    list_display = ("id", "full_name", "email", "phone", "service_type", "specialist", "status", "desired_datetime", "created_at")
+    list_filter = ("status", "service_type", "specialist", "created_at")
     search_fields = ("full_name", "email", "phone", "comment")
-    readonly_fields = ("created_at", "bitrix_raw")
+    readonly_fields = ("created_at", "bitrix_raw", "bitrix_lead_id", "bitrix_attempts", "bitrix_retry_at")
     list_editable = ("status",)
     ordering = ("-created_at",)
+    list_select_related = ("specialist",)
+    actions = ["retry_bitrix"]
 
     fieldsets = (
         ("Пользователь", {
@@ -20,10 +32,10 @@ class AppointmentAdmin(ModelAdmin):
             "fields": ("full_name", "email", "phone")
         }),
         ("Детали записи", {
-            "fields": ("service_type", "desired_datetime", "comment", "status")
+            "fields": ("service_type", "specialist", "desired_datetime", "comment", "status")
         }),
         ("Интеграция с Bitrix24", {
-            "fields": ("bitrix_raw",),
+            "fields": ("bitrix_lead_id", "bitrix_attempts", "bitrix_retry_at", "bitrix_raw"),
             "classes": ("collapse",)
         }),
         ("Системная информация", {
@@ -31,3 +43,13 @@ class AppointmentAdmin(ModelAdmin):
             "classes": ("collapse",)
         }),
     )
+
+    @admin.action(description="Повторить отправку в Bitrix24")
+    def retry_bitrix(self, request, queryset):
+        updated = queryset.filter(status=Appointment.STATUS_FAILED).update(
+            bitrix_attempts=0, bitrix_retry_at=None,
+        )
+        self.message_user(
+            request,
+            f"Поставлено в очередь: {updated} (ещё {MAX_ATTEMPTS} попыток, отправит send_bitrix_leads)",
+        )
@@ -0,0 +1,103 @@
+"""
+Доставка записей на приём в Bitrix24 лидами.
+
+Запись создаётся со статусом "Новая", лиды отправляет команда
+send_bitrix_leads: пачка до BATCH_LIMIT записей уходит одним вызовом
+batch (по команде crm.lead.add на запись). Результат каждой команды
+сохраняется в bitrix_raw своей записи. Записи, которые Bitrix24 не
+принял, повторяются с растущей паузой (bitrix_retry_at), пока не
+исчерпано MAX_ATTEMPTS попыток.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from integrations.bitrix24 import BATCH_LIMIT, Bitrix24Client, lead_fields
+
+from .models import Appointment
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 8
+RETRY_DELAY = 60  # секунд, удваивается с каждой попыткой
+
+
+@dataclass
+class DeliveryStats:
+    appointments: int = 0
+    sent: int = 0
+    failed: int = 0
+
+
+def pending_appointments(batch_size: int):
+    now = timezone.now()
+    return list(
+        Appointment.objects
+        .filter(
+            status__in=[Appointment.STATUS_NEW, Appointment.STATUS_FAILED],
+            bitrix_attempts__lt=MAX_ATTEMPTS,
+        )
+        .filter(Q(bitrix_retry_at__isnull=True) | Q(bitrix_retry_at__lte=now))
+        .order_by("created_at")[:batch_size]
+    )
+
+
+def lead_command(appointment) -> tuple:
+    title = f"Запись: {appointment.get_service_type_display()} {appointment.desired_datetime}"
+    fields = lead_fields(
+        title=title,
+        name=appointment.full_name,
+        phone=appointment.phone,
+        email=appointment.email,
+        comment=appointment.comment,
+    )
+    return "crm.lead.add", {"fields": fields}
+
+
+def deliver_leads(batch_size: int = BATCH_LIMIT, client: Bitrix24Client = None) -> DeliveryStats:
+    """
+    Отправляет очередную пачку записей одним вызовом batch.
+    Рассчитана на один запущенный экземпляр команды.
+    """
+    client = client or Bitrix24Client(settings.BITRIX24_WEBHOOK_URL)
+    appointments = pending_appointments(min(batch_size, BATCH_LIMIT))
+    stats = DeliveryStats(appointments=len(appointments))
+    if not appointments:
+        return stats
+
+    commands = {f"a{a.pk}": lead_command(a) for a in appointments}
+    try:
+        results, errors = client.batch(commands)
+    except Exception as e:
+        logger.warning(f"Bitrix24 batch: {e}")
+        results, errors = {}, {key: {"error": str(e)} for key in commands}
+
+    now = timezone.now()
+    for appointment in appointments:
+        key = f"a{appointment.pk}"
+        lead_id = results.get(key)
+        if lead_id:
+            appointment.status = Appointment.STATUS_SENT
+            appointment.bitrix_lead_id = int(lead_id)
+            appointment.bitrix_raw = {"result": lead_id, "sent_at": now.isoformat()}
+            appointment.bitrix_retry_at = None
+            stats.sent += 1
+        else:
+            error = errors.get(key) or {"error": "нет результата в ответе batch"}
+            appointment.status = Appointment.STATUS_FAILED
+            appointment.bitrix_raw = {**error, "attempt": appointment.bitrix_attempts + 1}
+            appointment.bitrix_retry_at = now + timedelta(
+                seconds=RETRY_DELAY * 2 ** appointment.bitrix_attempts
+            )
+            stats.failed += 1
+        appointment.bitrix_attempts += 1
+
+    Appointment.objects.bulk_update(
+        appointments,
+        ["status", "bitrix_lead_id", "bitrix_raw", "bitrix_attempts", "bitrix_retry_at"],
+    )
+    return stats
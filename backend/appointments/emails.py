@@ -1,7 +1,9 @@
 import logging
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage
 from django.conf import settings
 
+from outbox.emails import enqueue_email
+
 logger = logging.getLogger(__name__)
 
 
@@ -50,15 +52,17 @@ Email: info@opticplace.ru
 Команда OpticPlace
         """.strip()
 
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[appointment.email],
-            fail_silently=False,
+        enqueue_email(
+            EmailMessage(
+                subject=subject,
+                body=message,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[appointment.email],
+            ),
+            kind="appointment_confirmation",
         )
-        logger.info(f"Appointment confirmation email sent for appointment #{appointment.id} to {appointment.email}")
+        logger.info(f"Appointment confirmation email queued for appointment #{appointment.id} to {appointment.email}")
         return True
     except Exception as e:
-        logger.error(f"Failed to send appointment confirmation email for #{appointment.id}: {e}")
+        logger.error(f"Failed to queue appointment confirmation email for #{appointment.id}: {e}")
         return False
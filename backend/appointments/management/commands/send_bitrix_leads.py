@@ -0,0 +1,70 @@
+"""
+Команда для отправки записей на приём в Bitrix24.
+
+Новые записи и записи, которые не удалось отправить, уходят лидами
+пачками через batch (до 50 команд за вызов). Результат по каждому
+лиду сохраняется в bitrix_raw записи, неудачные повторяются
+с растущей паузой.
+
+Использование:
+    python manage.py send_bitrix_leads
+    python manage.py send_bitrix_leads --loop --interval 10
+
+    BITRIX24_WEBHOOK_URL=http://127.0.0.1:8766/rest/1/token python manage.py send_bitrix_leads
+
+Опции:
+    --loop              Работать постоянно, проверяя очередь
+    --interval N        Пауза между проверками очереди в секундах
+    --batch-size N      Количество записей за один вызов batch (не больше 50)
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from appointments.bitrix import deliver_leads
+from integrations.bitrix24 import BATCH_LIMIT, Bitrix24Client
+
+
+class Command(BaseCommand):
+    help = 'Отправка записей на приём в Bitrix24'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Работать постоянно, проверяя очередь',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=10,
+            help='Пауза между проверками очереди в секундах (по умолчанию 10)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_LIMIT,
+            help=f'Количество записей за один вызов batch (по умолчанию и максимум {BATCH_LIMIT})',
+        )
+
+    def handle(self, *args, **options):
+        client = Bitrix24Client(settings.BITRIX24_WEBHOOK_URL)
+        if not client.is_configured():
+            self.stderr.write(self.style.ERROR('BITRIX24_WEBHOOK_URL не настроен'))
+            return
+
+        batch_size = min(max(1, options['batch_size']), BATCH_LIMIT)
+
+        while True:
+            stats = deliver_leads(batch_size, client)
+            if stats.appointments:
+                self.stdout.write(
+                    f'Записей: {stats.appointments}, отправлено: {stats.sent}, ошибок: {stats.failed}'
+                )
+                # Если вся пачка упала, ждём повтора по bitrix_retry_at
+                if stats.failed < stats.appointments:
+                    continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
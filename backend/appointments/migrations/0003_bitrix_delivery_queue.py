@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-18 23:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0002_alter_appointment_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='bitrix_attempts',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Попыток отправки в Bitrix24'),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='bitrix_lead_id',
+            field=models.PositiveBigIntegerField(blank=True, null=True, verbose_name='ID лида в Bitrix24'),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='bitrix_retry_at',
+            field=models.DateTimeField(blank=True, help_text='Пусто - отправить при следующем проходе send_bitrix_leads', null=True, verbose_name='Повторить отправку после'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['status', 'bitrix_retry_at'], name='appt_bitrix_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 6.0.1 on 2026-10-18 23:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0003_bitrix_delivery_queue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Specialist',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, verbose_name='Имя')),
+                ('service_type', models.CharField(choices=[('ophthalmologist', 'Офтальмолог'), ('optometrist', 'Оптометрист')], max_length=30, verbose_name='Тип услуги')),
+                ('slot_minutes', models.PositiveSmallIntegerField(default=30, help_text='Слоты начинаются от начала рабочего дня с этим шагом', verbose_name='Длительность приёма, мин')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Принимает записи')),
+                ('sort', models.PositiveIntegerField(default=0, verbose_name='Сортировка')),
+            ],
+            options={
+                'verbose_name': 'Специалист',
+                'verbose_name_plural': 'Специалисты',
+                'ordering': ('sort', 'id'),
+            },
+        ),
+        migrations.AlterField(
+            model_name='appointment',
+            name='status',
+            field=models.CharField(choices=[('new', 'Новая'), ('sent_to_bitrix', 'Отправлена в Bitrix24'), ('bitrix_failed', 'Ошибка отправки в Bitrix24'), ('canceled', 'Отменена')], default='new', max_length=30, verbose_name='Статус'),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='specialist',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='appointments', to='appointments.specialist', verbose_name='Специалист'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['service_type', 'desired_datetime'], name='appt_type_datetime_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['email', 'created_at'], name='appt_email_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['new', 'sent_to_bitrix', 'bitrix_failed'])), fields=('specialist', 'desired_datetime'), name='uniq_specialist_slot'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 6.0.1 on 2026-10-18 23:21
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Раньше создавала специалистов-заглушек. Специалистов заводят в админке,
+    для новой установки - manage.py loaddata specialists
+    (appointments/fixtures/specialists.json).
+    """
+
+    dependencies = [
+        ('appointments', '0004_specialists_and_slots'),
+    ]
+
+    operations = []
@@ -2,23 +2,52 @@ from django.db import models
 from django.conf import settings
 
 
+SERVICE_TYPES = [
+    ("ophthalmologist", "Офтальмолог"),
+    ("optometrist", "Оптометрист"),
+]
+
+
+class Specialist(models.Model):
+    """Специалист, к которому можно записаться на приём"""
+    name = models.CharField("Имя", max_length=200)
+    service_type = models.CharField("Тип услуги", max_length=30, choices=SERVICE_TYPES)
+    slot_minutes = models.PositiveSmallIntegerField(
+        "Длительность приёма, мин",
+        default=30,
+        help_text="Слоты начинаются от начала рабочего дня с этим шагом"
+    )
+    is_active = models.BooleanField("Принимает записи", default=True)
+    sort = models.PositiveIntegerField("Сортировка", default=0)
+
+    class Meta:
+        verbose_name = "Специалист"
+        verbose_name_plural = "Специалисты"
+        ordering = ("sort", "id")
+
+    def __str__(self):
+        return f"{self.name} ({self.get_service_type_display()})"
+
+
 class Appointment(models.Model):
     """Запись на приём к специалисту"""
     TYPE_OPHTH = "ophthalmologist"
     TYPE_OPTOM = "optometrist"
-    TYPES = [
-        (TYPE_OPHTH, "Офтальмолог"),
-        (TYPE_OPTOM, "Оптометрист"),
-    ]
+    TYPES = SERVICE_TYPES
 
     STATUS_NEW = "new"
     STATUS_SENT = "sent_to_bitrix"
     STATUS_FAILED = "bitrix_failed"
+    STATUS_CANCELED = "canceled"
     STATUSES = [
         (STATUS_NEW, "Новая"),
         (STATUS_SENT, "Отправлена в Bitrix24"),
         (STATUS_FAILED, "Ошибка отправки в Bitrix24"),
+        (STATUS_CANCELED, "Отменена"),
     ]
+    # Занимают время специалиста. Ошибка отправки в Bitrix24
+    # не отменяет запись: лид будет отправлен повторно
+    ACTIVE_STATUSES = [STATUS_NEW, STATUS_SENT, STATUS_FAILED]
 
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -32,6 +61,14 @@ class Appointment(models.Model):
         max_length=30,
         choices=TYPES
     )
+    specialist = models.ForeignKey(
+        Specialist,
+        null=True,
+        blank=True,
+        on_delete=models.PROTECT,
+        related_name="appointments",
+        verbose_name="Специалист"
+    )
     desired_datetime = models.DateTimeField("Желаемые дата и время")
 
     full_name = models.CharField("ФИО", max_length=200)
@@ -51,6 +88,14 @@ class Appointment(models.Model):
         blank=True,
         help_text="Сырой ответ от Bitrix24 API"
     )
+    bitrix_lead_id = models.PositiveBigIntegerField("ID лида в Bitrix24", null=True, blank=True)
+    bitrix_attempts = models.PositiveSmallIntegerField("Попыток отправки в Bitrix24", default=0)
+    bitrix_retry_at = models.DateTimeField(
+        "Повторить отправку после",
+        null=True,
+        blank=True,
+        help_text="Пусто - отправить при следующем проходе send_bitrix_leads"
+    )
 
     created_at = models.DateTimeField("Дата создания", auto_now_add=True)
 
@@ -58,6 +103,22 @@ class Appointment(models.Model):
         verbose_name = "Запись на приём"
         verbose_name_plural = "Записи на приём"
         ordering = ("-created_at",)
+        indexes = [
+            # Очередь отправки в Bitrix24
+            models.Index(fields=["status", "bitrix_retry_at"], name="appt_bitrix_queue_idx"),
+            # Занятые слоты за период
+            models.Index(fields=["service_type", "desired_datetime"], name="appt_type_datetime_idx"),
+            # Повторные записи с того же email
+            models.Index(fields=["email", "created_at"], name="appt_email_created_idx"),
+        ]
+        constraints = [
+            # Один специалист - одна запись на слот, даже при одновременных запросах
+            models.UniqueConstraint(
+                fields=["specialist", "desired_datetime"],
+                condition=models.Q(status__in=["new", "sent_to_bitrix", "bitrix_failed"]),
+                name="uniq_specialist_slot",
+            ),
+        ]
 
     def __str__(self):
         return f"Запись #{self.id} - {self.get_service_type_display()} на {self.desired_datetime.strftime('%d.%m.%Y %H:%M')}"
@@ -2,13 +2,19 @@ from rest_framework import serializers
 from django.utils import timezone
 from datetime import timedelta
 import re
-from .models import Appointment
+from .models import Appointment, Specialist
+from .slots import BOOKING_HORIZON, MIN_LEAD_TIME, WORK_DAYS, WORK_END, WORK_START, is_slot_start
+
+SLOT_CHOICE_MESSAGE = "Выберите время из списка свободных слотов"
 
 
 class AppointmentCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Appointment
-        fields = ("service_type", "desired_datetime", "full_name", "phone", "email", "comment")
+        fields = ("service_type", "specialist", "desired_datetime", "full_name", "phone", "email", "comment")
+        extra_kwargs = {
+            "specialist": {"queryset": Specialist.objects.filter(is_active=True), "required": False},
+        }
 
     def validate_desired_datetime(self, value):
         now = timezone.now()
@@ -18,19 +24,22 @@ class AppointmentCreateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Нельзя записаться на прошедшую дату")
 
         # Нельзя записаться раньше чем через 1 час
-        if value < now + timedelta(hours=1):
+        if value < now + MIN_LEAD_TIME:
             raise serializers.ValidationError("Запись возможна минимум за 1 час до приёма")
 
         # Нельзя записаться более чем на 3 месяца вперёд
-        if value > now + timedelta(days=90):
+        if value > now + BOOKING_HORIZON:
             raise serializers.ValidationError("Запись возможна не более чем на 3 месяца вперёд")
 
         # Проверка рабочего времени (9:00 - 20:00)
-        if value.hour < 9 or value.hour >= 20:
-            raise serializers.ValidationError("Приём возможен только с 9:00 до 20:00")
+        local = timezone.localtime(value)
+        if not WORK_START <= local.time() < WORK_END:
+            raise serializers.ValidationError(
+                f"Приём возможен только с {WORK_START:%H:%M} до {WORK_END:%H:%M}"
+            )
 
         # Проверка рабочих дней (пн-сб, воскресенье выходной)
-        if value.weekday() == 6:  # Воскресенье
+        if local.weekday() not in WORK_DAYS:
             raise serializers.ValidationError("В воскресенье приём не ведётся")
 
         return value
@@ -59,35 +68,36 @@ class AppointmentCreateSerializer(serializers.ModelSerializer):
         return value
 
     def validate(self, attrs):
-        # Проверка на дубликат записи
         email = attrs.get("email")
-        phone = attrs.get("phone")
+        specialist = attrs.get("specialist")
         desired_datetime = attrs.get("desired_datetime")
 
-        # Проверяем нет ли уже записи на это время
-        existing = Appointment.objects.filter(
-            desired_datetime=desired_datetime,
-            status__in=[Appointment.STATUS_NEW, Appointment.STATUS_SENT]
-        ).exists()
-
-        if existing:
-            raise serializers.ValidationError({
-                "desired_datetime": "На это время уже есть запись. Выберите другое время."
-            })
+        # Занятость слота проверяет уникальное ограничение при создании записи
+        if specialist is not None:
+            if specialist.service_type != attrs.get("service_type"):
+                raise serializers.ValidationError({
+                    "specialist": "Специалист не ведёт приём по выбранной услуге"
+                })
+            specialists = [specialist]
+        else:
+            specialists = Specialist.objects.filter(service_type=attrs.get("service_type"), is_active=True)
+        if not any(is_slot_start(s, desired_datetime) for s in specialists):
+            raise serializers.ValidationError({"desired_datetime": SLOT_CHOICE_MESSAGE})
 
         # Проверяем нет ли записи от этого пользователя на ближайшие 24 часа
-        now = timezone.now()
-        recent_booking = Appointment.objects.filter(
-            email__iexact=email,
-            created_at__gte=now - timedelta(hours=24),
-            status__in=[Appointment.STATUS_NEW, Appointment.STATUS_SENT]
-        ).exists()
-
-        if recent_booking:
-            raise serializers.ValidationError(
-                "Вы уже записались на приём в течение последних 24 часов. "
-                "Для изменения записи свяжитесь с нами по телефону."
-            )
+        if email:
+            now = timezone.now()
+            recent_booking = Appointment.objects.filter(
+                email__iexact=email,
+                created_at__gte=now - timedelta(hours=24),
+                status__in=Appointment.ACTIVE_STATUSES
+            ).exists()
+
+            if recent_booking:
+                raise serializers.ValidationError(
+                    "Вы уже записались на приём в течение последних 24 часов. "
+                    "Для изменения записи свяжитесь с нами по телефону."
+                )
 
         return attrs
 
@@ -99,7 +109,22 @@ class AppointmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Appointment
         fields = (
-            "id", "service_type", "service_type_display",
+            "id", "service_type", "service_type_display", "specialist",
             "desired_datetime", "full_name", "phone", "email", "comment",
             "status", "status_display", "created_at"
         )
+
+
+class SlotsQuerySerializer(serializers.Serializer):
+    """Параметры запроса свободных слотов"""
+    type = serializers.ChoiceField(choices=Appointment.TYPES)
+    specialist = serializers.IntegerField(required=False)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+    def get_fields(self):
+        # from - ключевое слово Python: параметры from/to объявлены под другими именами
+        fields = super().get_fields()
+        fields["from"] = fields.pop("date_from")
+        fields["to"] = fields.pop("date_to")
+        return fields
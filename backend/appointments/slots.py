@@ -0,0 +1,158 @@
+"""
+Свободные слоты для записи на приём.
+
+Рабочее время - пн-сб с WORK_START до WORK_END (местное время, TIME_ZONE).
+Слоты каждого специалиста идут от начала рабочего дня с шагом
+Specialist.slot_minutes, запись на приём занимает ровно один слот.
+
+Занятые записи за весь период загружаются одним запросом и
+раскладываются в BookedIntervals по специалистам, после чего занятость
+каждого слота проверяется бинарным поиском. Записи без специалиста
+(созданные до появления слотов) занимают одного любого специалиста
+своего типа.
+
+Одновременную запись на один слот исключает уникальное ограничение
+uniq_specialist_slot, а не проверка перед вставкой.
+"""
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from .models import Appointment, Specialist
+
+WORK_DAYS = (0, 1, 2, 3, 4, 5)  # пн-сб
+WORK_START = time(9, 0)
+WORK_END = time(20, 0)
+
+MIN_LEAD_TIME = timedelta(hours=1)
+BOOKING_HORIZON = timedelta(days=90)
+
+# Длительность записей без специалиста
+DEFAULT_SLOT_MINUTES = 30
+
+
+class BookedIntervals:
+    """Занятые интервалы [start, end), отсортированные по началу и по концу"""
+
+    def __init__(self, intervals=()):
+        self.starts = sorted(start for start, _ in intervals)
+        self.ends = sorted(end for _, end in intervals)
+
+    def count(self, start: datetime, end: datetime) -> int:
+        """Сколько интервалов пересекается с [start, end)"""
+        # Начались до конца запрошенного минус закончились до его начала
+        return bisect_left(self.starts, end) - bisect_right(self.ends, start)
+
+
+@dataclass
+class Slot:
+    start: datetime
+    specialist_ids: list = field(default_factory=list)
+
+
+def booking_window(now: datetime = None) -> tuple:
+    """Период, на который можно записаться: не раньше чем через час и не дальше 90 дней"""
+    now = now or timezone.now()
+    return now + MIN_LEAD_TIME, now + BOOKING_HORIZON
+
+
+def is_working_time(start: datetime, minutes: int = DEFAULT_SLOT_MINUTES) -> bool:
+    local = timezone.localtime(start)
+    end = local + timedelta(minutes=minutes)
+    return (
+        local.weekday() in WORK_DAYS
+        and local.time() >= WORK_START
+        and end.date() == local.date()
+        and end.time() <= WORK_END
+    )
+
+
+def is_slot_start(specialist: Specialist, start: datetime) -> bool:
+    """Время совпадает с началом одного из слотов специалиста"""
+    local = timezone.localtime(start)
+    offset = local - timezone.make_aware(datetime.combine(local.date(), WORK_START))
+    return (
+        is_working_time(start, specialist.slot_minutes)
+        and offset % timedelta(minutes=specialist.slot_minutes) == timedelta(0)
+    )
+
+
+def _booked(service_type: str, start: datetime, end: datetime, specialists: dict) -> tuple:
+    """Занятые интервалы специалистов и записей без специалиста - одним запросом"""
+    longest = max([DEFAULT_SLOT_MINUTES] + [s.slot_minutes for s in specialists.values()])
+    rows = (
+        Appointment.objects
+        .filter(
+            service_type=service_type,
+            status__in=Appointment.ACTIVE_STATUSES,
+            desired_datetime__gt=start - timedelta(minutes=longest),
+            desired_datetime__lt=end,
+        )
+        .values_list("specialist_id", "desired_datetime")
+    )
+
+    by_specialist = defaultdict(list)
+    unassigned = []
+    for specialist_id, booked_at in rows:
+        if specialist_id is None:
+            unassigned.append((booked_at, booked_at + timedelta(minutes=DEFAULT_SLOT_MINUTES)))
+        elif specialist_id in specialists:
+            minutes = specialists[specialist_id].slot_minutes
+            by_specialist[specialist_id].append((booked_at, booked_at + timedelta(minutes=minutes)))
+
+    return (
+        {specialist_id: BookedIntervals(intervals) for specialist_id, intervals in by_specialist.items()},
+        BookedIntervals(unassigned),
+    )
+
+
+def free_slots(service_type: str, start: datetime, end: datetime, specialists=None) -> list:
+    """
+    Свободные слоты, начинающиеся в [start, end), по возрастанию времени.
+    specialists: по умолчанию все активные специалисты типа услуги.
+    """
+    if specialists is None:
+        specialists = Specialist.objects.filter(service_type=service_type, is_active=True)
+    specialists = {s.pk: s for s in specialists}
+    if not specialists or start >= end:
+        return []
+
+    booked, unassigned = _booked(service_type, start, end, specialists)
+    empty = BookedIntervals()
+
+    candidates = defaultdict(list)
+    day = timezone.localtime(start).date()
+    last_day = timezone.localtime(end).date()
+    while day <= last_day:
+        if day.weekday() in WORK_DAYS:
+            day_start = timezone.make_aware(datetime.combine(day, WORK_START))
+            day_end = timezone.make_aware(datetime.combine(day, WORK_END))
+            for specialist in specialists.values():
+                step = timedelta(minutes=specialist.slot_minutes)
+                intervals = booked.get(specialist.pk, empty)
+                slot_start = day_start
+                while slot_start + step <= day_end:
+                    if start <= slot_start < end and not intervals.count(slot_start, slot_start + step):
+                        candidates[slot_start].append(specialist.pk)
+                    slot_start += step
+        day += timedelta(days=1)
+
+    slots = []
+    for slot_start in sorted(candidates):
+        specialist_ids = candidates[slot_start]
+        taken = unassigned.count(slot_start, slot_start + timedelta(minutes=DEFAULT_SLOT_MINUTES))
+        if len(specialist_ids) > taken:
+            slots.append(Slot(slot_start, specialist_ids))
+    return slots
+
+
+def available_specialists(service_type: str, start: datetime) -> list:
+    """Специалисты, у которых свободен слот, начинающийся в start"""
+    specialists = list(Specialist.objects.filter(service_type=service_type, is_active=True))
+    slots = free_slots(service_type, start, start + timedelta(minutes=1), specialists)
+    if not slots or slots[0].start != start:
+        return []
+    return [s for s in specialists if s.pk in slots[0].specialist_ids]
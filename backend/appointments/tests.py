@@ -1,3 +1,149 @@
-from django.test import TestCase
+import io
+import threading
+from datetime import datetime, time, timedelta
+from http.server import ThreadingHTTPServer
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from integrations.bitrix24 import Bitrix24Client
+from integrations.management.commands.fake_bitrix24 import FakeBitrix24Handler
+
+from .bitrix import deliver_leads
+from .models import Appointment, Specialist
+from .serializers import SLOT_CHOICE_MESSAGE
+from .views import SLOT_TAKEN_MESSAGE
+
+APPOINTMENTS_URL = "/api/appointments/create/"
+
+
+class BitrixLeadDeliveryTests(TestCase):
+    """Отправка записей лидами на локальный сервер fake_bitrix24"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.handler = type("Handler", (FakeBitrix24Handler,), {
+            "log_message": lambda self, format, *args: None,
+        })
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), cls.handler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.addClassCleanup(cls.server.server_close)
+        cls.addClassCleanup(cls.server.shutdown)
+        cls.webhook_url = f"http://127.0.0.1:{cls.server.server_port}/rest/1/token"
+
+    def setUp(self):
+        self.handler.leads = []
+        self.handler.fail_every = 0
+        self.client_ = Bitrix24Client(self.webhook_url)
+
+    def create_appointments(self, count):
+        start = timezone.now() + timedelta(days=1)
+        return [
+            Appointment.objects.create(
+                service_type=Appointment.TYPE_OPTOM,
+                desired_datetime=start + timedelta(minutes=30 * i),
+                full_name=f"Клиент {i}",
+                phone="+79990000000",
+            )
+            for i in range(count)
+        ]
+
+    def test_batch_delivered(self):
+        self.create_appointments(3)
+
+        stats = deliver_leads(client=self.client_)
+
+        self.assertEqual((stats.appointments, stats.sent, stats.failed), (3, 3, 0))
+        self.assertEqual(len(self.handler.leads), 3)
+        self.assertEqual(
+            sorted(Appointment.objects.values_list("bitrix_lead_id", flat=True)), [1, 2, 3]
+        )
+        self.assertFalse(Appointment.objects.exclude(status=Appointment.STATUS_SENT).exists())
+
+    def test_rejected_lead_retried(self):
+        self.create_appointments(2)
+        self.handler.fail_every = 2
+
+        stats = deliver_leads(client=self.client_)
+
+        self.assertEqual((stats.sent, stats.failed), (1, 1))
+        failed = Appointment.objects.get(status=Appointment.STATUS_FAILED)
+        self.assertEqual(failed.bitrix_attempts, 1)
+        self.assertGreater(failed.bitrix_retry_at, timezone.now())
+        self.assertEqual(failed.bitrix_raw["attempt"], 1)
+
+        # До bitrix_retry_at запись не повторяется
+        self.assertEqual(deliver_leads(client=self.client_).appointments, 0)
+
+        Appointment.objects.filter(pk=failed.pk).update(bitrix_retry_at=timezone.now())
+        stats = deliver_leads(client=self.client_)
+
+        self.assertEqual((stats.sent, stats.failed), (1, 0))
+        failed.refresh_from_db()
+        self.assertEqual((failed.status, failed.bitrix_attempts), (Appointment.STATUS_SENT, 2))
+
+    def test_command_drains_queue(self):
+        self.create_appointments(5)
+
+        with override_settings(BITRIX24_WEBHOOK_URL=self.webhook_url):
+            call_command("send_bitrix_leads", batch_size=2, stdout=io.StringIO())
+
+        self.assertEqual(len(self.handler.leads), 5)
+        self.assertFalse(Appointment.objects.exclude(status=Appointment.STATUS_SENT).exists())
+
+
+class AppointmentCreateTests(TestCase):
+    """Запись на приём: выбор специалиста по слоту и повторные записи"""
+
+    def setUp(self):
+        self.specialist = Specialist.objects.create(
+            name="Иванова А. А.", service_type=Appointment.TYPE_OPTOM, slot_minutes=30,
+        )
+        # Ближайший понедельник не раньше чем через два дня, 10:00
+        day = timezone.localdate() + timedelta(days=2)
+        day += timedelta(days=-day.weekday() % 7)
+        self.slot = timezone.make_aware(datetime.combine(day, time(10, 0)))
+
+    def book(self, desired_datetime, email="client@example.com"):
+        return self.client.post(APPOINTMENTS_URL, {
+            "service_type": Appointment.TYPE_OPTOM,
+            "desired_datetime": desired_datetime.isoformat(),
+            "full_name": "Пётр Петров",
+            "phone": "+79990000000",
+            "email": email,
+        }, content_type="application/json")
+
+    def test_specialist_assigned(self):
+        response = self.book(self.slot)
+
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()["specialist"], self.specialist.pk)
+
+    def test_unaligned_time_rejected(self):
+        response = self.book(self.slot + timedelta(minutes=10))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["desired_datetime"], [SLOT_CHOICE_MESSAGE])
+
+    def test_taken_slot_rejected(self):
+        self.book(self.slot, email="first@example.com")
+
+        response = self.book(self.slot, email="second@example.com")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["desired_datetime"], [SLOT_TAKEN_MESSAGE])
+
+    def test_recent_booking_matched_case_insensitively(self):
+        Appointment.objects.create(
+            service_type=Appointment.TYPE_OPTOM,
+            desired_datetime=self.slot + timedelta(days=1),
+            full_name="Пётр Петров",
+            email="Client@Example.com",
+        )
+
+        response = self.book(self.slot)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("24 часов", str(response.json()))
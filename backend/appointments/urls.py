@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import AppointmentCreateView
+from .views import AppointmentCreateView, AppointmentSlotsView
 
 urlpatterns = [
     path("create/", AppointmentCreateView.as_view(), name="appointment_create"),
+    path("slots/", AppointmentSlotsView.as_view(), name="appointment_slots"),
 ]
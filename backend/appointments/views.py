@@ -1,10 +1,16 @@
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
-from django.conf import settings
-from .models import Appointment
-from .serializers import AppointmentCreateSerializer, AppointmentSerializer
+from rest_framework.views import APIView
+from .models import Appointment, Specialist
+from .serializers import AppointmentCreateSerializer, AppointmentSerializer, SlotsQuerySerializer
 from .emails import send_appointment_confirmation
-from integrations.bitrix24 import Bitrix24Client
+from .slots import available_specialists, booking_window, free_slots
+
+SLOT_TAKEN_MESSAGE = "На это время уже есть запись. Выберите другое время."
 
 
 class AppointmentCreateView(generics.GenericAPIView):
@@ -14,34 +20,83 @@ class AppointmentCreateView(generics.GenericAPIView):
     def post(self, request):
         s = self.get_serializer(data=request.data)
         s.is_valid(raise_exception=True)
-        data = s.validated_data
-
-        appt = Appointment.objects.create(
-            user=request.user if request.user.is_authenticated else None,
-            **data,
-        )
-
-        client = Bitrix24Client(settings.BITRIX24_WEBHOOK_URL)
-
-        try:
-            title = f"Запись: {appt.get_service_type_display()} {appt.desired_datetime}"
-            resp = client.create_lead(
-                title=title,
-                name=appt.full_name,
-                phone=appt.phone,
-                email=appt.email,
-                comment=appt.comment,
-            )
-            appt.status = Appointment.STATUS_SENT if resp else Appointment.STATUS_NEW
-            appt.bitrix_raw = resp
-            appt.save(update_fields=["status", "bitrix_raw"])
-        except Exception as e:
-            appt.status = Appointment.STATUS_FAILED
-            appt.bitrix_raw = {"error": str(e)}
-            appt.save(update_fields=["status", "bitrix_raw"])
+        data = dict(s.validated_data)
+
+        specialist = data.pop("specialist", None)
+        if specialist is not None:
+            candidates = [specialist]
+        else:
+            candidates = available_specialists(data["service_type"], data["desired_datetime"])
+
+        # Слот занимает уникальное ограничение: при одновременной записи
+        # вставка проигравшего запроса падает, и пробуем следующего специалиста
+        appt = None
+        for candidate in candidates:
+            try:
+                with transaction.atomic():
+                    appt = Appointment.objects.create(
+                        user=request.user if request.user.is_authenticated else None,
+                        specialist=candidate,
+                        **data,
+                    )
+                break
+            except IntegrityError:
+                continue
+
+        # Время совпадает с началом слота (проверено в сериализаторе),
+        # значит слот уже заняли у всех подходящих специалистов
+        if appt is None:
+            return Response({"desired_datetime": [SLOT_TAKEN_MESSAGE]}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Лид в Bitrix24 отправит команда send_bitrix_leads
 
         # Отправляем email подтверждения
         if appt.email:
             send_appointment_confirmation(appt)
 
         return Response(AppointmentSerializer(appt).data, status=status.HTTP_201_CREATED)
+
+
+class AppointmentSlotsView(APIView):
+    """
+    Свободные слоты для записи: GET /api/appointments/slots/?type=&from=&to=
+
+    from/to - даты (YYYY-MM-DD) включительно, по умолчанию весь период
+    записи (90 дней). specialist - только слоты одного специалиста.
+    """
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        query = SlotsQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
+
+        specialists = Specialist.objects.filter(service_type=params["type"], is_active=True)
+        if "specialist" in params:
+            specialists = specialists.filter(pk=params["specialist"])
+        specialists = list(specialists)
+
+        start, end = booking_window()
+        if "from" in params:
+            start = max(start, timezone.make_aware(datetime.combine(params["from"], time.min)))
+        if "to" in params:
+            end = min(end, timezone.make_aware(datetime.combine(params["to"] + timedelta(days=1), time.min)))
+
+        days = {}
+        for slot in free_slots(params["type"], start, end, specialists):
+            local = timezone.localtime(slot.start)
+            days.setdefault(local.date().isoformat(), []).append({
+                "start": local.isoformat(),
+                "specialists": slot.specialist_ids,
+            })
+
+        return Response({
+            "type": params["type"],
+            "from": timezone.localtime(start).isoformat(),
+            "to": timezone.localtime(end).isoformat(),
+            "specialists": [
+                {"id": s.pk, "name": s.name, "slot_minutes": s.slot_minutes}
+                for s in specialists
+            ],
+            "days": [{"date": date, "slots": slots} for date, slots in days.items()],
+        })
@@ -234,11 +234,11 @@ class AttributeValueInline(TabularInline):
 
 @admin.register(Attribute)
 class AttributeAdmin(ModelAdmin):
-    list_display = ("name", "slug", "is_filterable", "show_in_product_card", "values_count", "sort")
-    list_filter = ("is_filterable", "show_in_product_card")
+    list_display = ("name", "slug", "is_filterable", "show_in_product_card", "lens_parameter", "values_count", "sort")
+    list_filter = ("is_filterable", "show_in_product_card", "lens_parameter")
     search_fields = ("name",)
     prepopulated_fields = {"slug": ("name",)}
-    list_editable = ("is_filterable", "show_in_product_card", "sort")
+    list_editable = ("is_filterable", "show_in_product_card", "lens_parameter", "sort")
     inlines = [AttributeValueInline]
 
     @display(description="Значений")
@@ -248,8 +248,9 @@ class AttributeAdmin(ModelAdmin):
 
 @admin.register(AttributeValue)
 class AttributeValueAdmin(ModelAdmin):
-    list_display = ("value", "attribute", "slug", "sort")
+    list_display = ("value", "attribute", "slug", "numeric_value", "sort")
     list_filter = ("attribute",)
+    readonly_fields = ("numeric_value",)
     search_fields = ("value", "attribute__name")
     prepopulated_fields = {"slug": ("value",)}
     autocomplete_fields = ["attribute"]
@@ -0,0 +1,367 @@
+"""
+Загрузка изображений товаров для команд импорта и синхронизации.
+
+Изображения скачиваются параллельно пулом потоков с ограничением
+одновременных запросов к одному хосту. Все потоки используют один
+клиент общего HTTP-слоя (integrations.http): keep-alive, повторы при
+ошибках сервера и circuit breaker на хост, а на ответ 429 загрузчик
+сам увеличивает паузу для этого хоста.
+
+Файлы хранятся под SHA-256 содержимого (см. RemoteImage): одинаковые
+изображения лежат в хранилище один раз, а уже загруженные URL при
+повторном запуске не скачиваются вовсе или проверяются условным запросом
+(If-None-Match / If-Modified-Since).
+
+Потоки только скачивают файл и записывают его в хранилище.
+Все запросы к БД выполняются в основном потоке, поэтому загрузку можно
+вызывать внутри transaction.atomic().
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Iterator, Optional
+from urllib.parse import urlparse
+
+import requests
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+from integrations.http import ServiceClient
+from .models import Product, ProductImage, RemoteImage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 8
+DEFAULT_PER_HOST = 4
+DEFAULT_TIMEOUT = 60  # секунд
+CHUNK_SIZE = 64 * 1024
+SPOOL_MAX_SIZE = 1024 * 1024  # до 1 МБ держим в памяти, дальше - во временном файле
+# Блокировки записи по первым двум hex-символам хэша: потоки ждут друг друга
+# только при записи файлов с одинаковым префиксом
+STORE_LOCK_STRIPES = 256
+
+# Ответ 429: сколько раз повторять и пределы паузы
+MAX_THROTTLE_RETRIES = 5
+MIN_THROTTLE_DELAY = 1.0  # секунд
+MAX_THROTTLE_DELAY = 60.0  # секунд
+
+CONTENT_TYPE_EXTENSIONS = {
+    'image/jpeg': 'jpg',
+    'image/jpg': 'jpg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+    'image/gif': 'gif',
+}
+
+# Каталог контентно-адресуемого хранилища: products/images/ab/abcdef....jpg
+IMAGE_STORE_PREFIX = 'products/images'
+IMAGE_NAME_MAX_LENGTH = ProductImage._meta.get_field('image').max_length
+
+
+class ImageThrottled(Exception):
+    """Хост продолжает отвечать 429 после всех повторов"""
+
+
+@dataclass
+class ImageTask:
+    """Задание на загрузку одного изображения"""
+    url: str
+    context: Any = None  # данные вызывающего кода, возвращаются в результате
+    known: Optional[RemoteImage] = None  # заполняется загрузчиком
+
+
+@dataclass
+class ImageResult:
+    """Результат загрузки: имя файла в хранилище или ошибка"""
+    task: ImageTask
+    name: str = ''
+    sha256: str = ''
+    etag: str = ''
+    last_modified: str = ''
+    cached: bool = False  # файл взят из хранилища без скачивания
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def filename_from_url(url: str) -> str:
+    """Имя файла из URL (пустая строка, если в пути нет имени с расширением)"""
+    filename = os.path.basename(urlparse(url).path)
+    if not filename or '.' not in filename:
+        return ''
+    return filename
+
+
+def blob_name(sha256: str, ext: str) -> str:
+    """Имя файла в хранилище по хэшу содержимого"""
+    return f'{IMAGE_STORE_PREFIX}/{sha256[:2]}/{sha256}.{ext}'
+
+
+def known_image_names(urls: Iterable[str]) -> dict:
+    """URL -> имя файла в хранилище для уже загруженных изображений"""
+    return dict(RemoteImage.objects.filter(url__in=list(urls)).values_list('url', 'name'))
+
+
+def attach_product_image(product_id: int, name: str, is_main: bool, sort: int = 0):
+    """Привязывает загруженный в хранилище файл к товару"""
+    if is_main:
+        Product.objects.filter(pk=product_id).update(main_image=name)
+    else:
+        ProductImage.objects.create(product_id=product_id, image=name, sort=sort)
+
+
+@dataclass
+class _HostState:
+    """Ограничение параллельности и адаптивная пауза для одного хоста"""
+    semaphore: threading.BoundedSemaphore
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    delay: float = 0.0
+    not_before: float = 0.0
+
+    def wait_turn(self):
+        with self.lock:
+            pause = self.not_before - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
+
+    def throttled(self, retry_after: Optional[float]):
+        with self.lock:
+            self.delay = min(
+                MAX_THROTTLE_DELAY,
+                max(retry_after or 0, self.delay * 2, MIN_THROTTLE_DELAY),
+            )
+            self.not_before = time.monotonic() + self.delay
+            return self.delay
+
+    def succeeded(self):
+        with self.lock:
+            if self.delay:
+                self.delay = self.delay / 2 if self.delay > MIN_THROTTLE_DELAY else 0.0
+                self.not_before = time.monotonic() + self.delay
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+class ImageDownloader:
+    """Параллельный загрузчик изображений с общей сессией"""
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_WORKERS,
+        per_host: int = DEFAULT_PER_HOST,
+        timeout: int = DEFAULT_TIMEOUT,
+        storage=None,
+        revalidate: bool = False,
+    ):
+        """
+        revalidate: для уже загруженных URL отправлять условный запрос
+        вместо того, чтобы сразу использовать файл из хранилища.
+        """
+        self.workers = max(1, workers)
+        self.per_host = max(1, per_host)
+        self.timeout = timeout
+        self.storage = storage or default_storage
+        self.revalidate = revalidate
+        self.http = self._create_client()
+
+        self._hosts = {}
+        self._hosts_lock = threading.Lock()
+        self._store_locks = [threading.Lock() for _ in range(STORE_LOCK_STRIPES)]
+
+    def _create_client(self) -> ServiceClient:
+        """Клиент с пулом keep-alive соединений на каждый поток и повторами при 5xx"""
+        return ServiceClient(
+            'images',
+            timeout=self.timeout,
+            retries=3,
+            backoff=0.5,
+            pool_size=self.workers,
+            failure_threshold=10,
+        )
+
+    def _host(self, url: str) -> _HostState:
+        host = urlparse(url).netloc
+        with self._hosts_lock:
+            state = self._hosts.get(host)
+            if state is None:
+                state = _HostState(semaphore=threading.BoundedSemaphore(self.per_host))
+                self._hosts[host] = state
+            return state
+
+    def fetch(self, tasks: Iterable[ImageTask]) -> Iterator[ImageResult]:
+        """
+        Загружает изображения и возвращает результаты по мере готовности.
+        Одновременно в работе не больше workers * 2 заданий,
+        поэтому список заданий может быть сколь угодно длинным.
+        Сведения о загруженных URL сохраняются в RemoteImage.
+        """
+        tasks = iter(tasks)
+        max_in_flight = self.workers * 2
+        batch_size = max_in_flight * 4
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='images') as executor:
+            in_flight = set()
+            pending = []
+            fetched = []
+            exhausted = False
+            while in_flight or pending or not exhausted:
+                if not pending and not exhausted:
+                    pending = self._next_batch(tasks, batch_size)
+                    exhausted = len(pending) < batch_size
+
+                while pending and len(in_flight) < max_in_flight:
+                    in_flight.add(executor.submit(self._run, pending.pop(0)))
+
+                if not in_flight:
+                    continue
+
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    result = future.result()
+                    if result.ok and not result.cached:
+                        fetched.append(result)
+                    yield result
+
+                if len(fetched) >= batch_size:
+                    self._remember(fetched)
+                    fetched = []
+
+            self._remember(fetched)
+
+    def _next_batch(self, tasks: Iterator[ImageTask], size: int) -> list:
+        """Берёт следующую пачку заданий и подставляет сведения о загруженных ранее URL"""
+        batch = []
+        for task in tasks:
+            batch.append(task)
+            if len(batch) >= size:
+                break
+
+        urls = {task.url for task in batch if task.known is None}
+        if urls:
+            known = {image.url: image for image in RemoteImage.objects.filter(url__in=urls)}
+            for task in batch:
+                if task.known is None:
+                    task.known = known.get(task.url)
+        return batch
+
+    def _remember(self, results: list):
+        """Сохраняет соответствие URL -> файл одним запросом"""
+        if not results:
+            return
+
+        records = {}
+        for result in results:
+            records[result.task.url] = RemoteImage(
+                url=result.task.url,
+                etag=result.etag[:255],
+                last_modified=result.last_modified[:64],
+                sha256=result.sha256,
+                name=result.name,
+            )
+        RemoteImage.objects.bulk_create(
+            records.values(),
+            update_conflicts=True,
+            unique_fields=['url'],
+            update_fields=['etag', 'last_modified', 'sha256', 'name', 'fetched_at'],
+        )
+
+    def _run(self, task: ImageTask) -> ImageResult:
+        try:
+            known = task.known
+            if known and not self.revalidate and self.storage.exists(known.name):
+                return ImageResult(task=task, name=known.name, sha256=known.sha256, cached=True)
+            return self._download(task)
+        except Exception as e:
+            logger.warning(f'Ошибка загрузки изображения {task.url}: {e}')
+            return ImageResult(task=task, error=e)
+
+    def _download(self, task: ImageTask) -> ImageResult:
+        host = self._host(task.url)
+
+        # Условный запрос, если файл из прошлой загрузки на месте
+        known = task.known if task.known and self.storage.exists(task.known.name) else None
+        headers = {}
+        if known and known.etag:
+            headers['If-None-Match'] = known.etag
+        if known and known.last_modified:
+            headers['If-Modified-Since'] = known.last_modified
+
+        for attempt in range(1, MAX_THROTTLE_RETRIES + 1):
+            host.wait_turn()
+            with host.semaphore:
+                response = self.http.get(
+                    task.url, endpoint=urlparse(task.url).netloc, headers=headers, stream=True,
+                )
+                try:
+                    if response.status_code == 429:
+                        retry_after = _parse_retry_after(response.headers.get('Retry-After'))
+                        delay = host.throttled(retry_after)
+                        logger.info(
+                            f'429 от {urlparse(task.url).netloc}, пауза {delay:.1f} сек '
+                            f'(попытка {attempt}/{MAX_THROTTLE_RETRIES})'
+                        )
+                        continue
+
+                    if response.status_code == 304 and known:
+                        result = ImageResult(task=task, name=known.name, sha256=known.sha256, cached=True)
+                    else:
+                        response.raise_for_status()
+                        result = self._store(task, response)
+                finally:
+                    response.close()
+
+            host.succeeded()
+            return result
+
+        raise ImageThrottled(f'Превышено количество попыток после 429: {task.url}')
+
+    def _store(self, task: ImageTask, response: requests.Response) -> ImageResult:
+        """
+        Потоково пишет тело ответа во временный файл, считая SHA-256,
+        и сохраняет его в хранилище под хэшем, если такого файла ещё нет.
+        """
+        ext = os.path.splitext(filename_from_url(task.url))[1].lstrip('.').lower()
+        if not ext:
+            content_type = response.headers.get('content-type', '').split(';')[0].strip().lower()
+            ext = CONTENT_TYPE_EXTENSIONS.get(content_type, 'jpg')
+
+        digest = hashlib.sha256()
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as tmp:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                if chunk:
+                    digest.update(chunk)
+                    tmp.write(chunk)
+            tmp.seek(0)
+
+            sha256 = digest.hexdigest()
+            name = blob_name(sha256, ext)
+            # Блокировка, чтобы два потока не записали одинаковый файл дважды
+            with self._store_locks[int(sha256[:2], 16)]:
+                if not self.storage.exists(name):
+                    name = self.storage.save(
+                        name,
+                        File(tmp, name=os.path.basename(name)),
+                        max_length=IMAGE_NAME_MAX_LENGTH,
+                    )
+
+        return ImageResult(
+            task=task,
+            name=name,
+            sha256=sha256,
+            etag=response.headers.get('ETag', ''),
+            last_modified=response.headers.get('Last-Modified', ''),
+        )
@@ -0,0 +1,164 @@
+"""
+Замер производительности синхронизации каталога из WooCommerce.
+
+Запускает этапы sync_woocommerce на синтетическом или записанном
+(sync_woocommerce --record) каталоге без обращения к магазину и выводит
+для каждого этапа время, количество SQL-запросов и время ожидания HTTP.
+Изображения из корпуса не загружаются. По умолчанию все изменения откатываются.
+
+Использование:
+    python manage.py bench_sync --products 2000 --variations 30
+    python manage.py bench_sync --corpus wc.jsonl.gz --latency 80
+    python manage.py bench_sync --runs 2
+
+Опции:
+    --products N        Размер синтетического каталога
+    --variations N      Вариаций у вариативного товара
+    --corpus PATH       Воспроизвести корпус вместо синтетического каталога
+    --latency MS        Задержка на каждый HTTP-запрос в миллисекундах
+    --runs N            Количество прогонов подряд (второй проверяет пропуск по хэшу)
+    --stock-only        Замерить быструю синхронизацию цен и остатков
+    --keep              Не откатывать изменения в БД
+"""
+import io
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from catalog.images import ImageDownloader
+from integrations.woocommerce import WooCommerceClient
+from integrations.woocommerce_fixtures import ReplayAPI, SyntheticAPI
+
+from .sync_woocommerce import Command as SyncCommand
+
+
+class QueryCounter:
+    """Считает SQL-запросы через connection.execute_wrapper"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = 'Замер производительности синхронизации WooCommerce на локальных данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--products',
+            type=int,
+            default=500,
+            help='Размер синтетического каталога (по умолчанию 500)',
+        )
+        parser.add_argument(
+            '--variations',
+            type=int,
+            default=20,
+            help='Вариаций у вариативного товара (по умолчанию 20)',
+        )
+        parser.add_argument(
+            '--corpus',
+            help='Путь к корпусу, записанному sync_woocommerce --record',
+        )
+        parser.add_argument(
+            '--latency',
+            type=float,
+            default=0,
+            help='Задержка на каждый HTTP-запрос в миллисекундах (по умолчанию 0)',
+        )
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=1,
+            help='Количество прогонов подряд (по умолчанию 1)',
+        )
+        parser.add_argument(
+            '--stock-only',
+            action='store_true',
+            help='Замерить быструю синхронизацию цен и остатков',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Не откатывать изменения в БД',
+        )
+
+    def handle(self, *args, **options):
+        latency = max(0.0, options['latency']) / 1000
+        if options['corpus']:
+            api = ReplayAPI(options['corpus'], latency=latency)
+            self.stdout.write(f'Корпус: {options["corpus"]} ({len(api.responses)} ответов)')
+        else:
+            api = SyntheticAPI(
+                products=options['products'],
+                variations=options['variations'],
+                latency=latency,
+            )
+            self.stdout.write(
+                f'Синтетический каталог: {api.products_count} товаров, '
+                f'{api.variations_count} вариаций у вариативных'
+            )
+        self.stdout.write(f'Задержка HTTP: {options["latency"]:.0f} мс')
+
+        with transaction.atomic():
+            for run in range(1, max(1, options['runs']) + 1):
+                self.stdout.write(f'\n=== Прогон {run} ===')
+                # Синтетические товары без изображений: хэши сохраняются как при обычной синхронизации
+                self._run(api, options['stock_only'], skip_images=bool(options['corpus']))
+
+            if not options['keep']:
+                transaction.set_rollback(True)
+                self.stdout.write('\nИзменения откатаны')
+
+    def _run(self, api, stock_only, skip_images):
+        sync = SyncCommand(stdout=io.StringIO(), stderr=io.StringIO())
+        sync.client = WooCommerceClient(api=api)
+        sync.skip_images = skip_images
+        sync.verbose = False
+        sync.stock_only = stock_only
+        sync.image_downloader = ImageDownloader()
+
+        if stock_only:
+            phases = [('Цены и остатки', lambda: sync._sync_stock(0))]
+        else:
+            phases = [
+                ('Кэши', sync._load_caches),
+                ('Категории', sync._sync_categories),
+                ('Атрибуты', sync._sync_attributes),
+                ('Товары', lambda: sync._sync_products(0)),
+            ]
+
+        self.stdout.write(f'{"Этап":<16}{"Время, с":>10}{"SQL":>10}{"HTTP":>8}{"HTTP, с":>10}')
+        total_time = total_queries = total_requests = total_wait = 0
+        for name, phase in phases:
+            counter = QueryCounter()
+            requests_before, wait_before = api.requests, api.wait_time
+            started = time.perf_counter()
+            with connection.execute_wrapper(counter):
+                phase()
+            elapsed = time.perf_counter() - started
+            requests = api.requests - requests_before
+            wait = api.wait_time - wait_before
+
+            self.stdout.write(
+                f'{name:<16}{elapsed:>10.2f}{counter.count:>10}{requests:>8}{wait:>10.2f}'
+            )
+            total_time += elapsed
+            total_queries += counter.count
+            total_requests += requests
+            total_wait += wait
+
+        self.stdout.write(
+            f'{"Итого":<16}{total_time:>10.2f}{total_queries:>10}{total_requests:>8}{total_wait:>10.2f}'
+        )
+        stats = sync.stats
+        self.stdout.write(
+            f'Товары: +{stats["products_created"]} / обновлено {stats["products_updated"]} / '
+            f'без изменений {stats["products_skipped"]} (по хэшу {stats["products_unchanged"]}); '
+            f'вариации: +{stats["variants_created"]} / обновлено {stats["variants_updated"]} / '
+            f'без изменений {stats["variants_skipped"]}'
+        )
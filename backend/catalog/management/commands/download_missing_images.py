@@ -4,15 +4,14 @@
 """
 import os
 import csv
-import requests
-import time
-from urllib.parse import urlparse
 from decimal import Decimal, InvalidOperation
 
-from django.core.files.base import ContentFile
 from django.core.management.base import BaseCommand
-from django.db import transaction
 
+from catalog.images import (
+    ImageDownloader, ImageTask, attach_product_image,
+    DEFAULT_WORKERS, DEFAULT_PER_HOST,
+)
 from catalog.models import Product, ProductImage
 
 
@@ -45,24 +44,24 @@ class Command(BaseCommand):
             help='Не пропускать товары с уже загруженными изображениями',
         )
         parser.add_argument(
-            '--delay',
-            type=float,
-            default=0.5,
-            help='Задержка между загрузками изображений в секундах (по умолчанию: 0.5)',
+            '--workers',
+            type=int,
+            default=DEFAULT_WORKERS,
+            help=f'Количество потоков загрузки (по умолчанию: {DEFAULT_WORKERS})',
         )
         parser.add_argument(
-            '--batch-size',
+            '--per-host',
             type=int,
-            default=10,
-            help='Количество товаров между паузами (по умолчанию: 10)',
+            default=DEFAULT_PER_HOST,
+            help=f'Максимум одновременных запросов к одному хосту (по умолчанию: {DEFAULT_PER_HOST})',
         )
 
     def handle(self, *args, **options):
         csv_file = options['csv_file']
         start_from = options['start_from']
         skip_existing = options['skip_existing']
-        delay = options['delay']
-        batch_size = options['batch_size']
+        workers = options['workers']
+        per_host = options['per_host']
 
         # Проверяем существование файла
         if not os.path.exists(csv_file):
@@ -85,8 +84,8 @@ class Command(BaseCommand):
             sku_to_images,
             start_from,
             skip_existing,
-            delay,
-            batch_size
+            workers,
+            per_host
         )
 
     def _load_image_urls_from_csv(self, csv_file):
@@ -122,177 +121,94 @@ class Command(BaseCommand):
             self.stderr.write(self.style.ERROR(f'Ошибка чтения CSV: {e}'))
             return {}
 
-    def _process_products(self, sku_to_images, start_from, skip_existing, delay, batch_size):
+    def _process_products(self, sku_to_images, start_from, skip_existing, workers, per_host):
         """Обрабатывает товары и загружает изображения"""
         total_skus = len(sku_to_images)
-        processed = 0
-        successful = 0
-        failed = 0
-
-        # Создаем сессию с retry
-        session = self._create_session()
-
         items = list(sku_to_images.items())[start_from:]
 
-        for idx, (sku, urls) in enumerate(items, start=1):
-            try:
-                # Ищем товар по SKU
-                product = Product.objects.filter(sku=sku).first()
-                if not product:
-                    self.stdout.write(self.style.WARNING(f'[{idx}/{total_skus}] Товар с SKU {sku} не найден'))
-                    failed += 1
-                    continue
+        # Товары и уже загруженные изображения - одним запросом каждого вида
+        products_by_sku = {}
+        for product in Product.objects.filter(sku__in=[sku for sku, _ in items]):
+            products_by_sku.setdefault(product.sku, product)
 
-                self.stdout.write(f'\n[{idx}/{total_skus}] Товар: {product.name}')
-                self.stdout.write(f'   SKU: {sku}')
-
-                # Проверяем существующие изображения
-                if skip_existing:
-                    existing_count = self._count_existing_images(product)
-                    if existing_count >= len(urls):
-                        self.stdout.write(self.style.SUCCESS(f'   ✅ Все {existing_count} изображений уже загружены, пропускаем'))
-                        processed += 1
-                        continue
-                    elif existing_count > 0:
-                        self.stdout.write(f'   ℹ️  Уже загружено {existing_count} из {len(urls)} изображений')
-
-                # Загружаем изображения
-                downloaded = self._download_product_images(
-                    product, urls, session, delay
-                )
-
-                if downloaded > 0:
-                    self.stdout.write(self.style.SUCCESS(f'   ✅ Загружено {downloaded} новых изображений'))
-                    successful += 1
-                else:
-                    self.stdout.write(f'   ℹ️  Новых изображений не загружено')
-
-                processed += 1
-
-                # Пауза после batch_size товаров
-                if processed % batch_size == 0:
-                    self.stdout.write(f'\n⏸️  Пауза 2 секунды...')
-                    time.sleep(2)
+        gallery_sorts = {}
+        for product_id, sort in ProductImage.objects.filter(
+            product__in=products_by_sku.values()
+        ).values_list('product_id', 'sort'):
+            gallery_sorts.setdefault(product_id, set()).add(sort)
 
-            except Exception as e:
-                self.stderr.write(self.style.ERROR(f'   ❌ Ошибка обработки товара {sku}: {e}'))
+        processed = 0
+        failed = 0
+        tasks = []
+
+        for idx, (sku, urls) in enumerate(items, start=start_from + 1):
+            product = products_by_sku.get(sku)
+            if not product:
+                self.stdout.write(self.style.WARNING(f'[{idx}/{total_skus}] Товар с SKU {sku} не найден'))
                 failed += 1
                 continue
 
-        # Итоговая статистика
-        self.stdout.write(self.style.SUCCESS('\n' + '=' * 60))
-        self.stdout.write(self.style.SUCCESS('ИТОГОВАЯ СТАТИСТИКА:'))
-        self.stdout.write(self.style.SUCCESS('=' * 60))
-        self.stdout.write(self.style.SUCCESS(f'Всего товаров в CSV: {total_skus}'))
-        self.stdout.write(self.style.SUCCESS(f'Обработано: {processed}'))
-        self.stdout.write(self.style.SUCCESS(f'Успешно обновлено: {successful}'))
-        self.stdout.write(self.style.SUCCESS(f'Не найдено в БД: {failed}'))
-        self.stdout.write(self.style.SUCCESS('=' * 60))
-
-    def _create_session(self):
-        """Создает requests сессию с retry"""
-        from requests.adapters import HTTPAdapter
-        from urllib3.util.retry import Retry
+            processed += 1
+            existing_sorts = gallery_sorts.get(product.id, set())
 
-        session = requests.Session()
-
-        retry = Retry(
-            total=3,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504]
-        )
-
-        adapter = HTTPAdapter(max_retries=retry)
-        session.mount('http://', adapter)
-        session.mount('https://', adapter)
+            # Проверяем существующие изображения
+            if skip_existing:
+                existing_count = (1 if product.main_image else 0) + len(existing_sorts)
+                if existing_count >= len(urls):
+                    self.stdout.write(self.style.SUCCESS(
+                        f'[{idx}/{total_skus}] {product.name}: все {existing_count} изображений уже загружены'
+                    ))
+                    continue
 
-        return session
+            for i, url in enumerate(urls):
+                if i == 0 and product.main_image:
+                    continue
+                if i > 0 and i in existing_sorts:
+                    continue
 
-    def _count_existing_images(self, product):
-        """Считает количество уже загруженных изображений"""
-        count = 0
+                tasks.append(ImageTask(
+                    url=url,
+                    context={'product': product, 'sort': i},
+                ))
 
-        # Главное изображение
-        if product.main_image:
-            count += 1
+        self.stdout.write(f'\n📥 Изображений к загрузке: {len(tasks)}')
 
-        # Дополнительные изображения
-        # Используем правильное имя связи - images вместо productimage_set
-        count += product.images.count()
+        # Загружаем параллельно и привязываем в основном потоке
+        downloader = ImageDownloader(workers=workers, per_host=per_host, timeout=30)
+        downloaded_by_product = {}
+        errors = 0
 
-        return count
+        for result in downloader.fetch(tasks):
+            product = result.task.context['product']
+            sort = result.task.context['sort']
 
-    def _download_product_images(self, product, urls, session, delay):
-        """Загружает изображения для товара"""
-        downloaded = 0
+            if not result.ok:
+                self.stderr.write(self.style.ERROR(f'   ❌ Ошибка загрузки {result.task.url}: {result.error}'))
+                errors += 1
+                continue
 
-        for i, url in enumerate(urls):
             try:
-                # Пауза между загрузками
-                if i > 0:
-                    time.sleep(delay)
-
-                # Проверяем, нужно ли загружать это изображение
-                if i == 0 and product.main_image:
-                    self.stdout.write(f'   ⏭️  Главное изображение уже есть, пропускаем')
-                    continue
-
-                # Пропускаем если дополнительное изображение уже существует
-                if i > 0 and self._additional_image_exists(product, i):
-                    self.stdout.write(f'   ⏭️  Дополнительное изображение {i} уже есть, пропускаем')
-                    continue
-
-                self.stdout.write(f'   📥 Загрузка изображения {i+1}/{len(urls)}...')
-
-                response = session.get(url, timeout=30)
-                response.raise_for_status()
-
-                # Определяем имя файла
-                parsed = urlparse(url)
-                filename = os.path.basename(parsed.path)
-                if not filename or '.' not in filename:
-                    # Определяем расширение по content-type
-                    content_type = response.headers.get('content-type', '')
-                    if 'jpeg' in content_type or 'jpg' in content_type:
-                        ext = 'jpg'
-                    elif 'png' in content_type:
-                        ext = 'png'
-                    elif 'webp' in content_type:
-                        ext = 'webp'
-                    else:
-                        ext = 'jpg'
-
-                    filename = f'{product.slug}-{i+1}.{ext}'
-
-                # Создаем ContentFile
-                content = ContentFile(response.content, name=filename)
-
-                if i == 0:
-                    # Главное изображение
-                    product.main_image.save(filename, content, save=True)
-                    self.stdout.write(self.style.SUCCESS(f'   ✅ Главное изображение сохранено'))
-                else:
-                    # Дополнительное изображение
-                    # Используем правильную связь
-                    product_image = ProductImage.objects.create(
-                        product=product,
-                        sort=i
-                    )
-                    product_image.image.save(filename, content, save=True)
-                    self.stdout.write(self.style.SUCCESS(f'   ✅ Дополнительное изображение {i} сохранено'))
-
-                downloaded += 1
-
+                attach_product_image(product.id, result.name, sort == 0, sort)
             except Exception as e:
-                self.stderr.write(self.style.ERROR(f'   ❌ Ошибка загрузки {url}: {e}'))
+                self.stderr.write(self.style.ERROR(f'   ❌ Ошибка сохранения изображения товара {product.sku}: {e}'))
+                errors += 1
                 continue
 
-        return downloaded
+            downloaded_by_product[product.id] = downloaded_by_product.get(product.id, 0) + 1
+            kind = 'Главное изображение' if sort == 0 else f'Дополнительное изображение {sort}'
+            self.stdout.write(self.style.SUCCESS(f'   ✅ {product.name}: {kind} сохранено'))
 
-    def _additional_image_exists(self, product, index):
-        """Проверяет, существует ли дополнительное изображение с данным индексом"""
-        # Проверяем, есть ли изображение с таким sort
-        return product.images.filter(sort=index).exists()
+        # Итоговая статистика
+        self.stdout.write(self.style.SUCCESS('\n' + '=' * 60))
+        self.stdout.write(self.style.SUCCESS('ИТОГОВАЯ СТАТИСТИКА:'))
+        self.stdout.write(self.style.SUCCESS('=' * 60))
+        self.stdout.write(self.style.SUCCESS(f'Всего товаров в CSV: {total_skus}'))
+        self.stdout.write(self.style.SUCCESS(f'Обработано: {processed}'))
+        self.stdout.write(self.style.SUCCESS(f'Успешно обновлено: {len(downloaded_by_product)}'))
+        self.stdout.write(self.style.SUCCESS(f'Загружено изображений: {sum(downloaded_by_product.values())}'))
+        self.stdout.write(self.style.SUCCESS(f'Ошибок загрузки: {errors}'))
+        self.stdout.write(self.style.SUCCESS(f'Не найдено в БД: {failed}'))
+        self.stdout.write(self.style.SUCCESS('=' * 60))
 
     def _parse_decimal(self, value, default=None):
         """Парсит строку в Decimal"""
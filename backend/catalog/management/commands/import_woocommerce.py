@@ -8,21 +8,36 @@
     --dry-run       Пробный запуск без сохранения в БД
     --skip-images   Пропустить загрузку изображений
     --limit N       Импортировать только N родительских товаров
+    --chunk-size N  Сколько родительских товаров сохранять одной транзакцией
+    --image-workers N  Количество потоков загрузки изображений
+
+Файл читается потоково: кодировка определяется один раз по началу файла,
+строки группируются в товары с вариациями на лету, а товары, значения
+атрибутов и вариации сохраняются пачками через bulk_create.
+Уже импортированные товары и занятые slug проверяются запросом к БД
+на каждую пачку; в памяти остаются только справочники и id созданных
+товаров по артикулу.
+
+Если артикул родительского товара повторяется, побеждает последняя строка:
+более ранний товар с тем же артикулом, созданный этим импортом, заменяется.
+Товары, созданные во время импорта другими (админка, синхронизация),
+не затрагиваются.
 """
+import codecs
 import csv
 import os
-import requests
 from decimal import Decimal, InvalidOperation
-from urllib.parse import urlparse
 
-from django.core.files.base import ContentFile
 from django.core.management.base import BaseCommand
 from django.db import transaction
 from django.utils.text import slugify
 from transliterate import translit
 
+from catalog.images import (
+    ImageDownloader, ImageTask, attach_product_image,
+)
 from catalog.models import (
-    Category, Brand, Product, ProductImage,
+    Category, Brand, Product,
     Attribute, AttributeValue, ProductAttributeValue, ProductVariant
 )
 
@@ -40,6 +55,15 @@ def make_slug(text):
     return slugify(text_latin)
 
 
+# Кодировки экспорта WooCommerce в порядке проверки
+CSV_ENCODINGS = ['utf-8-sig', 'utf-8', 'cp1251', 'latin-1']
+
+# Сколько байт читать для определения кодировки
+ENCODING_SAMPLE_SIZE = 256 * 1024
+
+DEFAULT_CHUNK_SIZE = 200
+
+
 class Command(BaseCommand):
     help = 'Импорт товаров из WooCommerce CSV экспорта'
 
@@ -61,12 +85,26 @@ class Command(BaseCommand):
             default=0,
             help='Импортировать только N родительских товаров (0 = все)',
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help=f'Сколько родительских товаров сохранять одной транзакцией (по умолчанию {DEFAULT_CHUNK_SIZE})',
+        )
+        parser.add_argument(
+            '--image-workers',
+            type=int,
+            default=8,
+            help='Количество потоков загрузки изображений (по умолчанию 8)',
+        )
 
     def handle(self, *args, **options):
         csv_file = options['csv_file']
         dry_run = options['dry_run']
         skip_images = options['skip_images']
         limit = options['limit']
+        chunk_size = max(1, options.get('chunk_size') or DEFAULT_CHUNK_SIZE)
+        self.image_workers = options.get('image_workers', 8)
 
         if not os.path.exists(csv_file):
             self.stderr.write(self.style.ERROR(f'Файл не найден: {csv_file}'))
@@ -74,33 +112,31 @@ class Command(BaseCommand):
 
         self.stdout.write(f'Чтение файла: {csv_file}')
 
-        # Читаем CSV файл
-        rows = self._read_csv(csv_file)
-        if not rows:
-            self.stderr.write(self.style.ERROR('CSV файл пуст'))
+        encoding = self._detect_encoding(csv_file)
+        if not encoding:
+            self.stderr.write(self.style.ERROR('Не удалось определить кодировку CSV файла'))
             return
+        self.stdout.write(f'Кодировка: {encoding}')
 
-        self.stdout.write(f'Найдено {len(rows)} строк')
-
-        # Группируем строки по родительским товарам
-        products_data = self._group_products(rows)
-        self.stdout.write(f'Найдено {len(products_data)} родительских товаров')
-
-        if limit > 0:
-            products_data = dict(list(products_data.items())[:limit])
-            self.stdout.write(f'Ограничено до {len(products_data)} товаров')
+        # Родительские товары с вариациями читаются из файла по одному
+        products_iter = self._iter_products(csv_file, encoding, limit)
 
         if dry_run:
             self.stdout.write(self.style.WARNING('РЕЖИМ ПРОБНОГО ЗАПУСКА - изменения не будут сохранены'))
-            self._print_preview(products_data)
+            count = self._print_preview(products_iter)
+            self.stdout.write(f'\nНайдено {count} родительских товаров')
             return
 
-        # Импортируем данные
-        with transaction.atomic():
-            stats = self._import_products(products_data, skip_images)
+        # Импортируем данные пачками
+        stats = self._import_products(products_iter, skip_images, chunk_size)
+
+        if not stats['rows']:
+            self.stderr.write(self.style.ERROR('CSV файл пуст'))
+            return
 
         self.stdout.write(self.style.SUCCESS(
             f'\nИмпорт завершён:\n'
+            f'  Строк: {stats["rows"]}\n'
             f'  Категорий: {stats["categories"]}\n'
             f'  Брендов: {stats["brands"]}\n'
             f'  Атрибутов: {stats["attributes"]}\n'
@@ -110,61 +146,73 @@ class Command(BaseCommand):
             f'  Изображений: {stats["images"]}'
         ))
 
-    def _read_csv(self, csv_file):
-        """Читает CSV файл с учётом BOM и разных кодировок"""
-        rows = []
-        # Пробуем разные кодировки
-        encodings = ['utf-8-sig', 'utf-8', 'cp1251', 'latin-1']
+    def _detect_encoding(self, csv_file):
+        """Определяет кодировку по началу файла, не читая его целиком"""
+        with open(csv_file, 'rb') as f:
+            sample = f.read(ENCODING_SAMPLE_SIZE)
 
-        for encoding in encodings:
+        if not sample:
+            return CSV_ENCODINGS[0]
+
+        for encoding in CSV_ENCODINGS:
+            if encoding == 'utf-8-sig' and not sample.startswith(codecs.BOM_UTF8):
+                continue
             try:
-                with open(csv_file, 'r', encoding=encoding, newline='') as f:
-                    reader = csv.DictReader(f)
-                    rows = list(reader)
-                    if rows:
-                        self.stdout.write(f'Кодировка: {encoding}')
-                        break
-            except (UnicodeDecodeError, csv.Error):
+                # final=False: многобайтовый символ может быть обрезан концом выборки
+                codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+                return encoding
+            except UnicodeDecodeError:
                 continue
 
-        return rows
+        return None
 
-    def _group_products(self, rows):
+    def _iter_products(self, csv_file, encoding, limit=0):
         """
-        Группирует строки по родительским товарам.
-        Родительский товар определяется по наличию описания или категории.
-        """
-        products = {}
-        current_parent = None
-
-        for row in rows:
-            sku = (row.get('Артикул') or '').strip()
-            name = (row.get('Имя') or '').strip()
-            description = (row.get('Описание') or '').strip()
-            category = (row.get('Категории') or '').strip()
-            images = (row.get('Изображения') or '').strip()
+        Читает CSV построчно и отдаёт родительские товары по одному.
+        Родительский товар определяется по наличию описания, категории или изображений,
+        следующие за ним строки с тем же именем - его вариации.
 
-            if not sku or not name:
-                continue
+        Yields:
+            (sku, {'parent': row, 'variations': [row, ...]})
+        """
+        self.rows_read = 0
+        current_sku = None
+        current = None
+        yielded = 0
+
+        with open(csv_file, 'r', encoding=encoding, newline='') as f:
+            for row in csv.DictReader(f):
+                self.rows_read += 1
+                sku = (row.get('Артикул') or '').strip()
+                name = (row.get('Имя') or '').strip()
+                description = (row.get('Описание') or '').strip()
+                category = (row.get('Категории') or '').strip()
+                images = (row.get('Изображения') or '').strip()
+
+                if not sku or not name:
+                    continue
 
-            # Определяем, является ли строка родительским товаром
-            is_parent = bool(description or category or images)
+                # Определяем, является ли строка родительским товаром
+                if description or category or images:
+                    if current is not None:
+                        yield current_sku, current
+                        yielded += 1
+                        if limit > 0 and yielded >= limit:
+                            return
 
-            if is_parent:
-                current_parent = sku
-                products[sku] = {
-                    'parent': row,
-                    'variations': []
-                }
-            elif current_parent and name == (products[current_parent]['parent'].get('Имя') or '').strip():
-                # Это вариация текущего родительского товара
-                products[current_parent]['variations'].append(row)
+                    current_sku, current = sku, {'parent': row, 'variations': []}
+                elif current is not None and name == (current['parent'].get('Имя') or '').strip():
+                    # Это вариация текущего родительского товара
+                    current['variations'].append(row)
 
-        return products
+        if current is not None:
+            yield current_sku, current
 
-    def _print_preview(self, products_data):
-        """Выводит предпросмотр данных для импорта"""
-        for sku, data in products_data.items():
+    def _print_preview(self, products_iter):
+        """Выводит предпросмотр данных для импорта, возвращает количество товаров"""
+        count = 0
+        for sku, data in products_iter:
+            count += 1
             parent = data['parent']
             variations = data['variations']
 
@@ -182,6 +230,8 @@ class Command(BaseCommand):
                     values_count = len(attr_data['values'].split(',')) if attr_data['values'] else 0
                     self.stdout.write(f'    - {attr_name}: {values_count} значений')
 
+        return count
+
     def _extract_attributes(self, row):
         """Извлекает атрибуты из строки CSV"""
         attributes = {}
@@ -215,9 +265,10 @@ class Command(BaseCommand):
 
         return attributes
 
-    def _import_products(self, products_data, skip_images):
-        """Импортирует товары в БД"""
+    def _import_products(self, products_iter, skip_images, chunk_size):
+        """Импортирует товары в БД пачками по chunk_size родительских товаров"""
         stats = {
+            'rows': 0,
             'categories': 0,
             'brands': 0,
             'attributes': 0,
@@ -227,95 +278,178 @@ class Command(BaseCommand):
             'images': 0,
         }
 
-        # Кэш для созданных объектов
-        categories_cache = {}
-        brands_cache = {}
-        attributes_cache = {}
-        attr_values_cache = {}
-
-        for sku, data in products_data.items():
-            parent = data['parent']
-            variations = data['variations']
+        # Кэши живут всё время импорта: справочников немного, товаров - сколько угодно
+        self.caches = {
+            'categories': {},
+            'brands': {},
+            'attributes': {},
+            'attr_values': {},
+        }
+        # Артикул -> id товара, созданного этим импортом
+        self.created_ids = {}
+
+        # Повторный артикул внутри пачки перезаписывает данные (последняя строка побеждает)
+        chunk = {}
+        for sku, data in products_iter:
+            if sku in chunk:
+                self.stderr.write(f'Повторный артикул {sku}: используется последняя строка')
+            chunk[sku] = data
+            if len(chunk) >= chunk_size:
+                self._import_chunk(list(chunk.items()), skip_images, stats)
+                chunk = {}
+        if chunk:
+            self._import_chunk(list(chunk.items()), skip_images, stats)
+
+        stats['rows'] = getattr(self, 'rows_read', 0)
+        return stats
 
-            self.stdout.write(f'Импорт: {parent.get("Имя") or ""}')
+    def _import_chunk(self, chunk, skip_images, stats):
+        """Сохраняет пачку товаров: товары, значения атрибутов и вариации - bulk_create"""
+        categories_cache = self.caches['categories']
+        brands_cache = self.caches['brands']
+        attributes_cache = self.caches['attributes']
+        attr_values_cache = self.caches['attr_values']
 
-            # 1. Создаём/получаем категорию
-            category_name = (parent.get('Категории') or '').strip()
-            category = self._get_or_create_category(category_name, categories_cache)
-            if category and category_name not in categories_cache:
-                categories_cache[category_name] = category
-                stats['categories'] += 1
+        with transaction.atomic():
+            self._replace_earlier_duplicates([sku for sku, _ in chunk], stats)
 
-            if not category:
-                self.stderr.write(f'  Пропуск: нет категории')
-                continue
+            # 1. Справочники и несохранённые товары
+            prepared = []
+            for sku, data in chunk:
+                parent = data['parent']
 
-            # 2. Создаём/получаем бренд
-            brand_name = (parent.get('Бренды') or '').strip()
-            brand = self._get_or_create_brand(brand_name, brands_cache)
-            if brand and brand_name not in brands_cache:
-                brands_cache[brand_name] = brand
-                stats['brands'] += 1
+                self.stdout.write(f'Импорт: {parent.get("Имя") or ""}')
 
-            # 3. Создаём товар (передаём вариации для определения цены)
-            product = self._create_product(parent, category, brand, sku, variations)
-            stats['products'] += 1
+                # Создаём/получаем категорию
+                category_name = (parent.get('Категории') or '').strip()
+                category = self._get_or_create_category(category_name, categories_cache)
+                if category and category_name not in categories_cache:
+                    categories_cache[category_name] = category
+                    stats['categories'] += 1
 
-            # 4. Загружаем изображения
-            if not skip_images:
-                images_count = self._download_images(product, parent.get('Изображения') or '')
-                stats['images'] += images_count
+                if not category:
+                    self.stderr.write(f'  Пропуск: нет категории')
+                    continue
 
-            # 5. Извлекаем и создаём атрибуты
-            attributes = self._extract_attributes(parent)
-            product_attr_values = []
+                # Создаём/получаем бренд
+                brand_name = (parent.get('Бренды') or '').strip()
+                brand = self._get_or_create_brand(brand_name, brands_cache)
+                if brand and brand_name not in brands_cache:
+                    brands_cache[brand_name] = brand
+                    stats['brands'] += 1
 
-            for attr_name, attr_data in attributes.items():
-                # Создаём/получаем атрибут
-                attribute = self._get_or_create_attribute(
-                    attr_name,
-                    attr_data['visible'],
-                    attr_data['global'],
-                    attributes_cache
-                )
-                if attr_name not in attributes_cache:
-                    attributes_cache[attr_name] = attribute
-                    stats['attributes'] += 1
-
-                # Создаём значения атрибута
-                values_str = attr_data['values']
-                # Разделяем значения (могут быть через запятую)
-                values = self._parse_attribute_values(values_str)
-
-                for value in values:
-                    value = value.strip()
-                    if not value:
-                        continue
-
-                    cache_key = f'{attr_name}:{value}'
-                    attr_value = self._get_or_create_attr_value(
-                        attribute, value, attr_values_cache
-                    )
-                    if cache_key not in attr_values_cache:
-                        attr_values_cache[cache_key] = attr_value
-                        stats['attribute_values'] += 1
+                # Цена берётся из вариаций, если у родителя её нет
+                product = self._build_product(parent, category, brand, sku, data['variations'])
+                prepared.append((product, data))
 
-                    product_attr_values.append(attr_value)
+            self._assign_unique_slugs([product for product, _ in prepared])
+            Product.objects.bulk_create([product for product, _ in prepared])
+            stats['products'] += len(prepared)
+            self.created_ids.update((product.sku, product.pk) for product, _ in prepared)
 
-                    # Связываем с товаром
-                    ProductAttributeValue.objects.get_or_create(
-                        product=product,
-                        attribute=attribute,
-                        attribute_value=attr_value
+            # 2. Атрибуты товаров и вариации
+            product_attr_values = []
+            variants = []
+            variant_values = []
+            image_tasks = []
+
+            for product, data in prepared:
+                parent = data['parent']
+
+                for attr_name, attr_data in self._extract_attributes(parent).items():
+                    # Создаём/получаем атрибут
+                    attribute = self._get_or_create_attribute(
+                        attr_name,
+                        attr_data['visible'],
+                        attr_data['global'],
+                        attributes_cache
                     )
-
-            # 6. Создаём вариации
-            for var_row in variations:
-                variant = self._create_variant(product, var_row, attributes_cache, attr_values_cache)
-                if variant:
-                    stats['variants'] += 1
-
-        return stats
+                    if attr_name not in attributes_cache:
+                        attributes_cache[attr_name] = attribute
+                        stats['attributes'] += 1
+
+                    # Разделяем значения (могут быть через запятую)
+                    for value in self._parse_attribute_values(attr_data['values']):
+                        value = value.strip()
+                        if not value:
+                            continue
+
+                        cache_key = f'{attr_name}:{value}'
+                        attr_value = self._get_or_create_attr_value(
+                            attribute, value, attr_values_cache
+                        )
+                        if cache_key not in attr_values_cache:
+                            attr_values_cache[cache_key] = attr_value
+                            stats['attribute_values'] += 1
+
+                        product_attr_values.append(ProductAttributeValue(
+                            product=product,
+                            attribute=attribute,
+                            attribute_value=attr_value,
+                        ))
+
+                for var_row in data['variations']:
+                    built = self._build_variant(product, var_row, attributes_cache, attr_values_cache)
+                    if built:
+                        variants.append(built[0])
+                        variant_values.append(built[1])
+
+                if not skip_images:
+                    image_tasks.extend(self._image_tasks(product, parent.get('Изображения') or ''))
+
+            ProductAttributeValue.objects.bulk_create(product_attr_values, ignore_conflicts=True)
+
+            ProductVariant.objects.bulk_create(variants)
+            Through = ProductVariant.attribute_values.through
+            Through.objects.bulk_create(
+                [
+                    Through(productvariant_id=variant.pk, attributevalue_id=attr_value.pk)
+                    for variant, values in zip(variants, variant_values)
+                    for attr_value in {av.pk: av for av in values}.values()
+                ],
+                ignore_conflicts=True,
+            )
+            stats['variants'] += len(variants)
+
+        # 3. Изображения пачки - после фиксации транзакции, чтобы не держать её во время загрузки
+        if image_tasks:
+            self.stdout.write(f'Загрузка изображений: {len(image_tasks)}')
+            stats['images'] += self._download_images(image_tasks)
+
+    def _replace_earlier_duplicates(self, skus, stats):
+        """
+        Удаляет товары с теми же артикулами, созданные этим импортом в предыдущих
+        пачках: повторная строка в файле заменяет более раннюю, как при чтении
+        всего файла в словарь
+        """
+        earlier_ids = [self.created_ids.pop(sku) for sku in skus if sku in self.created_ids]
+        if not earlier_ids:
+            return
+        earlier = Product.objects.filter(pk__in=earlier_ids)
+        for sku in earlier.order_by().values_list('sku', flat=True):
+            self.stderr.write(f'Повторный артикул {sku}: ранее импортированный товар заменён')
+        _, deleted = earlier.delete()
+        stats['products'] -= deleted.get(Product._meta.label, 0)
+        stats['variants'] -= deleted.get(ProductVariant._meta.label, 0)
+
+    def _assign_unique_slugs(self, products):
+        """Подбирает уникальные slug для пачки товаров несколькими запросами на пачку"""
+        bases = {product.slug for product in products}
+        taken = set(Product.objects.filter(slug__in=bases).values_list('slug', flat=True))
+        for base in bases & taken:
+            taken.update(
+                Product.objects.filter(slug__startswith=f'{base}-').values_list('slug', flat=True)
+            )
+
+        for product in products:
+            base_slug = product.slug
+            slug = base_slug
+            counter = 1
+            while slug in taken:
+                slug = f'{base_slug}-{counter}'
+                counter += 1
+            product.slug = slug
+            taken.add(slug)
 
     def _get_or_create_category(self, name, cache):
         """Создаёт или получает категорию по имени"""
@@ -452,18 +586,11 @@ class Command(BaseCommand):
 
         return [v for v in values if v]
 
-    def _create_product(self, row, category, brand, sku, variations=None):
-        """Создаёт товар"""
+    def _build_product(self, row, category, brand, sku, variations=None):
+        """Создаёт несохранённый товар (slug уточняется в _assign_unique_slugs)"""
         name = (row.get('Имя') or '').strip()
         slug = make_slug(name)
 
-        # Проверяем уникальность slug
-        base_slug = slug
-        counter = 1
-        while Product.objects.filter(slug=slug).exists():
-            slug = f'{base_slug}-{counter}'
-            counter += 1
-
         # Парсим числовые поля
         price = self._parse_decimal(row.get('Базовая цена'), default=Decimal('0'))
 
@@ -484,7 +611,7 @@ class Command(BaseCommand):
         if weight:
             weight = weight / 1000
 
-        product = Product.objects.create(
+        return Product(
             name=name,
             slug=slug,
             sku=sku,
@@ -500,10 +627,8 @@ class Command(BaseCommand):
             is_active=True,
         )
 
-        return product
-
-    def _create_variant(self, product, row, attributes_cache, attr_values_cache):
-        """Создаёт вариацию товара"""
+    def _build_variant(self, product, row, attributes_cache, attr_values_cache):
+        """Создаёт несохранённую вариацию товара и список её значений атрибутов"""
         sku = (row.get('Артикул') or '').strip()
         price = self._parse_decimal(row.get('Базовая цена'))
 
@@ -540,57 +665,46 @@ class Command(BaseCommand):
             return None
 
         # Создаём вариацию (stock=1 чтобы товар отображался на фронте)
-        variant = ProductVariant.objects.create(
+        variant = ProductVariant(
             product=product,
             sku=sku,
             price=price if price else None,
             stock=1,  # Ставим 1 по умолчанию, чтобы товар был виден
             is_active=True,
         )
-        variant.attribute_values.set(variant_attr_values)
 
-        return variant
+        return variant, variant_attr_values
 
-    def _download_images(self, product, images_str):
-        """Загружает изображения товара по URL"""
+    def _image_tasks(self, product, images_str):
+        """Формирует задания на загрузку изображений товара"""
         if not images_str:
-            return 0
+            return []
 
         urls = [url.strip() for url in images_str.split(',') if url.strip()]
+        return [
+            ImageTask(
+                url=url,
+                # Первое изображение - главное, остальные - в галерею
+                context={'product_id': product.pk, 'sort': i},
+            )
+            for i, url in enumerate(urls)
+        ]
+
+    def _download_images(self, tasks):
+        """Загружает изображения товаров параллельно и привязывает их к товарам"""
         count = 0
+        downloader = ImageDownloader(workers=self.image_workers, timeout=30)
 
-        for i, url in enumerate(urls):
-            try:
-                response = requests.get(url, timeout=30)
-                response.raise_for_status()
-
-                # Определяем имя файла
-                parsed_url = urlparse(url)
-                filename = os.path.basename(parsed_url.path)
-                if not filename or '.' not in filename:
-                    filename = f'{product.slug}-{i + 1}.jpg'
-
-                # СОЗДАЕМ ContentFile с явным указанием имени
-                content = ContentFile(response.content, name=filename)
-
-                if i == 0:
-                    # Первое изображение - главное
-                    product.main_image.save(filename, content, save=True)
-                else:
-                    # Остальные - в галерею
-                    product_image = ProductImage.objects.create(
-                        product=product,
-                        sort=i
-                    )
-                    # Сохраняем файл с явным указанием имени
-                    product_image.image.save(filename, content, save=True)
-
-                count += 1
-                self.stdout.write(f'  Изображение: {filename}')
-
-            except Exception as e:
-                self.stderr.write(f'  Ошибка загрузки {url}: {e}')
+        for result in downloader.fetch(tasks):
+            if not result.ok:
                 # Пропускаем ошибки загрузки изображений, продолжаем импорт
+                self.stderr.write(f'  Ошибка загрузки {result.task.url}: {result.error}')
+                continue
+
+            ctx = result.task.context
+            attach_product_image(ctx['product_id'], result.name, ctx['sort'] == 0, ctx['sort'])
+            count += 1
+            self.stdout.write(f'  Изображение: {result.name}')
 
         return count
 
@@ -0,0 +1,192 @@
+"""
+Команда для применения изменений товаров, полученных через webhook WooCommerce.
+
+Webhook (integrations.views.woocommerce_webhook) только ставит событие в очередь
+WooCommerceProductEvent, по одной записи на товар. Команда разбирает очередь
+той же логикой, что и sync_woocommerce, поэтому полная синхронизация
+нужна лишь изредка для сверки.
+
+Рассчитана на один запущенный экземпляр.
+
+Использование:
+    python manage.py process_woocommerce_events
+    python manage.py process_woocommerce_events --loop --interval 5
+
+Опции:
+    --loop              Работать постоянно, проверяя очередь
+    --interval N        Пауза между проверками очереди в секундах
+    --batch-size N      Количество товаров за один проход
+    --skip-images       Пропустить загрузку изображений
+    --image-workers N   Количество потоков загрузки изображений
+"""
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from catalog.images import ImageDownloader
+from catalog.models import Product
+from integrations.models import WooCommerceProductEvent, WooCommerceProductState
+from integrations.woocommerce import WooCommerceClient
+
+from .sync_woocommerce import Command as SyncCommand
+
+MAX_ATTEMPTS = 5
+RETRY_DELAY = 30  # секунд, удваивается с каждой попыткой
+
+
+class Command(SyncCommand):
+    help = 'Применение изменений товаров из очереди webhook WooCommerce'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.catalog_caches_stale = False
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Работать постоянно, проверяя очередь',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Пауза между проверками очереди в секундах (по умолчанию 5)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Количество товаров за один проход (по умолчанию 50)',
+        )
+        parser.add_argument(
+            '--skip-images',
+            action='store_true',
+            help='Пропустить загрузку изображений',
+        )
+        parser.add_argument(
+            '--image-workers',
+            type=int,
+            default=8,
+            help='Количество потоков загрузки изображений (по умолчанию 8)',
+        )
+        parser.add_argument(
+            '--verbose',
+            action='store_true',
+            help='Подробный вывод изменений',
+        )
+
+    def handle(self, *args, **options):
+        self.skip_images = options['skip_images']
+        self.verbose = options['verbose']
+        self.image_downloader = ImageDownloader(workers=options['image_workers'])
+        self.client = WooCommerceClient()
+        batch_size = max(1, options['batch_size'])
+
+        # Справочники каталога загружаются один раз, состояния - на каждый проход
+        self._load_catalog_caches()
+
+        while True:
+            processed = self._process_batch(batch_size)
+            if processed:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self._print_stats()
+
+    def _process_batch(self, batch_size):
+        """Обрабатывает очередную пачку событий. Возвращает их количество"""
+        events = list(
+            WooCommerceProductEvent.objects
+            .filter(attempts__lt=MAX_ATTEMPTS)
+            .filter(Q(retry_at__isnull=True) | Q(retry_at__lte=timezone.now()))
+            .order_by('received_at')[:batch_size]
+        )
+        if not events:
+            return 0
+
+        if self.catalog_caches_stale:
+            self._load_catalog_caches()
+            self.catalog_caches_stale = False
+
+        self.stdout.write(f'\n=== Событий в обработке: {len(events)} ===')
+        self._load_sync_states([event.wc_id for event in events])
+
+        done = []
+        for event in events:
+            try:
+                with transaction.atomic():
+                    self._apply_event(event)
+            except Exception as e:
+                self.stderr.write(self.style.ERROR(f'Товар WC #{event.wc_id}: {e}'))
+                self.pending_states.pop(event.wc_id, None)
+                # Справочники могли измениться вне команды: перечитываем к следующему проходу
+                self.catalog_caches_stale = True
+                WooCommerceProductEvent.objects.filter(
+                    pk=event.pk, received_at=event.received_at,
+                ).update(
+                    attempts=event.attempts + 1,
+                    retry_at=timezone.now() + timedelta(seconds=RETRY_DELAY * 2 ** event.attempts),
+                    last_error=str(e),
+                )
+                continue
+            done.append(event)
+
+        self._download_queued_images()
+        self._save_sync_states()
+
+        # Удаляем только события, которые не обновились за время обработки
+        for event in done:
+            WooCommerceProductEvent.objects.filter(
+                pk=event.pk, received_at=event.received_at,
+            ).delete()
+
+        return len(events)
+
+    def _apply_event(self, event):
+        if event.action == WooCommerceProductEvent.ACTION_DELETE:
+            self._deactivate_product(event.wc_id, event.payload)
+            return
+
+        wc_product = event.payload
+        if wc_product is None:
+            wc_product = self.client.get_product(event.wc_id)
+            if wc_product is None:
+                self._deactivate_product(event.wc_id, fetch=False)
+                return
+
+        self._sync_product(wc_product)
+
+    def _deactivate_product(self, wc_id, wc_product=None, fetch=True):
+        """
+        Товар удалён в WooCommerce: снимаем с публикации, не удаляя заказы и отзывы.
+        Товар без состояния синхронизации (например, из import_woocommerce) ищется
+        по SKU или slug, как в sync_woocommerce. Webhook удаления присылает только ID,
+        поэтому данные товара запрашиваются из API: товар в корзине ещё доступен.
+        """
+        states = WooCommerceProductState.objects.filter(wc_id=wc_id)
+        product_ids = list(states.values_list('product_id', flat=True))
+        if not product_ids:
+            if wc_product is None and fetch:
+                wc_product = self.client.get_product(wc_id)
+            if wc_product:
+                # WordPress дописывает __trashed к slug товара в корзине
+                slug = (wc_product.get('slug') or '').removesuffix('__trashed')
+                product = self._find_product(wc_product.get('sku', ''), slug)
+                if product:
+                    product_ids = [product.pk]
+
+        updated = Product.objects.filter(
+            pk__in=product_ids, is_active=True,
+        ).update(is_active=False)
+        states.delete()
+        self.sync_states.pop(wc_id, None)
+
+        if updated:
+            self.stats['products_updated'] += updated
+            self.stdout.write(f'\n  [DEL] WC #{wc_id}: снят с публикации')
@@ -14,24 +14,31 @@
     --products-only     Синхронизировать только товары
     --limit N           Ограничить количество товаров
     --timeout N         Таймаут запросов в секундах
+    --image-workers N   Количество потоков загрузки изображений
+    --revalidate-images Проверять уже загруженные изображения условным запросом
+    --force             Игнорировать сохранённые хэши и обработать все товары
+    --stock-only        Обновить только цены и остатки товаров и вариаций
+    --record PATH       Записать ответы API в корпус (.jsonl.gz) для bench_sync
 """
-import os
+import json
 import time
 import hashlib
-import requests
 from decimal import Decimal, InvalidOperation
-from urllib.parse import urlparse
 
-from django.core.files.base import ContentFile
 from django.core.management.base import BaseCommand
 from django.db import transaction
+from django.db.models import Q
 from django.utils.text import slugify
 from transliterate import translit
 
+from catalog.images import (
+    ImageDownloader, ImageTask, attach_product_image, filename_from_url, known_image_names,
+)
 from catalog.models import (
-    Category, Brand, Product, ProductImage,
+    Category, Brand, Product,
     Attribute, AttributeValue, ProductAttributeValue, ProductVariant
 )
+from integrations.models import WooCommerceProductState
 from integrations.woocommerce import WooCommerceClient
 
 
@@ -86,6 +93,50 @@ def strip_html(text):
     return ' '.join(text.split())
 
 
+# Версия формата хэша: увеличить, если изменилась логика разбора данных WC,
+# чтобы следующая синхронизация обработала все товары заново
+PAYLOAD_HASH_VERSION = 1
+
+# Поля WC, которые меняются без реальных изменений товара
+HASH_IGNORED_FIELDS = {
+    '_links', 'date_modified', 'date_modified_gmt', 'related_ids',
+    'total_sales', 'average_rating', 'rating_count',
+}
+
+
+def normalize_payload(data):
+    """Убирает из данных WC служебные поля, не влияющие на товар"""
+    if isinstance(data, dict):
+        return {
+            key: normalize_payload(value)
+            for key, value in data.items()
+            if key not in HASH_IGNORED_FIELDS
+        }
+    if isinstance(data, list):
+        return [normalize_payload(item) for item in data]
+    return data
+
+
+def payload_hash(data):
+    """Стабильный хэш нормализованных данных WooCommerce"""
+    serialized = json.dumps(
+        [PAYLOAD_HASH_VERSION, normalize_payload(data)],
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+
+# Сколько изображений накапливать перед параллельной загрузкой
+IMAGE_QUEUE_FLUSH_SIZE = 200
+
+
+def variations_hash(variations):
+    """Хэш списка вариаций, не зависящий от порядка выдачи API"""
+    return payload_hash(sorted(variations, key=lambda v: v.get('id', 0)))
+
+
 class Command(BaseCommand):
     help = 'Умная синхронизация товаров из WooCommerce REST API'
 
@@ -94,6 +145,8 @@ class Command(BaseCommand):
         self.client = None
         self.dry_run = False
         self.skip_images = False
+        self.force = False
+        self.stock_only = False
 
         # Кэши для ускорения работы
         self.categories_cache = {}  # wc_id -> Category
@@ -101,6 +154,14 @@ class Command(BaseCommand):
         self.attributes_cache = {}  # wc_id -> Attribute
         self.attr_values_cache = {}  # (attribute_name, value) -> AttributeValue
 
+        # Хэши данных WC с прошлой синхронизации
+        self.sync_states = {}  # wc_id -> WooCommerceProductState
+        self.pending_states = {}  # wc_id -> WooCommerceProductState (к сохранению)
+
+        # Очередь изображений на параллельную загрузку
+        self.image_downloader = None
+        self.image_tasks = []
+
         # Расширенная статистика
         self.stats = {
             'categories_created': 0,
@@ -115,11 +176,15 @@ class Command(BaseCommand):
             'products_created': 0,
             'products_updated': 0,
             'products_skipped': 0,
+            'products_unchanged': 0,
             'variants_created': 0,
             'variants_updated': 0,
             'variants_skipped': 0,
             'images_downloaded': 0,
             'images_skipped': 0,
+            'images_reused': 0,
+            'products_not_found': 0,
+            'variants_not_found': 0,
         }
 
         # Детали изменений для отладки
@@ -168,23 +233,51 @@ class Command(BaseCommand):
             action='store_true',
             help='Подробный вывод изменений',
         )
+        parser.add_argument(
+            '--image-workers',
+            type=int,
+            default=8,
+            help='Количество потоков загрузки изображений (по умолчанию 8)',
+        )
+        parser.add_argument(
+            '--revalidate-images',
+            action='store_true',
+            help='Проверять уже загруженные изображения условным запросом (ETag)',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Игнорировать сохранённые хэши и обработать все товары',
+        )
+        parser.add_argument(
+            '--stock-only',
+            action='store_true',
+            help='Обновить только цены и остатки (без категорий, атрибутов и изображений)',
+        )
+        parser.add_argument(
+            '--record',
+            metavar='PATH',
+            help='Записать ответы API в сжатый корпус для воспроизведения в bench_sync',
+        )
 
     def handle(self, *args, **options):
         self.dry_run = options['dry_run']
         self.skip_images = options['skip_images']
         self.verbose = options.get('verbose', False)
+        self.force = options.get('force', False)
+        self.image_downloader = ImageDownloader(
+            workers=options.get('image_workers', 8),
+            revalidate=options.get('revalidate_images', False),
+        )
         categories_only = options['categories_only']
         attributes_only = options['attributes_only']
         products_only = options['products_only']
+        self.stock_only = options.get('stock_only', False)
         limit = options['limit']
         timeout = options['timeout']
 
         # Инициализируем клиент
-        self.client = WooCommerceClient()
-
-        # Устанавливаем таймаут
-        from integrations import woocommerce as wc_module
-        wc_module.DEFAULT_TIMEOUT = timeout
+        self.client = WooCommerceClient(record_to=options.get('record'), timeout=timeout)
         self.stdout.write(f'Таймаут запросов: {timeout} сек')
 
         if not self.client.is_configured():
@@ -218,12 +311,18 @@ class Command(BaseCommand):
         except Exception as e:
             self.stderr.write(self.style.ERROR(f'Ошибка синхронизации: {e}'))
             raise
+        finally:
+            self.client.close()
 
         # Выводим статистику
         self._print_stats()
 
     def _sync(self, categories_only, attributes_only, products_only, limit):
         """Основная логика синхронизации"""
+        if self.stock_only:
+            self._sync_stock(limit)
+            return
+
         sync_all = not (categories_only or attributes_only or products_only)
 
         # Всегда загружаем кэши для умного сравнения
@@ -241,6 +340,23 @@ class Command(BaseCommand):
     def _load_caches(self):
         """Загружает существующие данные в кэши"""
         self.stdout.write('Загрузка кэшей из БД...')
+        self._load_catalog_caches()
+
+        # Хэши товаров с прошлой синхронизации
+        if not self.force:
+            self._load_sync_states()
+
+        self.stdout.write(f'  Категорий: {Category.objects.count()}')
+        self.stdout.write(f'  Брендов: {Brand.objects.count()}')
+        self.stdout.write(f'  Атрибутов: {Attribute.objects.count()}')
+        self.stdout.write(f'  Товаров: {Product.objects.count()}')
+
+    def _load_catalog_caches(self):
+        """Загружает категории, бренды, атрибуты и их значения"""
+        self.categories_cache = {}
+        self.brands_cache = {}
+        self.attributes_cache = {}
+        self.attr_values_cache = {}
 
         # Категории по имени и slug
         for cat in Category.objects.select_related('parent').all():
@@ -260,10 +376,12 @@ class Command(BaseCommand):
             key = (av.attribute.name.lower(), av.value.lower())
             self.attr_values_cache[key] = av
 
-        self.stdout.write(f'  Категорий: {Category.objects.count()}')
-        self.stdout.write(f'  Брендов: {Brand.objects.count()}')
-        self.stdout.write(f'  Атрибутов: {Attribute.objects.count()}')
-        self.stdout.write(f'  Товаров: {Product.objects.count()}')
+    def _load_sync_states(self, wc_ids=None):
+        """Загружает состояния синхронизации: все или только товаров wc_ids"""
+        states = WooCommerceProductState.objects.all()
+        if wc_ids is not None:
+            states = states.filter(wc_id__in=wc_ids)
+        self.sync_states = {state.wc_id: state for state in states}
 
     def _sync_categories(self):
         """Синхронизирует категории с поддержкой иерархии"""
@@ -461,8 +579,166 @@ class Command(BaseCommand):
             self._sync_product(wc_product)
             count += 1
 
+        self._download_queued_images()
+        self._save_sync_states()
         self.stdout.write(f'\nОбработано товаров: {count}')
 
+    def _sync_stock(self, limit):
+        """
+        Быстрая синхронизация цен и остатков.
+        Товары запрашиваются постранично только с нужными полями (_fields),
+        изменения каждой страницы записываются одним bulk_update
+        для товаров и одним для вариаций.
+        """
+        self.stdout.write('\n=== Синхронизация цен и остатков ===')
+
+        count = 0
+        for page in self.client.get_product_stock_pages():
+            page = [p for p in page if p.get('type') != 'variation']
+            if limit > 0:
+                page = page[:limit - count]
+            if not page:
+                break
+
+            self._sync_stock_page(page)
+            count += len(page)
+
+            if limit > 0 and count >= limit:
+                self.stdout.write(f'\nДостигнут лимит: {limit} товаров')
+                break
+
+        self.stdout.write(f'\nОбработано товаров: {count}')
+
+    def _sync_stock_page(self, page):
+        """Обновляет цены товаров страницы и цены/остатки их вариаций"""
+        products = self._match_stock_products(page)
+
+        changed_products = []
+        variable = []
+        for wc_product in page:
+            product = products.get(wc_product['id'])
+            if product is None:
+                self.stats['products_not_found'] += 1
+                continue
+
+            price, old_price, is_sale = self._parse_stock_prices(wc_product)
+            price = price if price and price > 0 else Decimal('1')
+            if (
+                normalize_decimal(product.price) != normalize_decimal(price)
+                or normalize_decimal(product.old_price) != normalize_decimal(old_price)
+                or product.is_sale != is_sale
+            ):
+                if self.verbose:
+                    self.stdout.write(
+                        f'  [UPD] {product.sku or product.pk}: цена {product.price} -> {price}'
+                    )
+                product.price = price
+                product.old_price = old_price
+                product.is_sale = is_sale
+                changed_products.append(product)
+                self.stats['products_updated'] += 1
+            else:
+                self.stats['products_skipped'] += 1
+
+            if wc_product.get('type') == 'variable':
+                variable.append((product, wc_product['id']))
+
+        changed_variants = self._collect_stock_variants(variable)
+
+        if not self.dry_run:
+            if changed_products:
+                Product.objects.bulk_update(changed_products, ['price', 'old_price', 'is_sale'])
+            if changed_variants:
+                ProductVariant.objects.bulk_update(changed_variants, ['price', 'old_price', 'stock'])
+
+    def _match_stock_products(self, page):
+        """
+        Сопоставляет товары WC локальным: сначала по сохранённому
+        состоянию синхронизации (wc_id), затем по SKU.
+
+        Returns:
+            dict: wc_id -> Product
+        """
+        fields = ('id', 'sku', 'price', 'old_price', 'is_sale')
+        wc_ids = [p['id'] for p in page]
+        by_wc_id = dict(
+            WooCommerceProductState.objects.filter(wc_id__in=wc_ids).values_list('wc_id', 'product_id')
+        )
+
+        skus = {p.get('sku') for p in page if p['id'] not in by_wc_id and p.get('sku')}
+        lookup = Product.objects.only(*fields).filter(
+            Q(pk__in=by_wc_id.values()) | Q(sku__in=skus)
+        )
+        by_pk = {}
+        by_sku = {}
+        for product in lookup:
+            by_pk[product.pk] = product
+            if product.sku:
+                by_sku[product.sku] = product
+
+        result = {}
+        for wc_product in page:
+            product = by_pk.get(by_wc_id.get(wc_product['id']))
+            if product is None and wc_product.get('sku'):
+                product = by_sku.get(wc_product['sku'])
+            if product is not None:
+                result[wc_product['id']] = product
+        return result
+
+    def _collect_stock_variants(self, variable):
+        """
+        Загружает цены и остатки вариаций и возвращает изменённые ProductVariant.
+        Вариации сопоставляются по SKU внутри товара.
+        """
+        if not variable:
+            return []
+
+        existing = {}
+        for variant in ProductVariant.objects.only(
+            'id', 'product_id', 'sku', 'price', 'old_price', 'stock'
+        ).filter(product_id__in=[product.pk for product, _ in variable]).exclude(sku=''):
+            existing[(variant.product_id, variant.sku)] = variant
+
+        changed = []
+        for product, wc_id in variable:
+            for wc_var in self.client.get_variations_stock(wc_id):
+                variant = existing.get((product.pk, wc_var.get('sku') or ''))
+                if variant is None:
+                    self.stats['variants_not_found'] += 1
+                    continue
+
+                price, old_price, _ = self._parse_stock_prices(wc_var)
+                # Минимум 1 для отображения, как при полной синхронизации
+                stock = max(wc_var.get('stock_quantity') or 0, 1)
+                if (
+                    normalize_decimal(variant.price) != normalize_decimal(price)
+                    or normalize_decimal(variant.old_price) != normalize_decimal(old_price)
+                    or variant.stock != stock
+                ):
+                    if self.verbose:
+                        self.stdout.write(
+                            f'      [UPD] вариация {variant.sku}: '
+                            f'цена {variant.price} -> {price}, остаток {variant.stock} -> {stock}'
+                        )
+                    variant.price = price
+                    variant.old_price = old_price
+                    variant.stock = stock
+                    changed.append(variant)
+                    self.stats['variants_updated'] += 1
+                else:
+                    self.stats['variants_skipped'] += 1
+        return changed
+
+    def _parse_stock_prices(self, wc_item):
+        """Цена, старая цена и признак акции (как при полной синхронизации)"""
+        price = self._parse_decimal(wc_item.get('price'))
+        regular_price = self._parse_decimal(wc_item.get('regular_price'))
+        sale_price = self._parse_decimal(wc_item.get('sale_price'))
+
+        if sale_price and regular_price and sale_price < regular_price:
+            return sale_price, regular_price, True
+        return price, None, False
+
     def _sync_product(self, wc_product):
         """Синхронизирует один товар с проверкой изменений"""
         name = wc_product['name']
@@ -471,12 +747,17 @@ class Command(BaseCommand):
         product_type = wc_product.get('type', 'simple')
         wc_id = wc_product['id']
 
-        # Ищем существующий товар по SKU или slug
-        product = None
-        if sku:
-            product = Product.objects.filter(sku=sku).first()
-        if not product:
-            product = Product.objects.filter(slug=slug).first()
+        # Быстрая проверка по хэшу: неизменённые товары пропускаем без разбора
+        product_hash = payload_hash(wc_product)
+        state = self.sync_states.get(wc_id)
+        if (
+            not self.dry_run and state and state.product_hash == product_hash
+            and (state.images_synced or self.skip_images)
+        ):
+            self._sync_unchanged_product(state, wc_product, product_hash)
+            return
+
+        product = self._find_product(sku, slug)
 
         # Парсим данные из WC
         wc_data = self._parse_product_data(wc_product)
@@ -519,8 +800,91 @@ class Command(BaseCommand):
             self._sync_product_images(product, wc_product)
 
         # Синхронизируем вариации
+        variations = None
         if product_type == 'variable':
-            self._sync_product_variations(product, wc_product)
+            variations = self._sync_product_variations(product, wc_product)
+
+        # Без изображений товар при следующей синхронизации обработается заново
+        self._remember_sync_state(
+            wc_product, product.pk, product_hash, variations, images_synced=not self.skip_images,
+        )
+
+    def _find_product(self, sku, slug):
+        """Ищет существующий товар по SKU или slug"""
+        product = None
+        if sku:
+            product = Product.objects.filter(sku=sku).first()
+        if not product and slug:
+            product = Product.objects.filter(slug=slug).first()
+        return product
+
+    def _sync_unchanged_product(self, state, wc_product, product_hash):
+        """
+        Обрабатывает товар, данные которого не изменились с прошлой синхронизации.
+        Для вариативных товаров вариации запрашиваются, только если в WooCommerce
+        изменилась дата изменения товара (date_modified_gmt). Список ID вариаций
+        уже входит в хэш товара. Изменения отдельных вариаций приходят
+        через webhook (process_woocommerce_events), остатки - через --stock-only.
+        """
+        self.stats['products_skipped'] += 1
+        self.stats['products_unchanged'] += 1
+
+        if wc_product.get('type') != 'variable':
+            return
+
+        modified = wc_product.get('date_modified_gmt') or ''
+        if modified and state.wc_modified == modified:
+            self.stats['variants_skipped'] += len(wc_product.get('variations') or [])
+            return
+
+        variations = list(self.client.get_variations(wc_product['id']))
+        if state.variations_hash == variations_hash(variations):
+            self.stats['variants_skipped'] += len(variations)
+            # Запоминаем дату, чтобы следующая синхронизация обошлась без запроса
+            self._remember_sync_state(
+                wc_product, state.product_id, product_hash, variations, images_synced=state.images_synced,
+            )
+            return
+
+        product = Product.objects.filter(pk=state.product_id).first()
+        if not product:
+            return
+
+        if self.verbose:
+            self.stdout.write(f'\n  [VAR] {product.name}: изменились вариации')
+        self._sync_product_variations(product, wc_product, variations)
+        self._remember_sync_state(
+            wc_product, product.pk, product_hash, variations, images_synced=state.images_synced,
+        )
+
+    def _remember_sync_state(self, wc_product, product_id, product_hash, variations=None, images_synced=True):
+        """Запоминает хэши товара для сохранения в конце синхронизации"""
+        wc_id = wc_product['id']
+        self.pending_states[wc_id] = WooCommerceProductState(
+            wc_id=wc_id,
+            product_id=product_id,
+            product_hash=product_hash,
+            variations_hash=variations_hash(variations) if variations is not None else '',
+            wc_modified=(wc_product.get('date_modified_gmt') or '') if variations is not None else '',
+            images_synced=images_synced,
+        )
+
+    def _save_sync_states(self):
+        """Сохраняет хэши обработанных товаров одним запросом"""
+        if self.dry_run or not self.pending_states:
+            return
+
+        WooCommerceProductState.objects.bulk_create(
+            self.pending_states.values(),
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['wc_id'],
+            update_fields=[
+                'product', 'product_hash', 'variations_hash', 'wc_modified', 'images_synced', 'synced_at',
+            ],
+        )
+        self.sync_states.update(self.pending_states)
+        self.pending_states = {}
 
     def _parse_product_data(self, wc_product):
         """Парсит данные товара из WooCommerce"""
@@ -854,75 +1218,79 @@ class Command(BaseCommand):
         if not images:
             return
 
-        # Получаем существующие URL изображений
+        # Уже загруженные файлы: по URL источника и (для старых загрузок) по имени файла
+        known_names = known_image_names(img.get('src', '') for img in images)
         existing_main = product.main_image.name if product.main_image else None
         existing_gallery = set(product.images.values_list('image', flat=True))
+        gallery_count = len(existing_gallery)
 
         for i, img in enumerate(images):
             src = img.get('src', '')
             if not src:
                 continue
 
+            known_name = known_names.get(src)
             # Получаем имя файла из URL
-            parsed_url = urlparse(src)
-            filename = os.path.basename(parsed_url.path)
-            if not filename or '.' not in filename:
-                filename = f'{product.slug}-{i}.jpg'
+            filename = filename_from_url(src) or f'{product.slug}-{i}.jpg'
 
             if i == 0:
                 # Главное изображение
-                if existing_main and filename in existing_main:
+                if existing_main and (existing_main == known_name or filename in existing_main):
                     self.stats['images_skipped'] += 1
                     continue
                 if not product.main_image:
-                    self._download_image(product, src, is_main=True, filename=filename)
+                    self._queue_image(product, wc_product['id'], src, is_main=True, sort=i)
                 else:
                     self.stats['images_skipped'] += 1
             else:
                 # Галерея - проверяем есть ли уже
-                if any(filename in img_path for img_path in existing_gallery if img_path):
+                if known_name in existing_gallery or any(
+                    filename in img_path for img_path in existing_gallery if img_path
+                ):
                     self.stats['images_skipped'] += 1
                     continue
 
-                if product.images.count() < i:
-                    self._download_image(product, src, is_main=False, sort=i, filename=filename)
+                if gallery_count < i:
+                    self._queue_image(product, wc_product['id'], src, is_main=False, sort=i)
+                    gallery_count += 1
                 else:
                     self.stats['images_skipped'] += 1
 
-    def _download_image(self, product, url, is_main=False, sort=0, filename=None):
-        """Загружает изображение по URL"""
-        try:
-            response = requests.get(url, timeout=60)
-            response.raise_for_status()
-
-            if not filename:
-                parsed_url = urlparse(url)
-                filename = os.path.basename(parsed_url.path)
-                if not filename or '.' not in filename:
-                    filename = f'{product.slug}-{sort or "main"}.jpg'
+    def _queue_image(self, product, wc_id, url, is_main=False, sort=0):
+        """Ставит изображение в очередь на параллельную загрузку"""
+        self.image_tasks.append(ImageTask(
+            url=url,
+            context={'product_id': product.pk, 'wc_id': wc_id, 'is_main': is_main, 'sort': sort},
+        ))
+        if len(self.image_tasks) >= IMAGE_QUEUE_FLUSH_SIZE:
+            self._download_queued_images()
+
+    def _download_queued_images(self):
+        """Загружает накопленные изображения и привязывает их к товарам"""
+        if not self.image_tasks:
+            return
 
-            content = ContentFile(response.content, name=filename)
+        tasks, self.image_tasks = self.image_tasks, []
+        for result in self.image_downloader.fetch(tasks):
+            ctx = result.task.context
+            if not result.ok:
+                self.stderr.write(f'      Ошибка загрузки изображения {result.task.url}: {result.error}')
+                # Товар с незагруженными изображениями обработаем заново в следующий раз
+                self.pending_states.pop(ctx['wc_id'], None)
+                continue
 
-            if is_main:
-                product.main_image.save(filename, content, save=True)
+            attach_product_image(ctx['product_id'], result.name, ctx['is_main'], ctx['sort'])
+            if result.cached:
+                self.stats['images_reused'] += 1
             else:
-                product_image = ProductImage.objects.create(
-                    product=product,
-                    sort=sort
-                )
-                product_image.image.save(filename, content, save=True)
-
-            self.stats['images_downloaded'] += 1
+                self.stats['images_downloaded'] += 1
             if self.verbose:
-                self.stdout.write(f'      [IMG] {filename}')
+                self.stdout.write(f'      [IMG] {result.name}')
 
-        except Exception as e:
-            self.stderr.write(f'      Ошибка загрузки изображения: {e}')
-
-    def _sync_product_variations(self, product, wc_product):
-        """Синхронизирует вариации товара"""
-        wc_product_id = wc_product['id']
-        variations = list(self.client.get_variations(wc_product_id))
+    def _sync_product_variations(self, product, wc_product, variations=None):
+        """Синхронизирует вариации товара, возвращает полученные из WC вариации"""
+        if variations is None:
+            variations = list(self.client.get_variations(wc_product['id']))
 
         if self.verbose:
             self.stdout.write(f'    Вариаций в WC: {len(variations)}')
@@ -930,6 +1298,8 @@ class Command(BaseCommand):
         for wc_var in variations:
             self._sync_variation(product, wc_var)
 
+        return variations
+
     def _sync_variation(self, product, wc_var):
         """Синхронизирует одну вариацию с проверкой изменений"""
         sku = wc_var.get('sku', '')
@@ -1067,16 +1437,22 @@ class Command(BaseCommand):
         self.stdout.write(f'  + Создано: {self.stats["products_created"]}')
         self.stdout.write(f'  [UPD] Обновлено: {self.stats["products_updated"]}')
         self.stdout.write(f'  - Без изменений: {self.stats["products_skipped"]}')
+        self.stdout.write(f'    из них по хэшу: {self.stats["products_unchanged"]}')
+        if self.stock_only:
+            self.stdout.write(f'  ? Не найдено в БД: {self.stats["products_not_found"]}')
 
         # Вариации
         self.stdout.write('\nВариации:')
         self.stdout.write(f'  + Создано: {self.stats["variants_created"]}')
         self.stdout.write(f'  [UPD] Обновлено: {self.stats["variants_updated"]}')
         self.stdout.write(f'  - Без изменений: {self.stats["variants_skipped"]}')
+        if self.stock_only:
+            self.stdout.write(f'  ? Не найдено в БД: {self.stats["variants_not_found"]}')
 
         # Изображения
         self.stdout.write('\nИзображения:')
         self.stdout.write(f'  + Загружено: {self.stats["images_downloaded"]}')
+        self.stdout.write(f'  = Взято из хранилища: {self.stats["images_reused"]}')
         self.stdout.write(f'  - Пропущено: {self.stats["images_skipped"]}')
 
         self.stdout.write('')
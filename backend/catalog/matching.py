@@ -0,0 +1,108 @@
+"""
+Подбор вариаций линз под рецепт.
+
+Параметры рецепта (SPH, CYL, AXIS, ADD, BC, DIA) сопоставляются атрибутам
+через Attribute.lens_parameter и сравниваются с AttributeValue.numeric_value.
+Подходящие значения атрибутов выбираются по индексу
+(attribute, numeric_value), вариации - по связям с этими значениями,
+без перебора товаров:
+
+    - SPH обязателен: у вариации должно быть значение SPH из рецепта;
+    - остальные параметры проверяются, только если товар их различает:
+      вариация без атрибута BC подходит при любом BC в рецепте,
+      а вариация с другим BC - нет;
+    - CYL не указан в рецепте - подходят только линзы без цилиндра (0);
+    - AXIS сравнивается с допуском (торические линзы идут с шагом 10°)
+      по кругу: 0° и 180° - одна и та же ось.
+"""
+from decimal import Decimal
+
+from django.db.models import Q
+
+from .models import Attribute, AttributeValue, ProductVariant
+
+EYES = ("od", "os")
+PARAMETERS = (
+    Attribute.LENS_SPH, Attribute.LENS_CYL, Attribute.LENS_AXIS,
+    Attribute.LENS_ADD, Attribute.LENS_BC, Attribute.LENS_DIA,
+)
+TOLERANCE = {Attribute.LENS_AXIS: Decimal("5")}
+AXIS_PERIOD = Decimal("180")
+
+# Вариаций на глаз в ответе
+MATCH_LIMIT = 200
+
+
+def eye_constraints(prescription, eye: str) -> dict:
+    """Параметры одного глаза: {"sph": Decimal("-2.50"), ...}. Пусто, если SPH не указан"""
+    constraints = {
+        parameter: getattr(prescription, f"{eye}_{parameter}")
+        for parameter in PARAMETERS
+        if getattr(prescription, f"{eye}_{parameter}") is not None
+    }
+    if Attribute.LENS_SPH not in constraints:
+        return {}
+    if Attribute.LENS_CYL not in constraints:
+        constraints[Attribute.LENS_CYL] = Decimal("0")
+    if not constraints[Attribute.LENS_CYL]:
+        # Без цилиндра ось не имеет значения
+        constraints.pop(Attribute.LENS_AXIS, None)
+    return {parameter: Decimal(value) for parameter, value in constraints.items()}
+
+
+def value_condition(parameter: str, value: Decimal) -> Q:
+    """Условие на numeric_value значений атрибута, совпадающих со значением рецепта"""
+    tolerance = TOLERANCE.get(parameter, Decimal("0"))
+    low, high = value - tolerance, value + tolerance
+    condition = Q(numeric_value__range=(low, high))
+    if parameter == Attribute.LENS_AXIS:
+        # Допуск у 0° или 180° продолжается с другого конца шкалы
+        if low < 0:
+            condition |= Q(numeric_value__range=(low + AXIS_PERIOD, AXIS_PERIOD))
+        if high > AXIS_PERIOD:
+            condition |= Q(numeric_value__range=(0, high - AXIS_PERIOD))
+    return condition
+
+
+def matching_variants(constraints: dict, category: str = ""):
+    """Вариации в наличии, подходящие под параметры одного глаза"""
+    variants = ProductVariant.objects.filter(
+        is_active=True,
+        stock__gt=0,
+        product__is_active=True,
+    )
+    if category:
+        variants = variants.filter(product__category__slug=category)
+
+    for parameter, value in constraints.items():
+        values = AttributeValue.objects.filter(attribute__lens_parameter=parameter)
+        condition = value_condition(parameter, value)
+        if parameter == Attribute.LENS_SPH:
+            variants = variants.filter(attribute_values__in=values.filter(condition))
+        else:
+            variants = variants.exclude(attribute_values__in=values.exclude(condition))
+
+    return variants
+
+
+def match_prescription(prescription, category: str = "", limit: int = MATCH_LIMIT) -> dict:
+    """Параметры и подходящие вариации по каждому глазу: {"od": (constraints, variants), ...}"""
+    result = {}
+    for eye in EYES:
+        constraints = eye_constraints(prescription, eye)
+        if not constraints:
+            result[eye] = (constraints, [])
+            continue
+        variants = list(
+            matching_variants(constraints, category)
+            .select_related("product")
+            .only(
+                "id", "sku", "price", "old_price", "stock", "is_active",
+                "product__id", "product__slug", "product__name",
+                "product__main_image", "product__price", "product__old_price",
+            )
+            .prefetch_related("attribute_values__attribute")
+            .order_by("product__name", "product_id", "id")[:limit]
+        )
+        result[eye] = (constraints, variants)
+    return result
@@ -0,0 +1,87 @@
+# Generated by Django 6.0.1 on 2026-10-18 23:28
+
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.db import migrations, models
+
+# Копия catalog.numeric.parse_numeric на момент миграции: миграция
+# не должна зависеть от кода приложения, который может измениться
+NUMBER = re.compile(
+    r'^([+-]?)(\d+(?:\.\d+)?|\.\d+)\s*(?:мм|mm|дптр|dpt|d|°|град\.?)?$',
+    re.IGNORECASE,
+)
+
+
+def parse_numeric(value):
+    if value is None:
+        return None
+    text = str(value).strip()
+    for sign in ('−', '–', '‒'):
+        text = text.replace(sign, '-')
+    text = text.replace(',', '.').replace(' ', '')
+    match = NUMBER.match(text)
+    if not match:
+        return None
+    try:
+        number = Decimal(match.group(1) + match.group(2))
+    except InvalidOperation:
+        return None
+    if abs(number) > Decimal('99999.999'):
+        return None
+    return number.quantize(Decimal('0.001'))
+
+
+# Параметр рецепта по slug или названию атрибута: "pa_sph", "Оптическая сила (SPH)"
+LENS_PARAMETER_PATTERNS = [
+    ('sph', r'\bsph\b|оптическая сила|сфера|диоптри'),
+    ('cyl', r'\bcyl\b|цилиндр'),
+    ('axis', r'\baxis\b|\bось\b'),
+    ('add', r'\badd\b|аддидац'),
+    ('bc', r'\bbc\b|радиус кривизны|базовая кривизна'),
+    ('dia', r'\bdia\b|диаметр'),
+]
+
+
+def fill_numeric_values(apps, schema_editor):
+    """Числовые значения для существующих значений атрибутов и параметры рецепта для атрибутов линз"""
+    Attribute = apps.get_model('catalog', 'Attribute')
+    AttributeValue = apps.get_model('catalog', 'AttributeValue')
+
+    values = list(AttributeValue.objects.only('id', 'value'))
+    for value in values:
+        value.numeric_value = parse_numeric(value.value)
+    AttributeValue.objects.bulk_update(values, ['numeric_value'], batch_size=1000)
+
+    for attribute in Attribute.objects.order_by('sort', 'id'):
+        text = f'{attribute.slug} {attribute.name}'.lower().replace('_', ' ').replace('-', ' ')
+        for parameter, pattern in LENS_PARAMETER_PATTERNS:
+            if re.search(pattern, text):
+                attribute.lens_parameter = parameter
+                attribute.save(update_fields=['lens_parameter'])
+                break
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0018_remoteimage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attribute',
+            name='lens_parameter',
+            field=models.CharField(blank=True, choices=[('sph', 'SPH (сфера)'), ('cyl', 'CYL (цилиндр)'), ('axis', 'AXIS (ось)'), ('add', 'ADD (аддидация)'), ('bc', 'BC (базовая кривизна)'), ('dia', 'DIA (диаметр)')], help_text='Какому параметру рецепта соответствует атрибут (для подбора линз по рецепту)', max_length=10, verbose_name='Параметр рецепта'),
+        ),
+        migrations.AddField(
+            model_name='attributevalue',
+            name='numeric_value',
+            field=models.DecimalField(blank=True, decimal_places=3, editable=False, help_text='Заполняется из значения при сохранении: "+0,50" -> 0.5. Пусто, если значение не числовое', max_digits=8, null=True, verbose_name='Числовое значение'),
+        ),
+        migrations.AddIndex(
+            model_name='attributevalue',
+            index=models.Index(fields=['attribute', 'numeric_value'], name='attr_value_numeric_idx'),
+        ),
+        migrations.RunPython(fill_numeric_values, migrations.RunPython.noop),
+    ]
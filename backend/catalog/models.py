@@ -1,5 +1,7 @@
 from django.db import models
 from django.utils.text import slugify
+
+from .numeric import parse_numeric
 from itertools import product as itertools_product
 
 
@@ -109,6 +111,29 @@ class Attribute(models.Model):
         help_text="Атрибут будет показан для выбора вариации в карточке товара"
     )
 
+    # Параметры линз, по которым подбираются вариации под рецепт
+    LENS_SPH = "sph"
+    LENS_CYL = "cyl"
+    LENS_AXIS = "axis"
+    LENS_ADD = "add"
+    LENS_BC = "bc"
+    LENS_DIA = "dia"
+    LENS_PARAMETERS = [
+        (LENS_SPH, "SPH (сфера)"),
+        (LENS_CYL, "CYL (цилиндр)"),
+        (LENS_AXIS, "AXIS (ось)"),
+        (LENS_ADD, "ADD (аддидация)"),
+        (LENS_BC, "BC (базовая кривизна)"),
+        (LENS_DIA, "DIA (диаметр)"),
+    ]
+    lens_parameter = models.CharField(
+        "Параметр рецепта",
+        max_length=10,
+        choices=LENS_PARAMETERS,
+        blank=True,
+        help_text="Какому параметру рецепта соответствует атрибут (для подбора линз по рецепту)"
+    )
+
     class Meta:
         verbose_name = "Атрибут"
         verbose_name_plural = "Атрибуты"
@@ -137,6 +162,15 @@ class AttributeValue(models.Model):
     value = models.CharField("Значение", max_length=100)
     slug = models.SlugField("URL-адрес", max_length=120, db_index=True)
     sort = models.PositiveIntegerField("Сортировка", default=0)
+    numeric_value = models.DecimalField(
+        "Числовое значение",
+        max_digits=8,
+        decimal_places=3,
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="Заполняется из значения при сохранении: \"+0,50\" -> 0.5. Пусто, если значение не числовое"
+    )
 
     class Meta:
         verbose_name = "Значение атрибута"
@@ -145,11 +179,17 @@ class AttributeValue(models.Model):
         unique_together = ("attribute", "slug")
         indexes = [
             models.Index(fields=["attribute", "slug"]),
+            # Подбор и фильтрация по диапазону числовых значений
+            models.Index(fields=["attribute", "numeric_value"], name="attr_value_numeric_idx"),
         ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.value, allow_unicode=True)
+        self.numeric_value = parse_numeric(self.value)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "value" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "numeric_value"}
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -349,6 +389,28 @@ class ProductImage(models.Model):
         return f"{self.product.name} - изображение #{self.id}"
 
 
+class RemoteImage(models.Model):
+    """
+    Изображение, загруженное по внешнему URL.
+    Файл хранится под SHA-256 своего содержимого, поэтому одинаковые
+    изображения разных товаров и вариаций лежат в хранилище один раз.
+    ETag и Last-Modified нужны для условных запросов при повторной загрузке.
+    """
+    url = models.URLField("URL источника", max_length=1000, unique=True)
+    etag = models.CharField("ETag", max_length=255, blank=True)
+    last_modified = models.CharField("Last-Modified", max_length=64, blank=True)
+    sha256 = models.CharField("SHA-256", max_length=64, db_index=True)
+    name = models.CharField("Файл в хранилище", max_length=255)
+    fetched_at = models.DateTimeField("Дата загрузки", auto_now=True)
+
+    class Meta:
+        verbose_name = "Загруженное изображение"
+        verbose_name_plural = "Загруженные изображения"
+
+    def __str__(self):
+        return self.url
+
+
 class ProductAttributeValue(models.Model):
     """
     Связь товара с конкретными значениями атрибутов.
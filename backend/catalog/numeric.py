@@ -0,0 +1,54 @@
+"""
+Разбор числовых значений атрибутов: "+0,50" -> 0.50, "−1.25" -> -1.25, "8.6 мм" -> 8.6.
+"""
+import re
+from decimal import Decimal, InvalidOperation
+
+# Минус в значениях из WooCommerce бывает типографским
+_MINUS_SIGNS = ("−", "–", "‒")
+_NUMBER = re.compile(
+    r"^([+-]?)(\d+(?:\.\d+)?|\.\d+)\s*(?:мм|mm|дптр|dpt|d|°|град\.?)?$",
+    re.IGNORECASE,
+)
+
+# Ограничения поля AttributeValue.numeric_value (max_digits=8, decimal_places=3)
+MAX_ABS_VALUE = Decimal("99999.999")
+
+
+def parse_numeric(value) -> "Decimal | None":
+    """Число из значения атрибута или None, если значение не числовое"""
+    if value is None:
+        return None
+    text = str(value).strip()
+    for sign in _MINUS_SIGNS:
+        text = text.replace(sign, "-")
+    text = text.replace(",", ".").replace(" ", "")
+    match = _NUMBER.match(text)
+    if not match:
+        return None
+    try:
+        number = Decimal(match.group(1) + match.group(2))
+    except InvalidOperation:
+        return None
+    if abs(number) > MAX_ABS_VALUE:
+        return None
+    return number.quantize(Decimal("0.001"))
+
+
+def parse_range(value) -> "tuple | None":
+    """
+    Диапазон из параметра фильтра: "-6..-3", "−6,00..−3,00", "..-3", "2..".
+    Возвращает (от, до), где границы могут быть None, или None,
+    если это не диапазон.
+    """
+    if value is None or ".." not in str(value):
+        return None
+    low, _, high = str(value).partition("..")
+    low = parse_numeric(low) if low.strip() else None
+    high = parse_numeric(high) if high.strip() else None
+    if low is None and high is None:
+        return None
+    if low is not None and high is not None and low > high:
+        low, high = high, low
+    return low, high
+
@@ -1,3 +1,221 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from .management.commands.import_woocommerce import Command as ImportCommand
+from .matching import matching_variants
+from .models import Attribute, AttributeValue, Category, Product, ProductAttributeValue, ProductVariant
+from .numeric import parse_numeric, parse_range
+from .views import parse_attribute_filters
+
+
+class PrescriptionMatchingTests(TestCase):
+    """Подбор вариаций торических линз по рецепту"""
+
+    def setUp(self):
+        category = Category.objects.create(name="Линзы", slug="lenses")
+        self.product = Product.objects.create(name="Торические линзы", slug="toric", category=category, price=1000)
+        self.attributes = {
+            parameter: Attribute.objects.create(name=parameter.upper(), slug=f"pa_{parameter}", lens_parameter=parameter)
+            for parameter in (Attribute.LENS_SPH, Attribute.LENS_CYL, Attribute.LENS_AXIS)
+        }
+
+    def variant(self, axis):
+        variant = ProductVariant.objects.create(product=self.product, sku=f"AX{axis}", stock=5)
+        variant.attribute_values.set([
+            self.value(Attribute.LENS_SPH, "-2,00"),
+            self.value(Attribute.LENS_CYL, "-0,75"),
+            self.value(Attribute.LENS_AXIS, str(axis)),
+        ])
+        return variant
+
+    def value(self, parameter, value):
+        attribute_value, _ = AttributeValue.objects.get_or_create(
+            attribute=self.attributes[parameter], value=value, defaults={"slug": value},
+        )
+        return attribute_value
+
+    def match(self, axis):
+        constraints = {
+            Attribute.LENS_SPH: Decimal("-2"),
+            Attribute.LENS_CYL: Decimal("-0.75"),
+            Attribute.LENS_AXIS: Decimal(axis),
+        }
+        return set(matching_variants(constraints).values_list("sku", flat=True))
+
+    def test_axis_within_tolerance(self):
+        self.variant(90)
+        self.variant(100)
+
+        self.assertEqual(self.match(95), {"AX90", "AX100"})
+        self.assertEqual(self.match(88), {"AX90"})
+
+    def test_axis_wraps_around_zero(self):
+        self.variant(180)
+        self.variant(10)
+
+        self.assertEqual(self.match(2), {"AX180"})
+        self.assertEqual(self.match(0), {"AX180"})
+
+    def test_axis_wraps_around_180(self):
+        self.variant(0)
+        self.variant(170)
+
+        self.assertEqual(self.match(178), {"AX0"})
+        self.assertEqual(self.match(180), {"AX0"})
+
+
+IMPORT_CSV = """Артикул,Имя,Описание,Категории,Базовая цена,Название атрибута 1,Значения атрибутов 1
+DUP-1,Дубль первый,old,Тест,100,Цвет,Красный
+U-2,Уник,desc,Тест,200,Цвет,Синий
+DUP-1,Дубль последний,new,Тест,300,Цвет,Зелёный
+"""
+
+
+class ImportWooCommerceDuplicatesTests(TestCase):
+    """Повторный артикул в CSV: последняя строка заменяет товар из предыдущей пачки"""
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(IMPORT_CSV)
+        self.addCleanup(os.remove, self.path)
+
+    def run_import(self):
+        call_command(
+            "import_woocommerce", self.path, skip_images=True, chunk_size=1,
+            stdout=io.StringIO(), stderr=io.StringIO(),
+        )
+
+    def test_last_row_wins(self):
+        self.run_import()
+
+        product = Product.objects.get(sku="DUP-1")
+        self.assertEqual(product.name, "Дубль последний")
+        self.assertEqual(Product.objects.count(), 2)
+
+    def test_products_created_by_others_kept(self):
+        import_chunk = ImportCommand._import_chunk
+
+        def create_outside_product(command, chunk, *args):
+            # Пока идёт импорт, такой же артикул заводят в админке
+            if chunk[0][0] == "U-2":
+                Product.objects.create(
+                    name="Из админки", slug="from-admin", sku="DUP-1",
+                    category=Category.objects.get(name="Тест"), price=1,
+                )
+            return import_chunk(command, chunk, *args)
+
+        with mock.patch.object(ImportCommand, "_import_chunk", autospec=True, side_effect=create_outside_product):
+            self.run_import()
+
+        self.assertEqual(
+            sorted(Product.objects.filter(sku="DUP-1").values_list("name", flat=True)),
+            ["Дубль последний", "Из админки"],
+        )
+
+
+class NumericParsingTests(SimpleTestCase):
+    """Числовые значения атрибутов и диапазоны фильтров"""
+
+    def test_parse_numeric(self):
+        cases = [
+            ("-2,00", Decimal("-2.000")),
+            ("−1.25", Decimal("-1.250")),  # типографский минус
+            ("–0,5", Decimal("-0.500")),
+            ("+0,50", Decimal("0.500")),
+            (",75", Decimal("0.750")),
+            ("8.6 мм", Decimal("8.600")),
+            ("8,6mm", Decimal("8.600")),
+            ("-3 дптр", Decimal("-3.000")),
+            ("180°", Decimal("180.000")),
+            (" 14 ", Decimal("14.000")),
+            (90, Decimal("90.000")),
+            ("99999.999", Decimal("99999.999")),
+            ("100000", None),  # не помещается в numeric_value
+            ("1e3", None),
+            ("чёрный", None),
+            ("-", None),
+            ("", None),
+            (None, None),
+        ]
+        for value, expected in cases:
+            with self.subTest(value=value):
+                self.assertEqual(parse_numeric(value), expected)
+
+    def test_parse_range(self):
+        cases = [
+            ("-6..-3", (Decimal("-6.000"), Decimal("-3.000"))),
+            ("−6,00..−3,00", (Decimal("-6.000"), Decimal("-3.000"))),
+            ("-3..-6", (Decimal("-6.000"), Decimal("-3.000"))),  # границы переставляются
+            ("..-3", (None, Decimal("-3.000"))),
+            ("8.6..", (Decimal("8.600"), None)),
+            ("-6..чёрный", (Decimal("-6.000"), None)),
+            ("..", None),
+            ("a..b", None),
+            ("-3", None),
+            ("black", None),
+            (None, None),
+        ]
+        for value, expected in cases:
+            with self.subTest(value=value):
+                self.assertEqual(parse_range(value), expected)
+
+    def test_attribute_filters(self):
+        filters = parse_attribute_filters({
+            "attr_sph": "..-3",
+            "attr_color": "black,,white",
+            "attr_empty": "",
+            "category": "lenses",
+        })
+
+        self.assertEqual(filters, {"sph": (None, Decimal("-3.000")), "color": ["black", "white"]})
+
+
+class AttributeRangeFilterTests(TestCase):
+    """Фильтр каталога по диапазону числового атрибута"""
+
+    def setUp(self):
+        category = Category.objects.create(name="Линзы", slug="lenses")
+        self.sph = Attribute.objects.create(name="SPH", slug="sph", is_filterable=True)
+        for slug, sph, price in (
+            ("minus-7", "−7,00", 700), ("minus-5", "-5,00", 500), ("minus-3", "-3,00", 300), ("plus-1", "+1,00", 100),
+        ):
+            product = Product.objects.create(name=slug, slug=slug, category=category, price=price, is_active=True)
+            variant = ProductVariant.objects.create(product=product, sku=slug, stock=5, is_active=True)
+            variant.attribute_values.add(AttributeValue.objects.create(attribute=self.sph, value=sph, slug=slug))
+        # Значение в атрибутах самого товара, без вариаций
+        product = Product.objects.create(name="minus-4", slug="minus-4", category=category, price=400, is_active=True)
+        ProductAttributeValue.objects.create(
+            product=product, attribute=self.sph,
+            attribute_value=AttributeValue.objects.create(attribute=self.sph, value="-4", slug="m4"),
+        )
+        self.api = APIClient()
+
+    def list_slugs(self, **params):
+        response = self.api.get("/api/catalog/products/", params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(p["slug"] for p in response.json()["results"])
+
+    def test_products_filtered_by_range(self):
+        self.assertEqual(self.list_slugs(attr_sph="-6..-3"), ["minus-3", "minus-4", "minus-5"])
+        self.assertEqual(self.list_slugs(attr_sph="..-5"), ["minus-5", "minus-7"])
+        self.assertEqual(self.list_slugs(attr_sph="0.."), ["plus-1"])
+
+    def test_out_of_stock_variant_not_matched(self):
+        ProductVariant.objects.filter(sku="minus-5").update(stock=0)
+
+        self.assertEqual(self.list_slugs(attr_sph="-6..-3"), ["minus-3", "minus-4"])
+
+    def test_filters_narrowed_by_range(self):
+        response = self.api.get("/api/catalog/products/filters/", {"attr_sph": "-6..-3"})
+
+        self.assertEqual(response.status_code, 200)
+        price_range = response.json()["price_range"]
+        self.assertEqual((Decimal(price_range["min"]), Decimal(price_range["max"])), (300, 500))
@@ -1,5 +1,6 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import CategoryViewSet, BrandViewSet, ProductViewSet, AttributeViewSet, ReviewViewSet
+from .views import CategoryViewSet, BrandViewSet, ProductViewSet, AttributeViewSet, ReviewViewSet, PrescriptionMatchView
 
 router = DefaultRouter()
 router.register(r"categories", CategoryViewSet, basename="categories")
@@ -8,4 +9,6 @@ router.register(r"products", ProductViewSet, basename="products")
 router.register(r"attributes", AttributeViewSet, basename="attributes")
 router.register(r"reviews", ReviewViewSet, basename="reviews")
 
-urlpatterns = router.urls
+urlpatterns = [
+    path("match/", PrescriptionMatchView.as_view(), name="prescription_match"),
+] + router.urls
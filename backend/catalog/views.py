@@ -1,17 +1,21 @@
-from rest_framework import viewsets, permissions
+from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.views import APIView
 
-from django.db.models import Q, Min, Max, F
+from django.db.models import Q, Min, Max, F, Exists, OuterRef
 from django_filters.rest_framework import FilterSet, filters
 
 from .models import Category, Brand, Product, Attribute, AttributeValue, ProductVariant, ProductAttributeValue, Review, CatalogSettings
 from .serializers import (
     CategorySerializer, BrandSerializer, ProductListSerializer, ProductDetailSerializer,
-    AttributeSerializer, AttributeFilterSerializer,
+    AttributeSerializer, AttributeFilterSerializer, ProductVariantSerializer,
     ReviewSerializer, ReviewCreateSerializer, ProductReviewsSerializer
 )
+from .matching import match_prescription
+from .numeric import parse_range
+from accounts.models import Prescription
 
 
 class CatalogPagination(PageNumberPagination):
@@ -32,6 +36,59 @@ class ProductFilter(FilterSet):
         fields = ["category", "brand", "min_price", "max_price", "is_sale"]
 
 
+def parse_attribute_filters(query_params) -> dict:
+    """
+    Собирает attr_* параметры: {slug атрибута: список slug значений или диапазон (от, до)}.
+    Диапазон задаётся через "..": attr_sph=-6..-3, attr_sph=..-3, attr_bc=8.6..
+    """
+    attr_filters = {}
+    for key, value in query_params.items():
+        if not key.startswith("attr_") or not value:
+            continue
+        attribute_slug = key[5:]
+        value_range = parse_range(value)
+        if value_range is not None:
+            attr_filters[attribute_slug] = value_range
+            continue
+        value_slugs = [v for v in value.split(",") if v]
+        if value_slugs:
+            attr_filters[attribute_slug] = value_slugs
+    return attr_filters
+
+
+def attribute_filter_q(attribute_slug: str, condition) -> Q:
+    """
+    Условие "товар имеет значение атрибута": в вариации в наличии
+    или в атрибутах самого товара.
+    Диапазон проверяется по индексу (attribute, numeric_value).
+    """
+    values = AttributeValue.objects.filter(attribute__slug=attribute_slug)
+    if isinstance(condition, tuple):
+        low, high = condition
+        if low is not None:
+            values = values.filter(numeric_value__gte=low)
+        if high is not None:
+            values = values.filter(numeric_value__lte=high)
+    else:
+        values = values.filter(slug__in=condition)
+
+    # Подзапрос для вариаций
+    variant_subquery = ProductVariant.objects.filter(
+        product=OuterRef("pk"),
+        is_active=True,
+        stock__gt=0,
+        attribute_values__in=values,
+    )
+
+    # Подзапрос для атрибутов товара
+    pav_subquery = ProductAttributeValue.objects.filter(
+        product=OuterRef("pk"),
+        attribute_value__in=values,
+    )
+
+    return Q(Exists(variant_subquery)) | Q(Exists(pav_subquery))
+
+
 class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.AllowAny]
     queryset = Category.objects.filter(is_active=True)
@@ -148,49 +205,15 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         """
         Поддержка фильтрации по атрибутам.
-        Формат: ?attr_{attribute_slug}={value_slug}
-        Пример: ?attr_color=black&attr_material=titanium,plastic
+        Формат: ?attr_{attribute_slug}={value_slug} или ?attr_{attribute_slug}={от}..{до}
+        Пример: ?attr_color=black&attr_material=titanium,plastic&attr_sph=-6..-3
 
         Оптимизировано для быстрой выборки через подзапросы.
         """
         queryset = super().get_queryset()
 
-        # Собираем все attr_* фильтры
-        attr_filters = {}
-        for key, value in self.request.query_params.items():
-            if not key.startswith("attr_"):
-                continue
-            attribute_slug = key[5:]
-            value_slugs = [v for v in value.split(",") if v]
-            if value_slugs:
-                attr_filters[attribute_slug] = value_slugs
-
-        if not attr_filters:
-            return queryset
-
-        # Используем подзапросы для лучшей производительности
-        from django.db.models import Exists, OuterRef
-
-        for attribute_slug, value_slugs in attr_filters.items():
-            # Подзапрос для вариаций
-            variant_subquery = ProductVariant.objects.filter(
-                product=OuterRef("pk"),
-                is_active=True,
-                stock__gt=0,
-                attribute_values__attribute__slug=attribute_slug,
-                attribute_values__slug__in=value_slugs
-            )
-
-            # Подзапрос для атрибутов товара
-            pav_subquery = ProductAttributeValue.objects.filter(
-                product=OuterRef("pk"),
-                attribute__slug=attribute_slug,
-                attribute_value__slug__in=value_slugs
-            )
-
-            queryset = queryset.filter(
-                Exists(variant_subquery) | Exists(pav_subquery)
-            )
+        for attribute_slug, condition in parse_attribute_filters(self.request.query_params).items():
+            queryset = queryset.filter(attribute_filter_q(attribute_slug, condition))
 
         return queryset
 
@@ -272,11 +295,7 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
         max_price = request.query_params.get("max_price") or ""
 
         # Собираем attr_* параметры
-        attr_filters = {}
-        for key, value in request.query_params.items():
-            if key.startswith("attr_") and value:
-                attr_slug = key[5:]
-                attr_filters[attr_slug] = [v for v in value.split(",") if v]
+        attr_filters = parse_attribute_filters(request.query_params)
 
         base_qs = Product.objects.filter(is_active=True).select_related("category", "brand")
 
@@ -302,29 +321,10 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
                 pass
 
         # Применяем атрибутные фильтры (оптимизировано через подзапросы)
-        from django.db.models import Exists, OuterRef, Count
+        from django.db.models import Count
 
-        for attr_slug, value_slugs in attr_filters.items():
-            if value_slugs:
-                # Подзапрос для вариаций
-                variant_subquery = ProductVariant.objects.filter(
-                    product=OuterRef("pk"),
-                    is_active=True,
-                    stock__gt=0,
-                    attribute_values__attribute__slug=attr_slug,
-                    attribute_values__slug__in=value_slugs
-                )
-
-                # Подзапрос для атрибутов товара
-                pav_subquery = ProductAttributeValue.objects.filter(
-                    product=OuterRef("pk"),
-                    attribute__slug=attr_slug,
-                    attribute_value__slug__in=value_slugs
-                )
-
-                base_qs = base_qs.filter(
-                    Exists(variant_subquery) | Exists(pav_subquery)
-                )
+        for attr_slug, condition in attr_filters.items():
+            base_qs = base_qs.filter(attribute_filter_q(attr_slug, condition))
 
         base_qs = base_qs.distinct()
         product_ids = list(base_qs.values_list("id", flat=True))
@@ -422,7 +422,8 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
         values_qs = AttributeValue.objects.filter(
             id__in=val_ids
         ).select_related("attribute").order_by(
-            "attribute__sort", "attribute__name", "sort", "value"
+            "attribute__sort", "attribute__name", "sort",
+            F("numeric_value").asc(nulls_last=True), "value"
         )
 
         # Подсчёт товаров для каждого значения атрибута (ОПТИМИЗИРОВАНО - 2 запроса вместо сотен)
@@ -481,6 +482,67 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
         })
 
 
+class PrescriptionMatchView(APIView):
+    """
+    Подбор линз под рецепт пользователя.
+
+    GET /api/catalog/match/?prescription={id}&category={slug}
+
+    Для каждого глаза возвращает параметры рецепта и товары
+    с подходящими вариациями в наличии.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        try:
+            prescription_id = int(request.query_params.get("prescription", ""))
+        except ValueError:
+            return Response(
+                {"prescription": ["Укажите ID рецепта"]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        prescription = Prescription.objects.filter(pk=prescription_id, user=request.user).first()
+        if prescription is None:
+            return Response({"detail": "Рецепт не найден"}, status=status.HTTP_404_NOT_FOUND)
+
+        category = request.query_params.get("category") or ""
+        eyes = {}
+        for eye, (constraints, variants) in match_prescription(prescription, category).items():
+            eyes[eye] = {
+                "constraints": {parameter: str(value) for parameter, value in constraints.items()},
+                "products": self._group_by_product(variants),
+            }
+
+        return Response({
+            "prescription": {
+                "id": prescription.id,
+                "name": prescription.name,
+                "prescription_type": prescription.prescription_type,
+            },
+            "category": category or None,
+            **eyes,
+        })
+
+    def _group_by_product(self, variants):
+        products = {}
+        for variant in variants:
+            product = variant.product
+            item = products.get(product.id)
+            if item is None:
+                item = products[product.id] = {
+                    "id": product.id,
+                    "slug": product.slug,
+                    "name": product.name,
+                    "main_image_url": (
+                        self.request.build_absolute_uri(product.main_image.url) if product.main_image else ""
+                    ),
+                    "variants": [],
+                }
+            item["variants"].append(ProductVariantSerializer(variant).data)
+        return list(products.values())
+
+
 class ReviewViewSet(viewsets.ModelViewSet):
     """ViewSet для отзывов"""
     queryset = Review.objects.select_related("user", "product").all()
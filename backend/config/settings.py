@@ -54,6 +54,7 @@ INSTALLED_APPS = [
     "content",
     "pages",
     "token_manager",
+    "outbox",
 ]
 
 MIDDLEWARE = [
@@ -99,6 +100,18 @@ DATABASES = {
     }
 }
 
+# Общий кэш для всех процессов: кэш пользователя JWT-аутентификации,
+# статус платежа YooKassa и блокировка его запроса. Без REDIS_URL
+# используется кэш в памяти процесса - у каждого воркера свой
+REDIS_URL = env("REDIS_URL", "")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator"},
@@ -129,7 +142,7 @@ CORS_ALLOW_CREDENTIALS = True
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
@@ -156,7 +169,9 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
     "ROTATE_REFRESH_TOKENS": True,  # Выдавать новый refresh при обновлении
     "BLACKLIST_AFTER_ROTATION": True,  # Блэклистить старый refresh после ротации
-    "UPDATE_LAST_LOGIN": True,  # Обновлять last_login при авторизации
+    # Не писать last_login при каждом получении токена: вход в админку
+    # (сессия) по-прежнему обновляет его
+    "UPDATE_LAST_LOGIN": False,
     "AUTH_HEADER_TYPES": ("Bearer",),
     "AUTH_HEADER_NAME": "HTTP_AUTHORIZATION",
 }
@@ -186,11 +201,17 @@ BITRIX24_WEBHOOK_URL = env("BITRIX24_WEBHOOK_URL", "")
 WOOCOMMERCE_URL = env("WOOCOMMERCE_URL", "")
 WOOCOMMERCE_CONSUMER_KEY = env("WOOCOMMERCE_CONSUMER_KEY", "")
 WOOCOMMERCE_CONSUMER_SECRET = env("WOOCOMMERCE_CONSUMER_SECRET", "")
+WOOCOMMERCE_WEBHOOK_SECRET = env("WOOCOMMERCE_WEBHOOK_SECRET", "")
 
 # YooKassa (ЮKassa) integration
 YOOKASSA_SHOP_ID = env("YOOKASSA_SHOP_ID", "")
 YOOKASSA_SECRET_KEY = env("YOOKASSA_SECRET_KEY", "")
 YOOKASSA_RETURN_URL = env("YOOKASSA_RETURN_URL", "")
+# Для проверки на локальном сервере: manage.py fake_yookassa
+YOOKASSA_API_URL = env("YOOKASSA_API_URL", "https://api.yookassa.ru/v3")
+
+# Резерв остатков под корзину, секунд
+STOCK_RESERVATION_TTL = int(env("STOCK_RESERVATION_TTL", "900"))
 
 # Frontend URL (для редиректов)
 FRONTEND_URL = env("FRONTEND_URL", "http://localhost:5173")
@@ -292,3 +313,7 @@ SITE_URL = env("SITE_URL", FRONTEND_URL).rstrip("/") # адрес фронта/
 SUPPORT_EMAIL = env("SUPPORT_EMAIL", "info@opticplace.ru")
 SUPPORT_PHONE = env("SUPPORT_PHONE", "+7 (495) 123-45-67")
 SUPPORT_PHONE_TEL = env("SUPPORT_PHONE_TEL", "+74951234567")  # для tel:
+
+# Кэш пользователя для JWT-аутентификации, секунд (accounts.authentication).
+# Без общего кэша сброс не доходит до других воркеров - TTL короче
+AUTH_USER_CACHE_TTL = int(env("AUTH_USER_CACHE_TTL", "60" if REDIS_URL else "10"))
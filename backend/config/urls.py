@@ -17,6 +17,7 @@ urlpatterns = [
     path("api/appointments/", include("appointments.urls")),
     path("api/content/", include("content.urls")),
     path("api/pages/", include("pages.urls")),
+    path("api/integrations/", include("integrations.urls")),
 ]
 
 if settings.DEBUG:
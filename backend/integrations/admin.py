@@ -1,11 +1,29 @@
 from unfold.admin import ModelAdmin
 from django.contrib import admin
 
-# Регистрируйте модели здесь при необходимости
-# Например:
-# from .models import YourModel
-#
-# @admin.register(YourModel)
-# class YourModelAdmin(ModelAdmin):
-#     list_display = ("field1", "field2")
-#     search_fields = ("field1",)
+from .models import WooCommerceProductEvent, WooCommerceStockDelta, YooKassaEvent
+
+
+@admin.register(WooCommerceProductEvent)
+class WooCommerceProductEventAdmin(ModelAdmin):
+    list_display = ("wc_id", "action", "topic", "received_at", "events_count", "attempts")
+    list_filter = ("action", "topic")
+    search_fields = ("wc_id",)
+    readonly_fields = ("received_at",)
+
+
+@admin.register(WooCommerceStockDelta)
+class WooCommerceStockDeltaAdmin(ModelAdmin):
+    list_display = ("sku", "delta", "reason", "created_at", "stock_target", "pushed_at", "attempts")
+    list_filter = ("pushed_at",)
+    search_fields = ("sku", "reason")
+    raw_id_fields = ("product", "variant")
+    readonly_fields = ("created_at", "stock_before", "stock_target")
+
+
+@admin.register(YooKassaEvent)
+class YooKassaEventAdmin(ModelAdmin):
+    list_display = ("event", "object_id", "order_id", "object_status", "signed", "received_at", "processed_at", "attempts")
+    list_filter = ("event", "signed", "processed_at")
+    search_fields = ("object_id", "payment_id", "order_id")
+    readonly_fields = ("received_at",)
@@ -1,19 +1,61 @@
-import requests
 import logging
+from urllib.parse import urlencode
+
+from .http import get_client
 
 logger = logging.getLogger(__name__)
 
+# (connect, read) в секундах
+REQUEST_TIMEOUT = (5, 15)
+
+# Максимум команд в одном вызове batch
+BATCH_LIMIT = 50
+
+
+def build_query(params: dict) -> str:
+    """
+    Параметры команды batch в формате PHP http_build_query:
+    {"fields": {"PHONE": [{"VALUE": "+7..."}]}} -> fields[PHONE][0][VALUE]=%2B7...
+    """
+    pairs = []
+
+    def walk(prefix, value):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                walk(f"{prefix}[{key}]" if prefix else str(key), item)
+        elif isinstance(value, (list, tuple)):
+            for index, item in enumerate(value):
+                walk(f"{prefix}[{index}]", item)
+        elif value is not None:
+            pairs.append((prefix, value))
+
+    walk("", params)
+    return urlencode(pairs)
+
+
+def lead_fields(title: str, name: str, phone: str, email: str, comment: str) -> dict:
+    return {
+        "TITLE": title,
+        "NAME": name,
+        "PHONE": [{"VALUE": phone, "VALUE_TYPE": "WORK"}] if phone else [],
+        "EMAIL": [{"VALUE": email, "VALUE_TYPE": "WORK"}] if email else [],
+        "COMMENTS": comment or "",
+        "SOURCE_ID": "WEB",
+    }
+
 
 class Bitrix24Client:
     def __init__(self, webhook_base_url: str):
         self.webhook_base_url = (webhook_base_url or "").strip().rstrip("/")
+        self.http = get_client("bitrix24", timeout=REQUEST_TIMEOUT)
 
     def is_configured(self) -> bool:
         return bool(self.webhook_base_url)
 
     def _post(self, method: str, payload: dict):
+        # Методы вида crm.lead.add не идемпотентны - без повторов
         url = f"{self.webhook_base_url}/{method}.json"
-        resp = requests.post(url, json=payload, timeout=15)
+        resp = self.http.post(url, endpoint=method, json=payload)
         resp.raise_for_status()
         return resp.json()
 
@@ -22,12 +64,34 @@ class Bitrix24Client:
             logger.info("Bitrix24 webhook not configured; skipping create_lead")
             return None
 
-        fields = {
-            "TITLE": title,
-            "NAME": name,
-            "PHONE": [{"VALUE": phone, "VALUE_TYPE": "WORK"}] if phone else [],
-            "EMAIL": [{"VALUE": email, "VALUE_TYPE": "WORK"}] if email else [],
-            "COMMENTS": comment or "",
-            "SOURCE_ID": "WEB",
-        }
+        fields = lead_fields(title, name, phone, email, comment)
         return self._post("crm.lead.add", {"fields": fields})
+
+    def batch(self, commands: dict) -> tuple:
+        """
+        Выполняет до BATCH_LIMIT команд одним запросом.
+
+        commands: {ключ: (метод, параметры)}
+        Возвращает (results, errors): словари по ключам команд.
+        Команды выполняются независимо (halt=0): ошибка одной
+        не прерывает остальные.
+        """
+        if len(commands) > BATCH_LIMIT:
+            raise ValueError(f"Bitrix24 batch: не больше {BATCH_LIMIT} команд, передано {len(commands)}")
+
+        cmd = {
+            key: f"{method}?{build_query(params)}"
+            for key, (method, params) in commands.items()
+        }
+        data = self._post("batch", {"halt": 0, "cmd": cmd})
+        if "error" in data:
+            raise RuntimeError(f"Bitrix24 batch: {data.get('error_description') or data['error']}")
+
+        result = data.get("result") or {}
+        # Пустые результаты Bitrix24 отдаёт списком, а не объектом
+        results = result.get("result") or {}
+        errors = result.get("result_error") or {}
+        return (
+            results if isinstance(results, dict) else {},
+            errors if isinstance(errors, dict) else {},
+        )
@@ -0,0 +1,311 @@
+"""
+Общий HTTP-слой для интеграций (YooKassa, Bitrix24, WooCommerce, загрузка изображений).
+
+Каждый сервис получает свой ServiceClient:
+
+    - requests-сессию с пулом keep-alive соединений;
+    - таймауты (connect, read), заданные для сервиса;
+    - повторы с экспоненциальной паузой и случайным разбросом (full jitter)
+      при ошибках соединения, таймаутах и ответах 5xx;
+    - circuit breaker на каждый upstream (сервис + хост): после серии
+      ошибок запросы к хосту сразу завершаются CircuitOpen, не занимая
+      воркер на время таймаута, а через reset_timeout пропускается
+      пробный запрос;
+    - гистограммы задержек и счётчики ошибок по endpoint'ам
+      (metrics_snapshot(), /api/integrations/metrics/).
+
+Метрики и состояние circuit breaker'ов общие для процесса.
+"""
+import logging
+import random
+import re
+import threading
+import time
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограммы задержек, секунд
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+RETRY_STATUSES = (500, 502, 503, 504)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+# Сегменты пути, похожие на идентификаторы, в метриках заменяются на {id}
+_ID_SEGMENT = re.compile(r"^(\d+|[0-9a-f]{8,}(-[0-9a-f]{4,})*)$", re.IGNORECASE)
+
+
+class CircuitOpen(requests.exceptions.ConnectionError):
+    """Upstream временно отключён circuit breaker'ом"""
+
+
+class CircuitBreaker:
+    """
+    Размыкается после failure_threshold ошибок подряд и не пропускает
+    запросы reset_timeout секунд, затем пропускает один пробный запрос.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if now - self.opened_at >= self.reset_timeout:
+                # Пробный запрос: остальные ждут его результата
+                # (или следующего пробного, если этот не завершился)
+                self.state = self.HALF_OPEN
+                self.opened_at = now
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+@dataclass
+class EndpointStats:
+    """Гистограмма задержек и счётчики ответов одного endpoint'а"""
+    buckets: list = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+    count: int = 0
+    total_time: float = 0.0
+    errors: int = 0
+    statuses: dict = field(default_factory=dict)
+
+    def observe(self, elapsed: float, status: Optional[int], error: bool):
+        self.buckets[bisect_left(LATENCY_BUCKETS, elapsed)] += 1
+        self.count += 1
+        self.total_time += elapsed
+        if error:
+            self.errors += 1
+        key = str(status) if status else "error"
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+_breakers = {}
+_breakers_lock = threading.Lock()
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _record(service: str, method: str, endpoint: str, elapsed: float, status: Optional[int], error: bool):
+    key = (service, method, endpoint)
+    with _metrics_lock:
+        stats = _metrics.get(key)
+        if stats is None:
+            stats = _metrics[key] = EndpointStats()
+        stats.observe(elapsed, status, error)
+
+
+def metrics_snapshot() -> list:
+    """Метрики запросов процесса по (сервис, метод, endpoint)"""
+    with _metrics_lock:
+        items = sorted(_metrics.items())
+        return [
+            {
+                "service": service,
+                "method": method,
+                "endpoint": endpoint,
+                "count": stats.count,
+                "errors": stats.errors,
+                "avg_ms": round(stats.total_time / stats.count * 1000, 1) if stats.count else 0,
+                "statuses": dict(stats.statuses),
+                "latency_buckets": {
+                    (f"le_{bound}" if i < len(LATENCY_BUCKETS) else "inf"): n
+                    for i, (bound, n) in enumerate(zip(LATENCY_BUCKETS + (None,), stats.buckets))
+                },
+            }
+            for (service, method, endpoint), stats in items
+        ]
+
+
+def breakers_snapshot() -> list:
+    with _breakers_lock:
+        return [
+            {"service": service, "host": host, "state": breaker.state, "failures": breaker.failures}
+            for (service, host), breaker in sorted(_breakers.items())
+        ]
+
+
+def endpoint_label(url: str) -> str:
+    """Путь запроса без идентификаторов: /v3/payments/2d8a-... -> /v3/payments/{id}"""
+    parsed = urlparse(url)
+    segments = [
+        "{id}" if _ID_SEGMENT.match(segment) else segment
+        for segment in parsed.path.split("/")
+    ]
+    return "/".join(segments) or "/"
+
+
+class ServiceClient:
+    """HTTP-клиент одного сервиса поверх общей пуловой сессии"""
+
+    def __init__(
+        self,
+        service: str,
+        base_url: str = "",
+        timeout=(5, 30),
+        retries: int = 2,
+        backoff: float = 0.5,
+        max_backoff: float = 10.0,
+        retry_statuses=RETRY_STATUSES,
+        pool_size: int = 10,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+    ):
+        self.service = service
+        self.base_url = (base_url or "").rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_statuses = tuple(retry_statuses)
+        self.pool_size = pool_size
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(
+                        pool_connections=self.pool_size,
+                        pool_maxsize=self.pool_size,
+                        max_retries=0,
+                    )
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    def close(self):
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        key = (self.service, urlparse(url).netloc)
+        with _breakers_lock:
+            breaker = _breakers.get(key)
+            if breaker is None:
+                breaker = _breakers[key] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return breaker
+
+    def retry_delay(self, attempt: int) -> float:
+        """Пауза перед повтором: случайная в пределах backoff * 2^attempt"""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        endpoint: str = None,
+        retry: Optional[bool] = None,
+        **kwargs,
+    ) -> requests.Response:
+        """
+        Выполняет запрос с повторами и учётом в метриках.
+
+        url: абсолютный или относительно base_url
+        endpoint: метка для метрик (по умолчанию путь без идентификаторов)
+        retry: повторять ли запрос; по умолчанию только идемпотентные методы.
+               Неидемпотентный запрос можно повторять, если он защищён
+               ключом идемпотентности (как платежи YooKassa).
+        """
+        method = method.upper()
+        if not url.startswith(("http://", "https://")):
+            url = f"{self.base_url}/{url.lstrip('/')}"
+        endpoint = endpoint or endpoint_label(url)
+        if retry is None:
+            retry = method in IDEMPOTENT_METHODS
+        kwargs.setdefault("timeout", self.timeout)
+
+        breaker = self.breaker(url)
+        attempts = 1 + (self.retries if retry else 0)
+        for attempt in range(attempts):
+            if not breaker.allow():
+                _record(self.service, method, endpoint, 0.0, None, True)
+                raise CircuitOpen(f"{self.service}: {urlparse(url).netloc} временно недоступен")
+
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                _record(self.service, method, endpoint, time.perf_counter() - started, None, True)
+                breaker.failure()
+                if attempt + 1 >= attempts:
+                    raise
+                delay = self.retry_delay(attempt)
+                logger.warning(
+                    f"{self.service} {method} {endpoint}: {e.__class__.__name__} "
+                    f"(попытка {attempt + 1}/{attempts}), повтор через {delay:.1f} сек"
+                )
+                time.sleep(delay)
+                continue
+
+            failed = response.status_code in self.retry_statuses
+            _record(self.service, method, endpoint, time.perf_counter() - started, response.status_code, failed)
+            if not failed:
+                breaker.success()
+                return response
+
+            breaker.failure()
+            if attempt + 1 >= attempts:
+                return response
+            delay = self.retry_delay(attempt)
+            logger.warning(
+                f"{self.service} {method} {endpoint}: HTTP {response.status_code} "
+                f"(попытка {attempt + 1}/{attempts}), повтор через {delay:.1f} сек"
+            )
+            response.close()
+            time.sleep(delay)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+
+def get_client(service: str, **config) -> ServiceClient:
+    """
+    Общий для процесса клиент сервиса.
+    Настройки применяются при первом обращении к сервису.
+    """
+    with _clients_lock:
+        client = _clients.get(service)
+        if client is None:
+            client = _clients[service] = ServiceClient(service, **config)
+        return client
@@ -0,0 +1,151 @@
+"""
+Локальный сервер, отвечающий как входящий webhook Bitrix24.
+
+Нужен для проверки send_bitrix_leads без настоящего портала: лиды
+сохраняются в памяти, каждой команде crm.lead.add выдаётся новый ID.
+
+Поддерживаются:
+    POST {путь webhook}/batch.json
+    POST {путь webhook}/crm.lead.add.json
+
+Использование:
+    python manage.py fake_bitrix24
+    python manage.py fake_bitrix24 --port 8766 --fail-every 5 --latency 200
+
+    BITRIX24_WEBHOOK_URL=http://127.0.0.1:8766/rest/1/token python manage.py send_bitrix_leads
+
+Опции:
+    --port N            Порт (по умолчанию 8766)
+    --fail-every N      Отклонять каждый N-й лид (по умолчанию 0 - принимать все)
+    --latency MS        Задержка ответа в миллисекундах
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+from django.core.management.base import BaseCommand
+
+from integrations.bitrix24 import BATCH_LIMIT
+
+
+class FakeBitrix24Handler(BaseHTTPRequestHandler):
+    # Keep-alive, как у настоящего портала
+    protocol_version = "HTTP/1.1"
+    fail_every = 0
+    latency = 0.0
+    leads = []
+    lock = threading.Lock()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            data = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            return self._send(400, {"error": "INVALID_REQUEST", "error_description": "Invalid JSON"})
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        method = self.path.rstrip("/").rsplit("/", 1)[-1].removesuffix(".json")
+        if method == "batch":
+            return self._batch(data.get("cmd") or {})
+        if method == "crm.lead.add":
+            lead_id, error = self._add_lead(data.get("fields") or {})
+            if error:
+                return self._send(400, error)
+            return self._send(200, {"result": lead_id})
+        self._send(404, {"error": "ERROR_METHOD_NOT_FOUND", "error_description": "Method not found!"})
+
+    def _batch(self, cmd):
+        if len(cmd) > BATCH_LIMIT:
+            return self._send(400, {
+                "error": "INVALID_REQUEST",
+                "error_description": f"Max batch length exceeded {BATCH_LIMIT}",
+            })
+
+        results, errors = {}, {}
+        for key, command in cmd.items():
+            method, _, query = command.partition("?")
+            if method != "crm.lead.add":
+                errors[key] = {"error": "ERROR_METHOD_NOT_FOUND", "error_description": "Method not found!"}
+                continue
+            fields = {
+                name[len("fields["):].split("]", 1)[0]: value
+                for name, value in parse_qsl(query)
+                if name.startswith("fields[")
+            }
+            lead_id, error = self._add_lead(fields)
+            if error:
+                errors[key] = error
+            else:
+                results[key] = lead_id
+
+        self._send(200, {
+            "result": {
+                # Как и Bitrix24: пустые результаты - списком
+                "result": results or [],
+                "result_error": errors or [],
+                "result_total": [],
+                "result_next": [],
+                "result_time": {},
+            },
+            "time": {},
+        })
+
+    def _add_lead(self, fields):
+        if not fields.get("TITLE"):
+            return None, {"error": "", "error_description": "Не заполнено обязательное поле TITLE"}
+        with self.lock:
+            number = len(self.leads) + 1
+            if self.fail_every and number % self.fail_every == 0:
+                # Отклонённый лид не сохраняется, но занимает номер,
+                # чтобы повтор того же лида прошёл
+                self.leads.append(None)
+                return None, {"error": "", "error_description": "Лид отклонён тестовым сервером"}
+            self.leads.append(fields)
+            return number, None
+
+    def _send(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class Command(BaseCommand):
+    help = 'Локальный сервер webhook Bitrix24 для проверки отправки лидов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8766, help='Порт (по умолчанию 8766)')
+        parser.add_argument(
+            '--fail-every',
+            type=int,
+            default=0,
+            help='Отклонять каждый N-й лид (по умолчанию 0 - принимать все)',
+        )
+        parser.add_argument(
+            '--latency',
+            type=float,
+            default=0,
+            help='Задержка ответа в миллисекундах (по умолчанию 0)',
+        )
+
+    def handle(self, *args, **options):
+        FakeBitrix24Handler.fail_every = max(0, options['fail_every'])
+        FakeBitrix24Handler.latency = max(0.0, options['latency']) / 1000
+        server = ThreadingHTTPServer(("127.0.0.1", options['port']), FakeBitrix24Handler)
+        self.stdout.write(
+            f'Webhook: http://127.0.0.1:{options["port"]}/rest/1/token (Ctrl+C - остановить)'
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            accepted = sum(1 for lead in FakeBitrix24Handler.leads if lead is not None)
+            self.stdout.write(f'Принято лидов: {accepted}')
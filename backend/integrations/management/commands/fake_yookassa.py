@@ -0,0 +1,144 @@
+"""
+Локальный сервер, отвечающий как API YooKassa.
+
+Нужен для проверки reconcile_payments и опроса статусов без настоящего
+магазина. Платежи берутся из JSON-файла или строятся по заказам в БД:
+каждый N-й заказ считается оплаченным, остальные - ожидающими оплаты.
+
+Поддерживаются:
+    GET /v3/payments?created_at.gte=&created_at.lt=&limit=&cursor=
+    GET /v3/payments/{id}
+    GET /v3/refunds/{id}
+
+Использование:
+    python manage.py fake_yookassa
+    python manage.py fake_yookassa --port 8765 --succeed-every 3
+    python manage.py fake_yookassa --file payments.json
+
+    YOOKASSA_API_URL=http://127.0.0.1:8765/v3 python manage.py reconcile_payments
+
+Опции:
+    --port N            Порт (по умолчанию 8765)
+    --file PATH         JSON со списком платежей в формате YooKassa
+    --succeed-every N   По заказам: оплачен каждый N-й (по умолчанию 2)
+"""
+import json
+from datetime import datetime, timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from django.core.management.base import BaseCommand
+
+from orders.models import Order
+
+
+class FakeYooKassaHandler(BaseHTTPRequestHandler):
+    # Keep-alive, как у настоящего API
+    protocol_version = "HTTP/1.1"
+    payments = []
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+        if parts[:2] != ["v3", "payments"] and parts[:2] != ["v3", "refunds"]:
+            return self._send(404, {"type": "error", "description": "Not found"})
+
+        if parts[1] == "refunds":
+            return self._send(404, {"type": "error", "description": "Refund not found"})
+
+        if len(parts) == 3:
+            payment = next((p for p in self.payments if p["id"] == parts[2]), None)
+            if payment is None:
+                return self._send(404, {"type": "error", "description": "Payment not found"})
+            return self._send(200, payment)
+
+        self._send(200, self._list(parse_qs(url.query)))
+
+    def _list(self, query):
+        def param(name):
+            return query.get(name, [None])[0]
+
+        items = self.payments
+        gte, lt = param("created_at.gte"), param("created_at.lt")
+        if gte:
+            items = [p for p in items if p["created_at"] >= _utc(gte)]
+        if lt:
+            items = [p for p in items if p["created_at"] < _utc(lt)]
+
+        # Курсор - смещение в списке, отсортированном от новых к старым
+        items = sorted(items, key=lambda p: p["created_at"], reverse=True)
+        offset = int(param("cursor") or 0)
+        limit = min(int(param("limit") or 10), 100)
+        page = items[offset:offset + limit]
+        result = {"type": "list", "items": page}
+        if offset + limit < len(items):
+            result["next_cursor"] = str(offset + limit)
+        return result
+
+    def _send(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _utc(value: str) -> str:
+    """ISO 8601 -> UTC в формате YooKassa (2026-01-01T10:00:00.000Z), сравнимый как строка"""
+    date = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=dt_timezone.utc)
+    return date.astimezone(dt_timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+
+
+class Command(BaseCommand):
+    help = 'Локальный сервер API YooKassa для проверки сверки платежей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8765, help='Порт (по умолчанию 8765)')
+        parser.add_argument('--file', help='JSON со списком платежей в формате YooKassa')
+        parser.add_argument(
+            '--succeed-every',
+            type=int,
+            default=2,
+            help='По заказам: оплачен каждый N-й (по умолчанию 2)',
+        )
+
+    def handle(self, *args, **options):
+        if options['file']:
+            with open(options['file'], encoding='utf-8') as f:
+                payments = json.load(f)
+        else:
+            payments = self._payments_from_orders(max(1, options['succeed_every']))
+        for payment in payments:
+            payment["created_at"] = _utc(payment["created_at"])
+
+        FakeYooKassaHandler.payments = payments
+        server = ThreadingHTTPServer(("127.0.0.1", options['port']), FakeYooKassaHandler)
+        self.stdout.write(
+            f'Платежей: {len(payments)}. API: http://127.0.0.1:{options["port"]}/v3 (Ctrl+C - остановить)'
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+    def _payments_from_orders(self, succeed_every):
+        orders = Order.objects.filter(
+            status__in=[Order.STATUS_PLACED, Order.STATUS_CONFIRMED]
+        ).only("id", "payment_id", "grand_total", "created_at")
+        payments = []
+        for order in orders:
+            succeeded = order.id % succeed_every == 0
+            payments.append({
+                "id": order.payment_id or f"fake-{order.id}",
+                "status": "succeeded" if succeeded else "pending",
+                "paid": succeeded,
+                "amount": {"value": str(order.grand_total), "currency": "RUB"},
+                "created_at": order.created_at.isoformat(),
+                "metadata": {"order_id": str(order.id)},
+            })
+        return payments
@@ -0,0 +1,370 @@
+"""
+Передача изменений остатков из журнала WooCommerceStockDelta в WooCommerce.
+
+Изменения суммируются по товару/вариации (SKU), к текущему остатку
+в WooCommerce прибавляется итоговое изменение, и новые значения
+отправляются пачками через products/batch и products/{id}/variations/batch
+(до 100 объектов в запросе). Неудачные записи остаются в журнале
+и отправляются при следующем запуске.
+
+Отправка идемпотентна: перед запросом в записях журнала сохраняются
+остаток WooCommerce и отправляемое значение. Если ответ не получен
+или не совпал с отправленным, результат считается неизвестным, и следующий
+запуск перечитывает остаток в WooCommerce:
+    - остаток равен отправленному - отправка применилась;
+    - остаток равен прежнему - отправка не применилась, изменение отправляется снова;
+    - остаток другой (например, продажа в WooCommerce) - отправка считается
+      применённой, изменение не повторяется, расхождение попадает в отчёт.
+
+REST API WooCommerce не поддерживает условную запись, поэтому продажа
+в WooCommerce между чтением и записью одной пачки будет перезаписана;
+окно ограничено временем двух запросов на пачку.
+
+Использование:
+    python manage.py push_woocommerce_stock
+    python manage.py push_woocommerce_stock --dry-run
+
+Опции:
+    --dry-run       Показать отчёт без отправки в WooCommerce
+    --limit N       Обработать не больше N записей журнала
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from catalog.models import Product
+from integrations.models import WooCommerceProductState, WooCommerceStockDelta
+from integrations.woocommerce import BATCH_LIMIT, WooCommerceClient
+
+MAX_ATTEMPTS = 10
+
+
+@dataclass
+class StockChange:
+    """Суммарное изменение остатка одного товара или вариации"""
+    product_id: int
+    variant_id: int = None
+    sku: str = ""
+    delta: int = 0  # ещё не отправлявшиеся записи
+    entry_ids: list = field(default_factory=list)  # записи, которые передаются сейчас
+    sent_ids: list = field(default_factory=list)  # записи прошлой отправки с неизвестным результатом
+    sent_delta: int = 0
+    sent_before: int = None
+    sent_target: int = None
+    confirmed_ids: list = field(default_factory=list)  # прошлая отправка применилась
+    wc_id: int = None  # ID товара или вариации в WooCommerce
+    before: int = None
+    after: int = None
+    sent: bool = False  # значение отправлено в этом запуске
+    unknown: bool = False  # результат отправки неизвестен, значение сохраняется для проверки
+    error: str = ""
+    skipped: str = ""
+    note: str = ""
+
+    @property
+    def pending(self) -> bool:
+        return bool(self.delta or self.sent_ids)
+
+
+class Command(BaseCommand):
+    help = 'Передача изменений остатков в WooCommerce'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.client = None  # можно подставить WooCommerceClient с другим транспортом
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Показать отчёт без отправки в WooCommerce',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=0,
+            help='Обработать не больше N записей журнала (0 = все)',
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        if self.client is None:
+            self.client = WooCommerceClient()
+
+        if not self.client.is_configured():
+            self.stderr.write(self.style.ERROR('WooCommerce API не настроен'))
+            return
+
+        changes = self._collect(options['limit'])
+        if not changes:
+            self.stdout.write('Нет изменений остатков для передачи')
+            return
+
+        self._resolve_product_ids(changes)
+
+        simple = [c for c in changes if c.variant_id is None and not c.error and c.pending]
+        variations = defaultdict(list)
+        for change in changes:
+            if change.variant_id is not None and not change.error and change.pending:
+                variations[change.wc_id].append(change)
+
+        self._push_products(simple)
+        for parent_wc_id, parent_changes in variations.items():
+            self._push_variations(parent_wc_id, parent_changes)
+
+        if not self.dry_run:
+            self._save_results(changes)
+        self._print_report(changes)
+
+    def _collect(self, limit):
+        """Загружает журнал и суммирует изменения по товару/вариации"""
+        entries = (
+            WooCommerceStockDelta.objects
+            .filter(pushed_at__isnull=True, attempts__lt=MAX_ATTEMPTS)
+            .values(
+                'id', 'product_id', 'variant_id', 'sku', 'delta',
+                'stock_before', 'stock_target',
+            )
+            .order_by('id')
+        )
+        if limit > 0:
+            entries = entries[:limit]
+
+        changes = {}
+        for entry in entries:
+            key = (entry['product_id'], entry['variant_id'])
+            change = changes.get(key)
+            if change is None:
+                change = changes[key] = StockChange(
+                    product_id=entry['product_id'],
+                    variant_id=entry['variant_id'],
+                    sku=entry['sku'],
+                )
+            if entry['stock_target'] is None:
+                change.delta += entry['delta']
+                change.entry_ids.append(entry['id'])
+            else:
+                # Все записи одной отправки получают одинаковые значения
+                change.sent_ids.append(entry['id'])
+                change.sent_delta += entry['delta']
+                change.sent_before = entry['stock_before']
+                change.sent_target = entry['stock_target']
+
+        for change in changes.values():
+            if not change.pending:
+                change.skipped = 'изменения взаимно погасились'
+        return list(changes.values())
+
+    def _resolve_product_ids(self, changes):
+        """
+        ID товаров в WooCommerce по состояниям синхронизации. Товары без состояния
+        (например, из import_woocommerce) ищутся в WooCommerce по SKU товара.
+        """
+        wc_ids = dict(
+            WooCommerceProductState.objects
+            .filter(product_id__in={c.product_id for c in changes})
+            .values_list('product_id', 'wc_id')
+        )
+        unresolved = {c.product_id for c in changes if c.pending} - wc_ids.keys()
+        if unresolved:
+            wc_ids.update(self._find_product_ids_by_sku(unresolved))
+
+        for change in changes:
+            change.wc_id = wc_ids.get(change.product_id)
+            if change.wc_id is None and change.pending:
+                change.error = 'товар не связан с WooCommerce'
+
+    def _find_product_ids_by_sku(self, product_ids):
+        """ID в WooCommerce для товаров без состояния синхронизации: product_id -> wc_id"""
+        skus = dict(
+            Product.objects.filter(pk__in=product_ids).exclude(sku='').values_list('sku', 'pk')
+        )
+        found = {}
+        sku_list = list(skus)
+        for start in range(0, len(sku_list), BATCH_LIMIT):
+            chunk = sku_list[start:start + BATCH_LIMIT]
+            try:
+                by_sku = self.client.get_product_ids_by_sku(chunk)
+            except Exception as e:
+                self.stderr.write(self.style.ERROR(f'Поиск товаров по SKU: {e}'))
+                continue
+            found.update((skus[sku], wc_id) for sku, wc_id in by_sku.items() if sku in skus)
+        return found
+
+    def _push_products(self, changes):
+        """Простые товары: текущий остаток из WC + изменение, пачками по BATCH_LIMIT"""
+        for start in range(0, len(changes), BATCH_LIMIT):
+            chunk = changes[start:start + BATCH_LIMIT]
+            try:
+                current = {
+                    p['id']: p for p in self.client.get_products_stock([c.wc_id for c in chunk])
+                }
+            except Exception as e:
+                self._fail(chunk, e)
+                continue
+
+            updates = self._prepare_updates(chunk, current)
+            self._send(chunk, updates, self.client.batch_update_products)
+
+    def _push_variations(self, parent_wc_id, changes):
+        """Вариации одного товара: сопоставление по SKU, пачками по BATCH_LIMIT"""
+        try:
+            current = {
+                v['sku']: v for v in self.client.get_variations_stock(parent_wc_id) if v.get('sku')
+            }
+        except Exception as e:
+            self._fail(changes, e)
+            return
+
+        for change in changes:
+            wc_var = current.get(change.sku)
+            if wc_var is None:
+                change.error = 'вариация не найдена в WooCommerce по SKU'
+            else:
+                change.wc_id = wc_var['id']
+
+        matched = [c for c in changes if not c.error]
+        by_id = {v['id']: v for v in current.values()}
+        for start in range(0, len(matched), BATCH_LIMIT):
+            chunk = matched[start:start + BATCH_LIMIT]
+            updates = self._prepare_updates(chunk, by_id)
+            self._send(
+                chunk, updates,
+                lambda items: self.client.batch_update_variations(parent_wc_id, items),
+            )
+
+    def _prepare_updates(self, changes, current):
+        """
+        Новые абсолютные значения stock_quantity для запроса batch.
+        Сначала выясняет судьбу прошлой отправки с неизвестным результатом.
+        """
+        updates = []
+        for change in changes:
+            wc_item = current.get(change.wc_id)
+            if wc_item is None:
+                change.error = 'не найден в WooCommerce'
+                continue
+            if wc_item.get('manage_stock') is not True:
+                change.skipped = 'учёт остатков в WooCommerce отключён'
+                continue
+
+            stock = wc_item.get('stock_quantity') or 0
+            delta = change.delta
+            if change.sent_ids:
+                if stock == change.sent_before and stock != change.sent_target:
+                    # Прошлая отправка не применилась - передаём её изменения снова
+                    delta += change.sent_delta
+                    change.entry_ids.extend(change.sent_ids)
+                    change.note = 'прошлая отправка не применилась, отправлено повторно'
+                else:
+                    change.confirmed_ids = change.sent_ids
+                    if stock != change.sent_target:
+                        change.note = (
+                            f'прошлая отправка не подтверждена: было {change.sent_before}, '
+                            f'отправлено {change.sent_target}, сейчас {stock}; изменение не повторяется'
+                        )
+                change.sent_ids = []
+
+            change.before = stock
+            change.after = max(0, stock + delta)
+            if change.after != stock:
+                change.sent = True
+                updates.append({'id': change.wc_id, 'stock_quantity': change.after})
+        return updates
+
+    def _send(self, changes, updates, batch_update):
+        """Сохраняет отправляемые значения в журнал и отправляет пачку"""
+        if not updates or self.dry_run:
+            return
+
+        sent = [c for c in changes if c.sent]
+        self._store_targets(sent)
+        try:
+            self._apply_response(sent, batch_update(updates))
+        except Exception as e:
+            # Запрос мог дойти до WooCommerce - проверим при следующем запуске
+            self._fail(sent, e, unknown=True)
+
+    def _store_targets(self, changes):
+        """Запоминает остаток до отправки и отправляемое значение до запроса в WooCommerce"""
+        with transaction.atomic():
+            for change in changes:
+                WooCommerceStockDelta.objects.filter(id__in=change.entry_ids).update(
+                    stock_before=change.before, stock_target=change.after,
+                )
+
+    def _apply_response(self, changes, response_items):
+        """Сверяет ответ batch с отправленными значениями"""
+        by_id = {item.get('id'): item for item in response_items}
+        for change in changes:
+            item = by_id.get(change.wc_id)
+            if item is None:
+                change.error = 'нет в ответе WooCommerce'
+                change.unknown = True
+            elif item.get('error'):
+                # WooCommerce отклонил объект - значение не записано
+                change.error = item['error'].get('message', 'ошибка WooCommerce')
+            elif item.get('stock_quantity') != change.after:
+                change.error = f'в WooCommerce остаток {item.get("stock_quantity")}, ожидался {change.after}'
+                change.unknown = True
+
+    def _fail(self, changes, error, unknown=False):
+        for change in changes:
+            change.error = str(error)
+            change.unknown = unknown
+
+    def _save_results(self, changes):
+        """
+        Отмечает переданные записи журнала, неудачным увеличивает счётчик попыток.
+        Отправленные значения сохраняются, только если результат неизвестен.
+        """
+        now = timezone.now()
+        done_ids = [i for c in changes for i in c.confirmed_ids]
+        done_ids += [i for c in changes if not c.error for i in c.entry_ids + c.sent_ids]
+        if done_ids:
+            WooCommerceStockDelta.objects.filter(id__in=done_ids).update(pushed_at=now, last_error='')
+
+        errors = defaultdict(list)
+        for change in changes:
+            if change.error:
+                errors[(change.error, change.sent and not change.unknown)].extend(
+                    change.entry_ids + change.sent_ids
+                )
+        for (error, rejected), ids in errors.items():
+            values = {'attempts': F('attempts') + 1, 'last_error': error}
+            if rejected:
+                values.update(stock_before=None, stock_target=None)
+            WooCommerceStockDelta.objects.filter(id__in=ids).update(**values)
+
+    def _print_report(self, changes):
+        """Отчёт сверки: изменение, остаток до и после в WooCommerce"""
+        self.stdout.write(self.style.SUCCESS('\n' + '=' * 50))
+        self.stdout.write(self.style.SUCCESS('СВЕРКА ОСТАТКОВ WOOCOMMERCE'))
+        self.stdout.write(self.style.SUCCESS('=' * 50))
+
+        counts = defaultdict(int)
+        for change in changes:
+            label = change.sku or f'товар {change.product_id}'
+            delta = change.delta + change.sent_delta
+            if change.error:
+                counts['errors'] += 1
+                self.stdout.write(self.style.ERROR(f'  ! {label}: {delta:+d} - {change.error}'))
+            elif change.skipped:
+                counts['skipped'] += 1
+                self.stdout.write(f'  - {label}: {delta:+d} - {change.skipped}')
+            else:
+                counts['pushed'] += 1
+                self.stdout.write(f'  [UPD] {label}: {delta:+d} ({change.before} -> {change.after})')
+            if change.note:
+                self.stdout.write(self.style.WARNING(f'      {change.note}'))
+
+        self.stdout.write('')
+        self.stdout.write(f'  Передано: {counts["pushed"]}')
+        self.stdout.write(f'  Пропущено: {counts["skipped"]}')
+        self.stdout.write(f'  Ошибок: {counts["errors"]}')
+        if self.dry_run:
+            self.stdout.write(self.style.WARNING('  Пробный запуск - в WooCommerce ничего не отправлено'))
@@ -0,0 +1,77 @@
+"""
+Отправка тестового webhook WooCommerce на локальный сервер.
+
+Подписывает данные секретом WOOCOMMERCE_WEBHOOK_SECRET так же, как это
+делает WooCommerce, и позволяет проверить приём и объединение событий
+без настоящего магазина.
+
+Использование:
+    python manage.py send_woocommerce_webhook --id 123
+    python manage.py send_woocommerce_webhook --file product.json --repeat 5
+    python manage.py send_woocommerce_webhook --id 123 --topic product.deleted
+
+Опции:
+    --url URL       Адрес webhook
+    --topic TOPIC   Событие (product.created, product.updated, product.deleted)
+    --id N          ID товара (данные без полей товара - обработчик запросит их через API)
+    --file PATH     JSON с данными товара в формате WooCommerce REST API
+    --repeat N      Отправить событие N раз подряд
+"""
+import json
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from integrations.woocommerce import sign_webhook_payload
+
+
+class Command(BaseCommand):
+    help = 'Отправка тестового webhook WooCommerce'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            default='http://localhost:8000/api/integrations/webhooks/woocommerce/',
+            help='Адрес webhook',
+        )
+        parser.add_argument(
+            '--topic',
+            default='product.updated',
+            help='Событие (по умолчанию product.updated)',
+        )
+        parser.add_argument('--id', type=int, help='ID товара в WooCommerce')
+        parser.add_argument('--file', help='JSON с данными товара')
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=1,
+            help='Сколько раз отправить событие (по умолчанию 1)',
+        )
+
+    def handle(self, *args, **options):
+        secret = settings.WOOCOMMERCE_WEBHOOK_SECRET
+        if not secret:
+            raise CommandError('Укажите WOOCOMMERCE_WEBHOOK_SECRET в .env')
+
+        if options['file']:
+            with open(options['file'], encoding='utf-8') as f:
+                payload = json.load(f)
+        elif options['id']:
+            payload = {'id': options['id']}
+        else:
+            raise CommandError('Укажите --id или --file')
+
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        headers = {
+            'Content-Type': 'application/json',
+            'X-WC-Webhook-Topic': options['topic'],
+            'X-WC-Webhook-Resource': options['topic'].split('.')[0],
+            'X-WC-Webhook-Event': options['topic'].split('.')[-1],
+            'X-WC-Webhook-Signature': sign_webhook_payload(body, secret),
+        }
+
+        with requests.Session() as session:
+            for _ in range(max(1, options['repeat'])):
+                response = session.post(options['url'], data=body, headers=headers, timeout=15)
+                self.stdout.write(f'{options["topic"]} #{payload.get("id")}: {response.status_code}')
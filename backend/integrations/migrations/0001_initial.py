@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-18 22:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('catalog', '0017_alter_brand_options_brand_is_featured_brand_logo_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WooCommerceProductState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('wc_id', models.PositiveBigIntegerField(unique=True, verbose_name='ID в WooCommerce')),
+                ('product_hash', models.CharField(max_length=64, verbose_name='Хэш товара')),
+                ('variations_hash', models.CharField(blank=True, max_length=64, verbose_name='Хэш вариаций')),
+                ('synced_at', models.DateTimeField(auto_now=True, verbose_name='Дата синхронизации')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='wc_states', to='catalog.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Состояние синхронизации WooCommerce',
+                'verbose_name_plural': 'Состояния синхронизации WooCommerce',
+            },
+        ),
+    ]
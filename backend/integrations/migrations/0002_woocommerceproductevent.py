@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-18 22:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WooCommerceProductEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('wc_id', models.PositiveBigIntegerField(unique=True, verbose_name='ID в WooCommerce')),
+                ('action', models.CharField(choices=[('update', 'Обновление'), ('delete', 'Удаление')], max_length=10, verbose_name='Действие')),
+                ('topic', models.CharField(blank=True, max_length=50, verbose_name='Событие')),
+                ('payload', models.JSONField(blank=True, help_text='Пусто - товар будет запрошен через API', null=True, verbose_name='Данные товара')),
+                ('received_at', models.DateTimeField(db_index=True, verbose_name='Получено')),
+                ('events_count', models.PositiveIntegerField(default=1, verbose_name='Событий объединено')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток обработки')),
+                ('retry_at', models.DateTimeField(blank=True, null=True, verbose_name='Повторить после')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+            ],
+            options={
+                'verbose_name': 'Событие товара WooCommerce',
+                'verbose_name_plural': 'Очередь событий WooCommerce',
+                'ordering': ['received_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-18 22:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0018_remoteimage'),
+        ('integrations', '0002_woocommerceproductevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WooCommerceStockDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sku', models.CharField(blank=True, max_length=100, verbose_name='Артикул')),
+                ('delta', models.IntegerField(verbose_name='Изменение остатка')),
+                ('reason', models.CharField(blank=True, max_length=100, verbose_name='Основание')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('pushed_at', models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Передано в WooCommerce')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток передачи')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='wc_stock_deltas', to='catalog.product', verbose_name='Товар')),
+                ('variant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='wc_stock_deltas', to='catalog.productvariant', verbose_name='Вариация')),
+            ],
+            options={
+                'verbose_name': 'Изменение остатка для WooCommerce',
+                'verbose_name_plural': 'Журнал остатков WooCommerce',
+                'ordering': ['id'],
+            },
+        ),
+    ]
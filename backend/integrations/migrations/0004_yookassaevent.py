@@ -0,0 +1,37 @@
+# Generated by Django 6.0.1 on 2026-10-18 23:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0003_woocommercestockdelta'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='YooKassaEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event', models.CharField(max_length=50, verbose_name='Событие')),
+                ('object_id', models.CharField(help_text='ID платежа или возврата', max_length=100, verbose_name='ID объекта')),
+                ('payment_id', models.CharField(blank=True, max_length=100, verbose_name='ID платежа')),
+                ('object_status', models.CharField(blank=True, max_length=32, verbose_name='Статус объекта')),
+                ('order_id', models.PositiveIntegerField(blank=True, null=True, verbose_name='ID заказа')),
+                ('payload', models.JSONField(verbose_name='Данные уведомления')),
+                ('signed', models.BooleanField(default=False, help_text='Неподписанное уведомление сверяется с API YooKassa перед применением', verbose_name='Подпись проверена')),
+                ('received_at', models.DateTimeField(auto_now_add=True, verbose_name='Получено')),
+                ('processed_at', models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Обработано')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток обработки')),
+                ('retry_at', models.DateTimeField(blank=True, null=True, verbose_name='Повторить после')),
+                ('last_error', models.TextField(blank=True, verbose_name='Последняя ошибка')),
+            ],
+            options={
+                'verbose_name': 'Уведомление YooKassa',
+                'verbose_name_plural': 'Уведомления YooKassa',
+                'ordering': ['received_at'],
+                'constraints': [models.UniqueConstraint(fields=('event', 'object_id'), name='uniq_yookassa_event')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 23:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0004_yookassaevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='woocommerceproductstate',
+            name='wc_modified',
+            field=models.CharField(blank=True, help_text='date_modified_gmt товара при последней синхронизации вариаций', max_length=32, verbose_name='Изменён в WooCommerce'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 23:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0005_woocommerceproductstate_wc_modified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='woocommercestockdelta',
+            name='stock_before',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Остаток в WooCommerce до отправки'),
+        ),
+        migrations.AddField(
+            model_name='woocommercestockdelta',
+            name='stock_target',
+            field=models.IntegerField(blank=True, null=True, verbose_name='Отправленный остаток'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 00:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('integrations', '0006_woocommercestockdelta_stock_target'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='woocommerceproductstate',
+            name='images_synced',
+            field=models.BooleanField(default=True, help_text='Снимается, если товар синхронизирован с --skip-images', verbose_name='Изображения загружены'),
+        ),
+    ]
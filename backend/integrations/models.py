@@ -1,3 +1,155 @@
 from django.db import models
 
-# Create your models here.
+
+class WooCommerceProductState(models.Model):
+    """
+    Состояние синхронизации товара из WooCommerce.
+    Хранит хэши нормализованных данных товара и его вариаций,
+    чтобы при повторной синхронизации пропускать неизменённые товары.
+    """
+    wc_id = models.PositiveBigIntegerField("ID в WooCommerce", unique=True)
+    product = models.ForeignKey(
+        "catalog.Product",
+        on_delete=models.CASCADE,
+        related_name="wc_states",
+        verbose_name="Товар"
+    )
+    product_hash = models.CharField("Хэш товара", max_length=64)
+    variations_hash = models.CharField("Хэш вариаций", max_length=64, blank=True)
+    wc_modified = models.CharField(
+        "Изменён в WooCommerce",
+        max_length=32,
+        blank=True,
+        help_text="date_modified_gmt товара при последней синхронизации вариаций"
+    )
+    images_synced = models.BooleanField(
+        "Изображения загружены",
+        default=True,
+        help_text="Снимается, если товар синхронизирован с --skip-images"
+    )
+    synced_at = models.DateTimeField("Дата синхронизации", auto_now=True)
+
+    class Meta:
+        verbose_name = "Состояние синхронизации WooCommerce"
+        verbose_name_plural = "Состояния синхронизации WooCommerce"
+
+    def __str__(self):
+        return f"WC #{self.wc_id} -> {self.product_id}"
+
+
+class WooCommerceProductEvent(models.Model):
+    """
+    Очередь изменений товаров, полученных через webhook WooCommerce.
+    На один товар хранится одна запись: повторные события перезаписывают её,
+    поэтому обработчик применяет только последнее состояние товара.
+    """
+    ACTION_UPDATE = "update"
+    ACTION_DELETE = "delete"
+
+    ACTION_CHOICES = [
+        (ACTION_UPDATE, "Обновление"),
+        (ACTION_DELETE, "Удаление"),
+    ]
+
+    wc_id = models.PositiveBigIntegerField("ID в WooCommerce", unique=True)
+    action = models.CharField("Действие", max_length=10, choices=ACTION_CHOICES)
+    topic = models.CharField("Событие", max_length=50, blank=True)
+    payload = models.JSONField(
+        "Данные товара",
+        null=True,
+        blank=True,
+        help_text="Пусто - товар будет запрошен через API"
+    )
+    received_at = models.DateTimeField("Получено", db_index=True)
+    events_count = models.PositiveIntegerField("Событий объединено", default=1)
+    attempts = models.PositiveSmallIntegerField("Попыток обработки", default=0)
+    retry_at = models.DateTimeField("Повторить после", null=True, blank=True)
+    last_error = models.TextField("Последняя ошибка", blank=True)
+
+    class Meta:
+        verbose_name = "Событие товара WooCommerce"
+        verbose_name_plural = "Очередь событий WooCommerce"
+        ordering = ["received_at"]
+
+    def __str__(self):
+        return f"WC #{self.wc_id}: {self.get_action_display()}"
+
+
+class WooCommerceStockDelta(models.Model):
+    """
+    Журнал изменений остатков для передачи в WooCommerce.
+    Записи создаются при оформлении и отмене заказов,
+    команда push_woocommerce_stock суммирует их по SKU и отправляет пачками.
+
+    Перед отправкой в записи сохраняется остаток WooCommerce и отправляемое
+    значение (stock_before/stock_target): если ответ потерян, следующий запуск
+    по текущему остатку определяет, применилась ли отправка, и не прибавляет
+    изменение второй раз.
+    """
+    product = models.ForeignKey(
+        "catalog.Product",
+        on_delete=models.CASCADE,
+        related_name="wc_stock_deltas",
+        verbose_name="Товар"
+    )
+    variant = models.ForeignKey(
+        "catalog.ProductVariant",
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name="wc_stock_deltas",
+        verbose_name="Вариация"
+    )
+    sku = models.CharField("Артикул", max_length=100, blank=True)
+    delta = models.IntegerField("Изменение остатка")
+    reason = models.CharField("Основание", max_length=100, blank=True)
+    created_at = models.DateTimeField("Дата создания", auto_now_add=True)
+    pushed_at = models.DateTimeField("Передано в WooCommerce", null=True, blank=True, db_index=True)
+    stock_before = models.IntegerField("Остаток в WooCommerce до отправки", null=True, blank=True)
+    stock_target = models.IntegerField("Отправленный остаток", null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField("Попыток передачи", default=0)
+    last_error = models.TextField("Последняя ошибка", blank=True)
+
+    class Meta:
+        verbose_name = "Изменение остатка для WooCommerce"
+        verbose_name_plural = "Журнал остатков WooCommerce"
+        ordering = ["id"]
+
+    def __str__(self):
+        return f"{self.sku or self.product_id}: {self.delta:+d}"
+
+
+class YooKassaEvent(models.Model):
+    """
+    Журнал уведомлений YooKassa.
+    Webhook только сохраняет событие и сразу отвечает 200, изменения заказов
+    применяет команда process_yookassa_events. Повторная доставка того же
+    уведомления упирается в уникальность (событие, объект) и не обрабатывается дважды.
+    """
+    event = models.CharField("Событие", max_length=50)
+    object_id = models.CharField("ID объекта", max_length=100, help_text="ID платежа или возврата")
+    payment_id = models.CharField("ID платежа", max_length=100, blank=True)
+    object_status = models.CharField("Статус объекта", max_length=32, blank=True)
+    order_id = models.PositiveIntegerField("ID заказа", null=True, blank=True)
+    payload = models.JSONField("Данные уведомления")
+    signed = models.BooleanField(
+        "Подпись проверена",
+        default=False,
+        help_text="Неподписанное уведомление сверяется с API YooKassa перед применением"
+    )
+    received_at = models.DateTimeField("Получено", auto_now_add=True)
+    processed_at = models.DateTimeField("Обработано", null=True, blank=True, db_index=True)
+    attempts = models.PositiveSmallIntegerField("Попыток обработки", default=0)
+    retry_at = models.DateTimeField("Повторить после", null=True, blank=True)
+    last_error = models.TextField("Последняя ошибка", blank=True)
+
+    class Meta:
+        verbose_name = "Уведомление YooKassa"
+        verbose_name_plural = "Уведомления YooKassa"
+        ordering = ["received_at"]
+        constraints = [
+            models.UniqueConstraint(fields=["event", "object_id"], name="uniq_yookassa_event"),
+        ]
+
+    def __str__(self):
+        return f"{self.event}: {self.object_id}"
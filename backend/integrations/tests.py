@@ -1,3 +1,383 @@
-from django.test import TestCase
+import io
+import json
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import LiveServerTestCase, TestCase, override_settings
+
+from catalog.images import ImageDownloader
+from catalog.management.commands.process_woocommerce_events import Command as ProcessEventsCommand
+from catalog.models import Category, Product
+
+from .management.commands.push_woocommerce_stock import Command as PushStockCommand
+from .models import WooCommerceProductEvent, WooCommerceProductState, WooCommerceStockDelta
+from .views import enqueue_product_event
+from .woocommerce import CONNECT_TIMEOUT, WooCommerceAPI, WooCommerceClient, sign_webhook_payload
+from .woocommerce_fixtures import FixtureResponse, SyntheticAPI
+from .woocommerce_stock import journal_stock_changes
+from .yookassa import YooKassaClient
+
+WEBHOOK_SECRET = "test-webhook-secret"
+WEBHOOK_URL = "/api/integrations/webhooks/woocommerce/"
+
+
+@override_settings(WOOCOMMERCE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+class WooCommerceWebhookTests(TestCase):
+    """Приём webhook WooCommerce и объединение событий в очереди"""
+
+    def post_event(self, payload, topic="product.updated", secret=WEBHOOK_SECRET):
+        body = json.dumps(payload).encode()
+        return self.client.post(
+            WEBHOOK_URL,
+            data=body,
+            content_type="application/json",
+            HTTP_X_WC_WEBHOOK_TOPIC=topic,
+            HTTP_X_WC_WEBHOOK_SIGNATURE=sign_webhook_payload(body, secret),
+        )
+
+    def test_invalid_signature_rejected(self):
+        response = self.post_event({"id": 1}, secret="wrong-secret")
+
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(WooCommerceProductEvent.objects.exists())
+
+    def test_ping_without_signature_accepted(self):
+        response = self.client.post(
+            WEBHOOK_URL, data=b"webhook_id=5", content_type="application/x-www-form-urlencoded",
+        )
+
+        self.assertEqual(response.status_code, 200)
+
+    def test_repeated_events_coalesce(self):
+        for name in ("Первое", "Второе", "Третье"):
+            self.assertEqual(self.post_event({"id": 7, "name": name}).status_code, 200)
+
+        event = WooCommerceProductEvent.objects.get()
+        self.assertEqual(event.wc_id, 7)
+        self.assertEqual(event.events_count, 3)
+        self.assertEqual(event.payload["name"], "Третье")
+
+    def test_delete_replaces_pending_update(self):
+        self.post_event({"id": 7, "name": "Товар"})
+        self.post_event({"id": 7}, topic="product.deleted")
+
+        event = WooCommerceProductEvent.objects.get()
+        self.assertEqual(event.action, WooCommerceProductEvent.ACTION_DELETE)
+
+    def test_variation_queues_parent(self):
+        self.post_event({"id": 7001, "type": "variation", "parent_id": 7, "name": "Вариация"})
+
+        event = WooCommerceProductEvent.objects.get()
+        self.assertEqual(event.wc_id, 7)
+        self.assertIsNone(event.payload)
+
+
+class ProcessWooCommerceEventsTests(TestCase):
+    """Применение очереди событий логикой sync_woocommerce на синтетическом магазине"""
+
+    def setUp(self):
+        self.api = SyntheticAPI(products=10, variations=4)
+        self.command = ProcessEventsCommand(stdout=io.StringIO(), stderr=io.StringIO())
+        self.command.client = WooCommerceClient(api=self.api)
+        self.command.skip_images = True
+        self.command.image_downloader = ImageDownloader()
+        self.command.verbose = False
+
+    def enqueue(self, wc_id, action=WooCommerceProductEvent.ACTION_UPDATE, payload=None):
+        enqueue_product_event(wc_id, action, payload=payload)
+
+    def test_update_creates_product_and_clears_queue(self):
+        self.enqueue(3)
+
+        self.assertEqual(self.command._process_batch(10), 1)
+
+        product = Product.objects.get(slug="synthetic-3")
+        self.assertTrue(product.is_active)
+        self.assertTrue(WooCommerceProductState.objects.filter(wc_id=3, product=product).exists())
+        self.assertFalse(WooCommerceProductEvent.objects.exists())
+
+    def test_variable_product_payload_applied(self):
+        self.enqueue(4, payload=self.api._product(4))
+
+        self.command._process_batch(10)
+
+        product = Product.objects.get(slug="synthetic-4")
+        self.assertEqual(product.variants.count(), 4)
+
+    def test_delete_deactivates_product(self):
+        self.enqueue(3)
+        self.command._process_batch(10)
+
+        self.enqueue(3, action=WooCommerceProductEvent.ACTION_DELETE)
+        self.command._process_batch(10)
+
+        self.assertFalse(Product.objects.get(slug="synthetic-3").is_active)
+        self.assertFalse(WooCommerceProductState.objects.filter(wc_id=3).exists())
+
+    def test_delete_without_state_matched_by_sku(self):
+        # Товар из import_woocommerce: состояния синхронизации нет, slug другой
+        product = Product.objects.create(
+            name="Из CSV", slug="from-csv", sku="SYN-3",
+            category=Category.objects.create(name="Линзы", slug="lenses"), price=100,
+        )
+
+        self.enqueue(3, action=WooCommerceProductEvent.ACTION_DELETE)
+        self.command._process_batch(10)
+
+        product.refresh_from_db()
+        self.assertFalse(product.is_active)
+        self.assertFalse(WooCommerceProductEvent.objects.exists())
+
+    def test_state_without_images_reprocessed_with_images(self):
+        self.enqueue(3)
+        self.command._process_batch(10)
+        self.assertFalse(WooCommerceProductState.objects.get(wc_id=3).images_synced)
+
+        self.command.skip_images = False
+        self.enqueue(3)
+        with mock.patch.object(self.command, "_sync_product_images", wraps=self.command._sync_product_images) as images:
+            self.command._process_batch(10)
+
+        images.assert_called_once()
+        self.assertTrue(WooCommerceProductState.objects.get(wc_id=3).images_synced)
+
+    def test_states_loaded_for_batch_only(self):
+        self.enqueue(3)
+        self.command._process_batch(10)
+        self.enqueue(4)
+        self.command._process_batch(10)
+
+        self.enqueue(3)
+        self.command._process_batch(10)
+
+        self.assertEqual(set(self.command.sync_states), {3})
+
+    def test_failed_event_scheduled_for_retry(self):
+        self.enqueue(999)  # нет в магазине - товар снимается, ошибки нет
+        self.enqueue(5, payload={"id": 5})  # неполные данные - ошибка разбора
+
+        self.command._process_batch(10)
+
+        event = WooCommerceProductEvent.objects.get()
+        self.assertEqual(event.wc_id, 5)
+        self.assertEqual(event.attempts, 1)
+        self.assertIsNotNone(event.retry_at)
+        self.assertTrue(event.last_error)
+
+
+@override_settings(WOOCOMMERCE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+class SendWooCommerceWebhookTests(LiveServerTestCase):
+    """Локальный отправитель webhook (send_woocommerce_webhook) против запущенного сервера"""
+
+    def test_sender_events_coalesce(self):
+        call_command(
+            "send_woocommerce_webhook",
+            url=self.live_server_url + WEBHOOK_URL,
+            id=42,
+            repeat=3,
+            stdout=io.StringIO(),
+        )
+
+        event = WooCommerceProductEvent.objects.get()
+        self.assertEqual(event.wc_id, 42)
+        self.assertEqual(event.events_count, 3)
+
+
+class WooCommerceAPITests(TestCase):
+    """URL и авторизация запросов WooCommerceAPI"""
+
+    def request(self, url, method="GET", **kwargs):
+        http = mock.Mock()
+        api = WooCommerceAPI(url, "ck_test", "cs_test", http=http)
+        getattr(api, method.lower())("products", **kwargs)
+        return http.request.call_args
+
+    def test_https_uses_basic_auth(self):
+        args, kwargs = self.request("https://shop.example/", params={"page": 2})
+
+        self.assertEqual(args, ("GET", "https://shop.example/wp-json/wc/v3/products"))
+        self.assertEqual(kwargs["params"], {"page": 2})
+        self.assertEqual((kwargs["auth"].username, kwargs["auth"].password), ("ck_test", "cs_test"))
+        self.assertIsNone(kwargs["retry"])
+
+    def test_http_signed_with_oauth(self):
+        args, kwargs = self.request("http://shop.example", params={"page": 2})
+
+        url = args[1]
+        self.assertTrue(url.startswith("http://shop.example/wp-json/wc/v3/products?page=2&"))
+        self.assertIn("oauth_consumer_key=ck_test", url)
+        self.assertIn("oauth_signature=", url)
+        self.assertIsNone(kwargs["auth"])
+        self.assertIsNone(kwargs["params"])
+
+    def test_post_sends_json(self):
+        args, kwargs = self.request("https://shop.example", method="POST", data={"name": "Оправа"}, retry=True)
+
+        self.assertEqual(args[0], "POST")
+        self.assertEqual(json.loads(kwargs["data"]), {"name": "Оправа"})
+        self.assertEqual(kwargs["headers"]["content-type"], "application/json;charset=utf-8")
+        self.assertTrue(kwargs["retry"])
+
+    @override_settings(
+        WOOCOMMERCE_URL="https://shop.example",
+        WOOCOMMERCE_CONSUMER_KEY="ck_test",
+        WOOCOMMERCE_CONSUMER_SECRET="cs_test",
+    )
+    def test_sync_timeout_option_reaches_session(self):
+        response = mock.Mock(status_code=401)
+        with mock.patch.object(requests.Session, "request", return_value=response) as request:
+            call_command("sync_woocommerce", timeout=7, stdout=io.StringIO(), stderr=io.StringIO())
+
+        self.assertEqual(request.call_args.kwargs["timeout"], (CONNECT_TIMEOUT, 7))
+
+
+class FakeStockAPI:
+    """
+    Остатки простых товаров WooCommerce в памяти.
+    drop_responses: сколько следующих batch-запросов применить, но потерять ответ;
+    fail_requests: сколько следующих batch-запросов оборвать до применения.
+    """
+
+    def __init__(self, stock, skus=None):
+        self.stock = dict(stock)
+        self.skus = dict(skus or {})  # SKU товара -> ID
+        self.drop_responses = 0
+        self.fail_requests = 0
+        self.batches = []
+
+    def get(self, endpoint, params=None, **kwargs):
+        if "sku" in params:
+            skus = params["sku"].split(",")
+            items = [{"id": pk, "sku": sku} for sku, pk in self.skus.items() if sku in skus]
+            return FixtureResponse(200, json.dumps(items))
+
+        ids = [int(pk) for pk in params["include"].split(",")]
+        items = [
+            {"id": pk, "stock_quantity": self.stock[pk], "manage_stock": True}
+            for pk in ids if pk in self.stock
+        ]
+        return FixtureResponse(200, json.dumps(items))
+
+    def post(self, endpoint, data, **kwargs):
+        if self.fail_requests:
+            self.fail_requests -= 1
+            raise requests.exceptions.ConnectionError("connection refused")
+
+        self.batches.append(data["update"])
+        for item in data["update"]:
+            self.stock[item["id"]] = item["stock_quantity"]
+        if self.drop_responses:
+            self.drop_responses -= 1
+            raise requests.exceptions.ReadTimeout("response lost")
+
+        items = [{"id": item["id"], "stock_quantity": self.stock[item["id"]]} for item in data["update"]]
+        return FixtureResponse(200, json.dumps({"update": items}))
+
+
+class PushWooCommerceStockTests(TestCase):
+    """Передача журнала остатков: повтор без двойного списания"""
+
+    WC_ID = 501
+
+    def setUp(self):
+        category = Category.objects.create(name="Линзы", slug="lenses")
+        self.product = Product.objects.create(name="Линзы", slug="lenses-1", price=1000, category=category)
+        WooCommerceProductState.objects.create(wc_id=self.WC_ID, product=self.product, product_hash="x")
+        self.api = FakeStockAPI({self.WC_ID: 10})
+
+    def push(self):
+        command = PushStockCommand(stdout=io.StringIO(), stderr=io.StringIO())
+        command.client = WooCommerceClient(api=self.api)
+        call_command(command)
+
+    def journal(self, *deltas):
+        journal_stock_changes([(self.product, None, delta) for delta in deltas], reason="test")
+
+    def test_deltas_coalesced_into_one_update(self):
+        self.journal(-1, -2)
+
+        self.push()
+
+        self.assertEqual(self.api.batches, [[{"id": self.WC_ID, "stock_quantity": 7}]])
+        self.assertFalse(WooCommerceStockDelta.objects.filter(pushed_at__isnull=True).exists())
+
+    def test_lost_response_not_applied_twice(self):
+        self.journal(-2)
+        self.api.drop_responses = 1
+
+        self.push()
+
+        entry = WooCommerceStockDelta.objects.get()
+        self.assertIsNone(entry.pushed_at)
+        self.assertEqual((entry.stock_before, entry.stock_target, entry.attempts), (10, 8, 1))
+
+        self.push()
+
+        self.assertEqual(self.api.stock[self.WC_ID], 8)
+        self.assertEqual(len(self.api.batches), 1)
+        self.assertIsNotNone(WooCommerceStockDelta.objects.get().pushed_at)
+
+    def test_unapplied_request_resent(self):
+        self.journal(-2)
+        self.api.fail_requests = 1
+
+        self.push()
+        self.assertEqual(self.api.stock[self.WC_ID], 10)
+
+        self.journal(-1)
+        self.push()
+
+        self.assertEqual(self.api.stock[self.WC_ID], 7)
+        self.assertFalse(WooCommerceStockDelta.objects.filter(pushed_at__isnull=True).exists())
+
+    def test_sale_in_woocommerce_after_lost_response(self):
+        self.journal(-2)
+        self.api.drop_responses = 1
+        self.push()
+
+        self.api.stock[self.WC_ID] -= 1  # продажа в WooCommerce
+        self.journal(-1)
+        self.push()
+
+        self.assertEqual(self.api.stock[self.WC_ID], 6)
+        self.assertFalse(WooCommerceStockDelta.objects.filter(pushed_at__isnull=True).exists())
+
+    def test_product_without_state_found_by_sku(self):
+        WooCommerceProductState.objects.all().delete()
+        Product.objects.filter(pk=self.product.pk).update(sku="LENS-1")
+        self.api.skus = {"LENS-1": self.WC_ID}
+        self.journal(-3)
+
+        self.push()
+
+        self.assertEqual(self.api.stock[self.WC_ID], 7)
+        self.assertFalse(WooCommerceStockDelta.objects.filter(pushed_at__isnull=True).exists())
+
+
+class YooKassaPaymentCacheTests(TestCase):
+    """Кэш статуса платежа: один запрос к YooKassa, остальные не ждут"""
+
+    PAYMENT_ID = "2d5e-test"
+
+    def setUp(self):
+        cache.clear()
+        self.client_ = YooKassaClient()
+
+    def test_result_cached(self):
+        with mock.patch.object(self.client_, "get_payment", return_value={"status": "pending"}) as get_payment:
+            self.client_.get_payment_cached(self.PAYMENT_ID)
+            result = self.client_.get_payment_cached(self.PAYMENT_ID)
+
+        self.assertEqual(result, {"status": "pending"})
+        get_payment.assert_called_once_with(self.PAYMENT_ID)
+
+    def test_held_lock_returns_immediately(self):
+        cache.add(f"yookassa:payment:{self.PAYMENT_ID}:lock", 1)
+
+        with mock.patch.object(self.client_, "get_payment") as get_payment:
+            result = self.client_.get_payment_cached(self.PAYMENT_ID)
+
+        self.assertIsNone(result)
+        get_payment.assert_not_called()
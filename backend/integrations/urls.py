@@ -0,0 +1,10 @@
+from django.urls import path
+from .views import IntegrationMetricsView, woocommerce_webhook
+
+urlpatterns = [
+    # Webhooks
+    path("webhooks/woocommerce/", woocommerce_webhook, name="woocommerce_webhook"),
+
+    # Метрики HTTP-слоя
+    path("metrics/", IntegrationMetricsView.as_view(), name="integration_metrics"),
+]
@@ -1,3 +1,118 @@
-from django.shortcuts import render
+"""
+Views для приёма webhook от внешних сервисов и метрик интеграций
+"""
+import json
+import logging
 
-# Create your views here.
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.http import HttpResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .http import breakers_snapshot, metrics_snapshot
+from .models import WooCommerceProductEvent
+from .woocommerce import verify_webhook_signature
+
+logger = logging.getLogger(__name__)
+
+WOOCOMMERCE_PRODUCT_ACTIONS = {
+    "product.created": WooCommerceProductEvent.ACTION_UPDATE,
+    "product.updated": WooCommerceProductEvent.ACTION_UPDATE,
+    "product.restored": WooCommerceProductEvent.ACTION_UPDATE,
+    "product.deleted": WooCommerceProductEvent.ACTION_DELETE,
+}
+
+
+def enqueue_product_event(wc_id: int, action: str, topic: str = "", payload: dict = None):
+    """
+    Ставит изменение товара в очередь.
+    Если товар уже ждёт обработки, запись перезаписывается последним событием.
+    """
+    values = {
+        "action": action,
+        "topic": topic,
+        "payload": payload,
+        "received_at": timezone.now(),
+        "attempts": 0,
+        "retry_at": None,
+        "last_error": "",
+    }
+    queue = WooCommerceProductEvent.objects.filter(wc_id=wc_id)
+    if queue.update(events_count=F("events_count") + 1, **values):
+        return
+
+    try:
+        with transaction.atomic():
+            WooCommerceProductEvent.objects.create(wc_id=wc_id, **values)
+    except IntegrityError:
+        # Параллельный запрос успел создать запись
+        queue.update(events_count=F("events_count") + 1, **values)
+
+
+@csrf_exempt
+def woocommerce_webhook(request):
+    """
+    Webhook для событий товаров WooCommerce (product.created/updated/deleted)
+
+    Событие только ставится в очередь, изменения применяет
+    команда process_woocommerce_events.
+    Документация: https://woocommerce.github.io/woocommerce-rest-api-docs/#webhooks
+    """
+    if request.method != "POST":
+        return HttpResponse(status=405)
+
+    topic = request.headers.get("X-WC-Webhook-Topic", "")
+    body = request.body
+
+    # При создании webhook WooCommerce отправляет проверочный запрос без подписи
+    if not topic and body.startswith(b"webhook_id="):
+        return HttpResponse(status=200)
+
+    signature = request.headers.get("X-WC-Webhook-Signature", "")
+    if not verify_webhook_signature(body, signature):
+        logger.warning(f"WooCommerce webhook: invalid signature, topic={topic}")
+        return HttpResponse(status=401)
+
+    action = WOOCOMMERCE_PRODUCT_ACTIONS.get(topic)
+    if not action:
+        logger.info(f"WooCommerce webhook: topic {topic} ignored")
+        return HttpResponse(status=200)
+
+    try:
+        data = json.loads(body)
+        wc_id = int(data["id"])
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+        logger.error("WooCommerce webhook: invalid JSON")
+        return HttpResponse(status=400)
+
+    payload = data if "name" in data else None
+
+    # Изменение вариации обрабатываем как изменение родительского товара
+    parent_id = data.get("parent_id")
+    if data.get("type") == "variation" and parent_id:
+        wc_id = int(parent_id)
+        action = WooCommerceProductEvent.ACTION_UPDATE
+        payload = None
+
+    enqueue_product_event(wc_id, action, topic, payload)
+    logger.info(f"WooCommerce webhook: topic={topic}, product={wc_id}")
+
+    return HttpResponse(status=200)
+
+
+class IntegrationMetricsView(APIView):
+    """
+    Метрики HTTP-запросов к внешним сервисам в этом процессе:
+    задержки и ошибки по endpoint'ам, состояние circuit breaker'ов
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            "endpoints": metrics_snapshot(),
+            "breakers": breakers_snapshot(),
+        })
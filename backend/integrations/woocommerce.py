@@ -1,23 +1,123 @@
 """
 WooCommerce REST API клиент для синхронизации товаров.
 
-Использует библиотеку WooCommerce для работы с REST API.
+Запросы идут через общий HTTP-слой (integrations.http), подпись OAuth -
+из библиотеки WooCommerce.
 Документация API: https://woocommerce.github.io/woocommerce-rest-api-docs/
 """
+import base64
+import hashlib
+import hmac
+import json
 import logging
-import time
 from typing import Iterator, Optional
+from urllib.parse import urlencode
 
 from django.conf import settings
-from requests.exceptions import ReadTimeout, ConnectionError as RequestsConnectionError
-from woocommerce import API
+import woocommerce
+from requests.auth import HTTPBasicAuth
+from woocommerce.oauth import OAuth
+
+from .http import ServiceClient, get_client
 
 logger = logging.getLogger(__name__)
 
-# Настройки retry
-DEFAULT_TIMEOUT = 120  # секунд
-MAX_RETRIES = 3
-RETRY_DELAY = 5  # секунд между попытками
+# Настройки HTTP-слоя
+CONNECT_TIMEOUT = 10  # секунд
+DEFAULT_TIMEOUT = 120  # секунд на чтение ответа
+MAX_RETRIES = 2  # повторов после первой попытки
+RETRY_DELAY = 5  # секунд, верхняя граница паузы удваивается с каждой попыткой
+
+# Максимум объектов в одном запросе products/batch и variations/batch
+BATCH_LIMIT = 100
+
+# Минимальный набор полей для быстрой синхронизации остатков и цен (параметр _fields)
+STOCK_PRODUCT_FIELDS = (
+    "id,sku,type,price,regular_price,sale_price,stock_quantity,stock_status,manage_stock"
+)
+STOCK_VARIATION_FIELDS = (
+    "id,sku,price,regular_price,sale_price,stock_quantity,stock_status,manage_stock"
+)
+
+
+class WooCommerceAPI:
+    """
+    Тонкий клиент WooCommerce REST API поверх общего HTTP-слоя.
+
+    Запросы идут через ServiceClient (пул keep-alive соединений, повторы,
+    circuit breaker, метрики). Авторизация - как в библиотеке WooCommerce:
+    по HTTPS ключи магазина передаются в Basic auth, по HTTP запрос
+    подписывается OAuth 1.0a (woocommerce.oauth).
+    """
+
+    def __init__(
+        self,
+        url: str,
+        consumer_key: str,
+        consumer_secret: str,
+        http: ServiceClient,
+        version: str = "wc/v3",
+        timeout=None,
+    ):
+        """timeout: (соединение, чтение) в секундах, по умолчанию CONNECT_TIMEOUT и DEFAULT_TIMEOUT"""
+        self.url = url.rstrip("/")
+        self.consumer_key = consumer_key
+        self.consumer_secret = consumer_secret
+        self.http = http
+        self.version = version
+        self.timeout = timeout or (CONNECT_TIMEOUT, DEFAULT_TIMEOUT)
+
+    def request(self, method: str, endpoint: str, data=None, params: dict = None, retry: bool = None):
+        """
+        retry: повторять ли запрос; по умолчанию только GET и другие
+               идемпотентные методы (см. ServiceClient.request)
+        """
+        url = f"{self.url}/wp-json/{self.version}/{endpoint}"
+        params = dict(params or {})
+        auth = None
+        headers = {
+            "user-agent": f"WooCommerce-Python-REST-API/{woocommerce.__version__}",
+            "accept": "application/json",
+        }
+
+        if url.startswith("https"):
+            auth = HTTPBasicAuth(self.consumer_key, self.consumer_secret)
+        else:
+            url = OAuth(
+                url=f"{url}?{urlencode(params)}" if params else url,
+                consumer_key=self.consumer_key,
+                consumer_secret=self.consumer_secret,
+                version=self.version,
+                method=method,
+            ).get_oauth_url()
+            params = None
+
+        if data is not None:
+            data = json.dumps(data, ensure_ascii=False).encode("utf-8")
+            headers["content-type"] = "application/json;charset=utf-8"
+
+        return self.http.request(
+            method,
+            url,
+            retry=retry,
+            auth=auth,
+            params=params,
+            data=data,
+            timeout=self.timeout,
+            headers=headers,
+        )
+
+    def get(self, endpoint: str, **kwargs):
+        return self.request("GET", endpoint, **kwargs)
+
+    def post(self, endpoint: str, data, **kwargs):
+        return self.request("POST", endpoint, data, **kwargs)
+
+    def put(self, endpoint: str, data, **kwargs):
+        return self.request("PUT", endpoint, data, **kwargs)
+
+    def delete(self, endpoint: str, **kwargs):
+        return self.request("DELETE", endpoint, **kwargs)
 
 
 class WooCommerceClient:
@@ -27,20 +127,34 @@ class WooCommerceClient:
         self,
         url: str = None,
         consumer_key: str = None,
-        consumer_secret: str = None
+        consumer_secret: str = None,
+        api=None,
+        record_to: str = None,
+        timeout: int = None
     ):
+        """
+        api: готовый транспорт вместо WooCommerceAPI
+             (например, ReplayAPI или SyntheticAPI из woocommerce_fixtures)
+        record_to: путь к файлу корпуса для записи всех ответов API
+        timeout: таймаут чтения ответа в секундах (по умолчанию DEFAULT_TIMEOUT)
+        """
         self.url = (url or settings.WOOCOMMERCE_URL or "").strip().rstrip("/")
         self.consumer_key = consumer_key or settings.WOOCOMMERCE_CONSUMER_KEY or ""
         self.consumer_secret = consumer_secret or settings.WOOCOMMERCE_CONSUMER_SECRET or ""
 
-        self._api = None
+        self.record_to = record_to
+        self.timeout = timeout
+
+        self._api = api
 
     def is_configured(self) -> bool:
         """Проверяет, настроены ли API ключи"""
+        if self._api is not None:
+            return True
         return bool(self.url and self.consumer_key and self.consumer_secret)
 
     @property
-    def api(self) -> API:
+    def api(self) -> WooCommerceAPI:
         """Ленивая инициализация API клиента"""
         if self._api is None:
             if not self.is_configured():
@@ -48,18 +162,33 @@ class WooCommerceClient:
                     "WooCommerce API не настроен. Укажите WOOCOMMERCE_URL, "
                     "WOOCOMMERCE_CONSUMER_KEY и WOOCOMMERCE_CONSUMER_SECRET в .env"
                 )
-            self._api = API(
+            self._api = WooCommerceAPI(
                 url=self.url,
                 consumer_key=self.consumer_key,
                 consumer_secret=self.consumer_secret,
-                version="wc/v3",
-                timeout=DEFAULT_TIMEOUT,
+                http=get_client(
+                    "woocommerce",
+                    retries=MAX_RETRIES,
+                    backoff=RETRY_DELAY,
+                    max_backoff=RETRY_DELAY * 2 ** MAX_RETRIES,
+                ),
+                timeout=(CONNECT_TIMEOUT, self.timeout) if self.timeout else None,
             )
+            if self.record_to:
+                from .woocommerce_fixtures import RecordingAPI
+                self._api = RecordingAPI(self._api, self.record_to)
         return self._api
 
+    def close(self):
+        """Завершает запись корпуса, если она включена"""
+        close = getattr(self._api, "close", None)
+        if close:
+            close()
+
     def _request_with_retry(self, endpoint: str, params: dict = None):
         """
-        Выполняет запрос с повторными попытками при таймауте.
+        Выполняет GET-запрос. Повторы при таймаутах, ошибках соединения
+        и ответах 5xx выполняет HTTP-слой (integrations.http).
 
         Args:
             endpoint: API endpoint
@@ -68,24 +197,14 @@ class WooCommerceClient:
         Returns:
             Response объект
         """
-        last_error = None
-        for attempt in range(1, MAX_RETRIES + 1):
-            try:
-                response = self.api.get(endpoint, params=params)
-                return response
-            except (ReadTimeout, RequestsConnectionError) as e:
-                last_error = e
-                if attempt < MAX_RETRIES:
-                    logger.warning(
-                        f"Таймаут при запросе {endpoint} (попытка {attempt}/{MAX_RETRIES}). "
-                        f"Повтор через {RETRY_DELAY} сек..."
-                    )
-                    time.sleep(RETRY_DELAY)
-                else:
-                    logger.error(f"Превышено количество попыток для {endpoint}")
-                    raise
-
-        raise last_error
+        return self.api.get(endpoint, params=params)
+
+    def _post_with_retry(self, endpoint: str, data: dict):
+        """
+        Выполняет POST-запрос с повторами.
+        Используется только для идемпотентных запросов (установка значений).
+        """
+        return self.api.post(endpoint, data, retry=True)
 
     def _paginate(self, endpoint: str, per_page: int = 100, **params) -> Iterator[dict]:
         """
@@ -99,6 +218,16 @@ class WooCommerceClient:
         Yields:
             Записи из API по одной
         """
+        for page_items in self._paginate_pages(endpoint, per_page=per_page, **params):
+            yield from page_items
+
+    def _paginate_pages(self, endpoint: str, per_page: int = 100, **params) -> Iterator[list]:
+        """
+        Генератор для постраничной обработки результатов API.
+
+        Yields:
+            Список записей одной страницы
+        """
         page = 1
         while True:
             params_with_pagination = {
@@ -118,8 +247,7 @@ class WooCommerceClient:
             if not data:
                 break
 
-            for item in data:
-                yield item
+            yield data
 
             # Проверяем, есть ли ещё страницы
             total_pages = int(response.headers.get("X-WP-TotalPages", 1))
@@ -229,6 +357,102 @@ class WooCommerceClient:
             per_page=per_page,
         )
 
+    def get_product_stock_pages(self, per_page: int = 100, status: str = "publish") -> Iterator[list]:
+        """
+        Получает товары постранично только с полями цен и остатков.
+
+        Returns:
+            Генератор списков товаров (по странице)
+        """
+        return self._paginate_pages(
+            "products",
+            per_page=per_page,
+            status=status,
+            _fields=STOCK_PRODUCT_FIELDS,
+        )
+
+    def get_variations_stock(self, product_id: int, per_page: int = 100) -> Iterator[dict]:
+        """
+        Получает вариации товара только с полями цен и остатков.
+
+        Returns:
+            Генератор словарей с данными вариаций
+        """
+        return self._paginate(
+            f"products/{product_id}/variations",
+            per_page=per_page,
+            _fields=STOCK_VARIATION_FIELDS,
+        )
+
+    def get_products_stock(self, product_ids: list[int]) -> list[dict]:
+        """
+        Получает цены и остатки товаров по списку ID (не больше BATCH_LIMIT).
+
+        Returns:
+            Список словарей с данными товаров
+        """
+        response = self._request_with_retry("products", params={
+            "include": ",".join(str(pk) for pk in product_ids),
+            "per_page": BATCH_LIMIT,
+            "_fields": STOCK_PRODUCT_FIELDS,
+        })
+
+        if response.status_code != 200:
+            logger.error(f"Ошибка API: {response.status_code} - {response.text}")
+            raise Exception(f"WooCommerce API error: {response.status_code}")
+
+        return response.json()
+
+    def get_product_ids_by_sku(self, skus: list[str]) -> dict[str, int]:
+        """
+        Находит ID товаров по списку SKU (не больше BATCH_LIMIT).
+
+        Returns:
+            Словарь SKU -> ID товара; не найденные SKU отсутствуют
+        """
+        response = self._request_with_retry("products", params={
+            "sku": ",".join(skus),
+            "per_page": BATCH_LIMIT,
+            "_fields": "id,sku",
+        })
+
+        if response.status_code != 200:
+            logger.error(f"Ошибка API: {response.status_code} - {response.text}")
+            raise Exception(f"WooCommerce API error: {response.status_code}")
+
+        return {p["sku"]: p["id"] for p in response.json() if p.get("sku")}
+
+    def _batch_update(self, endpoint: str, updates: list[dict]) -> list[dict]:
+        if len(updates) > BATCH_LIMIT:
+            raise ValueError(f"Не больше {BATCH_LIMIT} объектов в одном запросе")
+
+        response = self._post_with_retry(endpoint, {"update": updates})
+
+        if response.status_code != 200:
+            logger.error(f"Ошибка API: {response.status_code} - {response.text}")
+            raise Exception(f"WooCommerce API error: {response.status_code}")
+
+        return response.json().get("update", [])
+
+    def batch_update_products(self, updates: list[dict]) -> list[dict]:
+        """
+        Обновляет до BATCH_LIMIT товаров одним запросом (products/batch).
+
+        Returns:
+            Список обновлённых товаров; для неудачных - словари с ключом error
+        """
+        return self._batch_update("products/batch", updates)
+
+    def batch_update_variations(self, product_id: int, updates: list[dict]) -> list[dict]:
+        """
+        Обновляет до BATCH_LIMIT вариаций товара одним запросом
+        (products/{id}/variations/batch).
+
+        Returns:
+            Список обновлённых вариаций; для неудачных - словари с ключом error
+        """
+        return self._batch_update(f"products/{product_id}/variations/batch", updates)
+
     def get_tags(self, per_page: int = 100) -> Iterator[dict]:
         """
         Получает все теги товаров (используются для брендов).
@@ -251,3 +475,28 @@ class WooCommerceClient:
         except Exception as e:
             logger.error(f"Ошибка соединения с WooCommerce: {e}")
             return False
+
+
+def sign_webhook_payload(body: bytes, secret: str) -> str:
+    """Подпись webhook WooCommerce: base64(HMAC-SHA256(тело, секрет))"""
+    digest = hmac.new(secret.encode(), body, hashlib.sha256).digest()
+    return base64.b64encode(digest).decode()
+
+
+def verify_webhook_signature(body: bytes, signature: str, secret: str = None) -> bool:
+    """
+    Проверка подписи webhook из заголовка X-WC-Webhook-Signature.
+
+    Args:
+        body: Тело запроса
+        signature: Подпись из заголовка
+        secret: Секрет webhook (по умолчанию WOOCOMMERCE_WEBHOOK_SECRET)
+
+    Returns:
+        bool: True если подпись валидна
+    """
+    secret = secret or settings.WOOCOMMERCE_WEBHOOK_SECRET
+    if not secret or not signature:
+        return False
+
+    return hmac.compare_digest(sign_webhook_payload(body, secret), signature)
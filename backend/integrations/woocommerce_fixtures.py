@@ -0,0 +1,288 @@
+"""
+Запись и воспроизведение ответов WooCommerce REST API.
+
+Позволяет измерять и настраивать синхронизацию каталога без запросов
+к рабочему магазину:
+
+    RecordingAPI   - обёртка над woocommerce.API, записывает ответы
+                     (тело и заголовки пагинации) в сжатый корпус
+    ReplayAPI      - отдаёт ответы из записанного корпуса
+    SyntheticAPI   - генерирует каталог заданного размера на лету
+
+Все три подставляются в WooCommerceClient через параметр api.
+ReplayAPI и SyntheticAPI умеют добавлять задержку к каждому запросу
+и считают суммарное время ожидания HTTP (wait_time).
+
+Корпус - JSON Lines в gzip, одна строка на запрос:
+    {"endpoint": ..., "params": {...}, "status": 200, "headers": {...}, "body": "..."}
+"""
+import gzip
+import json
+import math
+import threading
+import time
+from typing import Optional
+from urllib.parse import urlencode
+
+from requests.structures import CaseInsensitiveDict
+
+# Заголовки, которые нужны клиенту для пагинации
+RECORDED_HEADERS = ("X-WP-Total", "X-WP-TotalPages", "Content-Type")
+
+
+def request_key(endpoint: str, params: Optional[dict] = None) -> str:
+    """Ключ запроса: endpoint и отсортированные параметры"""
+    params = {k: v for k, v in (params or {}).items() if v is not None}
+    query = urlencode(sorted((k, str(v)) for k, v in params.items()))
+    return f"{endpoint.strip('/')}?{query}"
+
+
+class FixtureResponse:
+    """Минимальная замена requests.Response для клиента WooCommerce"""
+
+    def __init__(self, status_code: int, body: str, headers: Optional[dict] = None):
+        self.status_code = status_code
+        self.text = body
+        self.headers = CaseInsensitiveDict(headers or {})
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class RecordingAPI:
+    """Проксирует запросы в woocommerce.API и записывает ответы в корпус"""
+
+    def __init__(self, api, path: str):
+        self.api = api
+        self.path = path
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._lock = threading.Lock()
+        self.recorded = 0
+
+    def get(self, endpoint: str, **kwargs):
+        response = self.api.get(endpoint, **kwargs)
+        record = {
+            "endpoint": endpoint,
+            "params": kwargs.get("params") or {},
+            "status": response.status_code,
+            "headers": {
+                name: response.headers[name]
+                for name in RECORDED_HEADERS
+                if name in response.headers
+            },
+            "body": response.text,
+        }
+        with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.recorded += 1
+        return response
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+class _TimedAPI:
+    """Задержка на каждый запрос и учёт времени ожидания"""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.wait_time = 0.0
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def get(self, endpoint: str, **kwargs) -> FixtureResponse:
+        started = time.perf_counter()
+        if self.latency:
+            time.sleep(self.latency)
+        response = self._respond(endpoint.strip("/"), kwargs.get("params") or {})
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.wait_time += elapsed
+            self.requests += 1
+        return response
+
+    def _respond(self, endpoint: str, params: dict) -> FixtureResponse:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class ReplayAPI(_TimedAPI):
+    """Отдаёт ответы из корпуса, записанного RecordingAPI"""
+
+    def __init__(self, path: str, latency: float = 0.0):
+        super().__init__(latency)
+        self.responses = {}
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                key = request_key(record["endpoint"], record["params"])
+                self.responses[key] = FixtureResponse(
+                    record["status"], record["body"], record["headers"]
+                )
+
+    def _respond(self, endpoint: str, params: dict) -> FixtureResponse:
+        response = self.responses.get(request_key(endpoint, params))
+        if response is None:
+            return FixtureResponse(404, json.dumps({"code": "not_recorded"}))
+        return response
+
+
+class SyntheticAPI(_TimedAPI):
+    """
+    Генерирует каталог контактных линз заданного размера.
+    Половина товаров - вариативные (SPH x BC), остальные простые.
+    Данные детерминированы: повторный запуск видит тот же каталог.
+    """
+
+    CATEGORIES = ("Контактные линзы", "Очки", "Оправы", "Растворы", "Аксессуары")
+    BRANDS = ("Acuvue", "Air Optix", "Biofinity", "Dailies", "Proclear")
+    SPH_VALUES = tuple(f"{v / 4:+.2f}" for v in range(-40, 0))
+    BC_VALUES = ("8.4", "8.6", "8.8")
+
+    def __init__(self, products: int = 1000, variations: int = 20, latency: float = 0.0):
+        super().__init__(latency)
+        self.products_count = products
+        self.variations_count = min(variations, len(self.SPH_VALUES) * len(self.BC_VALUES))
+
+    def _respond(self, endpoint: str, params: dict) -> FixtureResponse:
+        parts = endpoint.split("/")
+
+        if endpoint == "products/categories":
+            return self._page(self._categories(), params)
+        if endpoint == "products/attributes":
+            return FixtureResponse(200, json.dumps(self._attributes()))
+        if len(parts) == 4 and parts[:2] == ["products", "attributes"] and parts[3] == "terms":
+            return self._page(self._terms(int(parts[2])), params)
+        if endpoint == "products":
+            return self._products_page(params)
+        if len(parts) == 2 and parts[0] == "products" and parts[1].isdigit():
+            wc_id = int(parts[1])
+            if not 1 <= wc_id <= self.products_count:
+                return FixtureResponse(404, json.dumps({"code": "not_found"}))
+            return FixtureResponse(200, json.dumps(self._product(wc_id), ensure_ascii=False))
+        if len(parts) == 3 and parts[0] == "products" and parts[2] == "variations":
+            return self._page(self._variations(int(parts[1])), params)
+
+        return FixtureResponse(404, json.dumps({"code": "not_found"}))
+
+    def _page(self, items: list, params: dict) -> FixtureResponse:
+        page = int(params.get("page", 1))
+        per_page = int(params.get("per_page", 10))
+        chunk = items[(page - 1) * per_page:page * per_page]
+        return FixtureResponse(
+            200,
+            json.dumps(chunk, ensure_ascii=False),
+            {
+                "X-WP-Total": str(len(items)),
+                "X-WP-TotalPages": str(max(1, math.ceil(len(items) / per_page))),
+            },
+        )
+
+    def _products_page(self, params: dict) -> FixtureResponse:
+        page = int(params.get("page", 1))
+        per_page = int(params.get("per_page", 10))
+        first = (page - 1) * per_page + 1
+        last = min(self.products_count, first + per_page - 1)
+        items = [self._product(wc_id) for wc_id in range(first, last + 1)]
+        return FixtureResponse(
+            200,
+            json.dumps(items, ensure_ascii=False),
+            {
+                "X-WP-Total": str(self.products_count),
+                "X-WP-TotalPages": str(max(1, math.ceil(self.products_count / per_page))),
+            },
+        )
+
+    def _categories(self) -> list:
+        return [
+            {"id": i, "name": name, "slug": f"category-{i}", "parent": 0}
+            for i, name in enumerate(self.CATEGORIES, start=1)
+        ]
+
+    def _attributes(self) -> list:
+        return [
+            {"id": 1, "name": "Оптическая сила (SPH)", "slug": "pa_sph"},
+            {"id": 2, "name": "Радиус кривизны (BC)", "slug": "pa_bc"},
+        ]
+
+    def _terms(self, attribute_id: int) -> list:
+        values = {1: self.SPH_VALUES, 2: self.BC_VALUES}.get(attribute_id, ())
+        return [
+            {"id": attribute_id * 1000 + i, "name": value, "slug": f"{attribute_id}-{i}"}
+            for i, value in enumerate(values)
+        ]
+
+    def _is_variable(self, wc_id: int) -> bool:
+        return self.variations_count > 0 and wc_id % 2 == 0
+
+    def _product(self, wc_id: int) -> dict:
+        category_id = wc_id % len(self.CATEGORIES) + 1
+        regular = 1000 + wc_id % 50 * 100
+        sale = regular - 100 if wc_id % 7 == 0 else None
+        product = {
+            "id": wc_id,
+            "name": f"Товар {wc_id}",
+            "slug": f"synthetic-{wc_id}",
+            "sku": f"SYN-{wc_id}",
+            "type": "variable" if self._is_variable(wc_id) else "simple",
+            "status": "publish",
+            "description": f"<p>Описание товара {wc_id}</p>",
+            "short_description": "",
+            "price": str(sale or regular),
+            "regular_price": str(regular),
+            "sale_price": str(sale) if sale else "",
+            "stock_quantity": wc_id % 20,
+            "date_modified_gmt": "2025-01-01T00:00:00",
+            "categories": [{
+                "id": category_id,
+                "name": self.CATEGORIES[category_id - 1],
+                "slug": f"category-{category_id}",
+            }],
+            "tags": [{"id": 100 + wc_id % len(self.BRANDS), "name": self.BRANDS[wc_id % len(self.BRANDS)]}],
+            "images": [],
+            "attributes": [],
+        }
+        if self._is_variable(wc_id):
+            sph, bc = self._variation_options()
+            product["attributes"] = [
+                {"id": 1, "name": "Оптическая сила (SPH)", "slug": "pa_sph",
+                 "options": sph, "variation": True},
+                {"id": 2, "name": "Радиус кривизны (BC)", "slug": "pa_bc",
+                 "options": bc, "variation": True},
+            ]
+            product["variations"] = [wc_id * 1000 + i for i in range(len(self._combinations()))]
+        return product
+
+    def _variation_options(self):
+        combos = self._combinations()
+        sph = sorted({s for s, _ in combos}, key=self.SPH_VALUES.index)
+        bc = sorted({b for _, b in combos}, key=self.BC_VALUES.index)
+        return sph, bc
+
+    def _combinations(self) -> list:
+        combos = [(s, b) for s in self.SPH_VALUES for b in self.BC_VALUES]
+        return combos[:self.variations_count]
+
+    def _variations(self, wc_id: int) -> list:
+        if not self._is_variable(wc_id):
+            return []
+        product = self._product(wc_id)
+        return [
+            {
+                "id": wc_id * 1000 + i,
+                "sku": f"SYN-{wc_id}-{i}",
+                "price": product["price"],
+                "regular_price": product["regular_price"],
+                "sale_price": product["sale_price"],
+                "stock_quantity": (wc_id + i) % 10,
+                "attributes": [
+                    {"id": 1, "name": "Оптическая сила (SPH)", "option": sph},
+                    {"id": 2, "name": "Радиус кривизны (BC)", "option": bc},
+                ],
+            }
+            for i, (sph, bc) in enumerate(self._combinations())
+        ]
@@ -0,0 +1,35 @@
+"""
+Журнал изменений остатков для передачи в WooCommerce.
+
+Остатки списываются при оформлении заказа и возвращаются при отмене
+только в нашей БД. Чтобы следующая синхронизация не затёрла их,
+изменения записываются в WooCommerceStockDelta и отправляются
+командой push_woocommerce_stock.
+"""
+from typing import Iterable
+
+from .models import WooCommerceStockDelta
+
+
+def journal_stock_changes(changes: Iterable[tuple], reason: str = ""):
+    """
+    Записывает изменения остатков одним запросом.
+
+    Args:
+        changes: кортежи (product, variant или None, изменение остатка)
+        reason: основание, например "order:15"
+    """
+    deltas = [
+        WooCommerceStockDelta(
+            product_id=product.pk,
+            variant_id=variant.pk if variant else None,
+            sku=(variant.sku if variant else product.sku) or "",
+            delta=delta,
+            reason=reason,
+        )
+        for product, variant, delta in changes
+        if delta
+    ]
+    if deltas:
+        WooCommerceStockDelta.objects.bulk_create(deltas)
+
@@ -7,14 +7,28 @@ import hashlib
 import hmac
 import json
 import logging
+from datetime import datetime
 from decimal import Decimal
 from django.conf import settings
-import requests
+from django.core.cache import cache
+from requests.exceptions import Timeout
+
+from .http import get_client
 
 logger = logging.getLogger(__name__)
 
 YOOKASSA_API_URL = "https://api.yookassa.ru/v3"
 
+# (connect, read) в секундах
+REQUEST_TIMEOUT = (5, 20)
+MAX_RETRIES = 2
+
+# Кэш статуса платежа для опроса со страницы возврата
+PAYMENT_CACHE_TTL = 5
+PAYMENT_ERROR_CACHE_TTL = 2
+# Сколько держится блокировка запроса, который уже выполняет другой процесс
+PAYMENT_LOCK_TTL = 25
+
 
 class YooKassaClient:
     """Клиент для работы с API YooKassa"""
@@ -23,6 +37,12 @@ class YooKassaClient:
         self.shop_id = getattr(settings, "YOOKASSA_SHOP_ID", "")
         self.secret_key = getattr(settings, "YOOKASSA_SECRET_KEY", "")
         self.return_url = getattr(settings, "YOOKASSA_RETURN_URL", "")
+        self.api_url = getattr(settings, "YOOKASSA_API_URL", "") or YOOKASSA_API_URL
+        # Общий HTTP-слой: пул keep-alive соединений, повторы, circuit breaker, метрики
+        self.http = get_client("yookassa", timeout=REQUEST_TIMEOUT, retries=MAX_RETRIES)
+
+    def close(self):
+        self.http.close()
 
     def _get_auth(self):
         return (self.shop_id, self.secret_key)
@@ -100,12 +120,14 @@ class YooKassaClient:
         }
 
         try:
-            response = requests.post(
-                f"{YOOKASSA_API_URL}/payments",
+            # Повтор безопасен: запрос защищён ключом идемпотентности
+            response = self.http.post(
+                f"{self.api_url}/payments",
+                retry=True,
                 json=payload,
                 auth=self._get_auth(),
                 headers=self._get_headers(idempotence_key),
-                timeout=30
+                timeout=REQUEST_TIMEOUT
             )
 
             data = response.json()
@@ -122,7 +144,7 @@ class YooKassaClient:
                 logger.error(f"YooKassa error: {data}")
                 return {"error": data.get("description", "Payment creation failed")}
 
-        except requests.exceptions.Timeout:
+        except Timeout:
             logger.error("YooKassa timeout")
             return {"error": "Payment service timeout"}
         except Exception as e:
@@ -143,11 +165,11 @@ class YooKassaClient:
             return {"error": "Payment system not configured"}
 
         try:
-            response = requests.get(
-                f"{YOOKASSA_API_URL}/payments/{payment_id}",
+            response = self.http.get(
+                f"{self.api_url}/payments/{payment_id}",
                 auth=self._get_auth(),
                 headers=self._get_headers(),
-                timeout=30
+                timeout=REQUEST_TIMEOUT
             )
 
             data = response.json()
@@ -169,6 +191,123 @@ class YooKassaClient:
             logger.error(f"YooKassa get_payment exception: {e}")
             return {"error": str(e)}
 
+    def list_payments(
+        self,
+        created_gte: datetime,
+        created_lt: datetime,
+        cursor: str = None,
+        limit: int = 100,
+    ) -> dict:
+        """
+        Страница списка платежей, созданных в окне [created_gte, created_lt)
+
+        Args:
+            created_gte: Начало окна
+            created_lt: Конец окна
+            cursor: Курсор следующей страницы из предыдущего ответа
+            limit: Размер страницы (не больше 100)
+
+        Returns:
+            dict: {"items": [...], "next_cursor": str | None}
+        """
+        if not self.shop_id or not self.secret_key:
+            return {"error": "Payment system not configured"}
+
+        params = {
+            "created_at.gte": created_gte.isoformat(),
+            "created_at.lt": created_lt.isoformat(),
+            "limit": min(limit, 100),
+        }
+        if cursor:
+            params["cursor"] = cursor
+
+        try:
+            response = self.http.get(
+                f"{self.api_url}/payments",
+                params=params,
+                auth=self._get_auth(),
+                headers=self._get_headers(),
+                timeout=REQUEST_TIMEOUT
+            )
+
+            data = response.json()
+
+            if response.status_code == 200:
+                return {
+                    "items": data.get("items", []),
+                    "next_cursor": data.get("next_cursor"),
+                }
+            else:
+                return {"error": data.get("description", "Failed to list payments")}
+
+        except Exception as e:
+            logger.error(f"YooKassa list_payments exception: {e}")
+            return {"error": str(e)}
+
+    def get_refund(self, refund_id: str) -> dict:
+        """
+        Получение информации о возврате
+
+        Args:
+            refund_id: ID возврата в YooKassa
+
+        Returns:
+            dict: Информация о возврате
+        """
+        if not self.shop_id or not self.secret_key:
+            return {"error": "Payment system not configured"}
+
+        try:
+            response = self.http.get(
+                f"{self.api_url}/refunds/{refund_id}",
+                auth=self._get_auth(),
+                headers=self._get_headers(),
+                timeout=REQUEST_TIMEOUT
+            )
+
+            data = response.json()
+
+            if response.status_code == 200:
+                return {
+                    "refund_id": data.get("id"),
+                    "payment_id": data.get("payment_id"),
+                    "status": data.get("status"),
+                    "amount": data.get("amount", {}).get("value"),
+                }
+            else:
+                return {"error": data.get("description", "Failed to get refund")}
+
+        except Exception as e:
+            logger.error(f"YooKassa get_refund exception: {e}")
+            return {"error": str(e)}
+
+    def get_payment_cached(self, payment_id: str) -> dict | None:
+        """
+        Информация о платеже с коротким кэшем и объединением одновременных запросов.
+
+        YooKassa запрашивает только процесс, взявший блокировку в кэше.
+        Остальные не ждут его ответа: если результата в кэше ещё нет,
+        возвращается None, и вызывающий код отдаёт сохранённое в заказе
+        состояние - страница возврата всё равно опросит статус снова.
+        Блокировка общая для всех процессов, только если кэш общий (CACHES).
+        """
+        key = f"yookassa:payment:{payment_id}"
+        result = cache.get(key)
+        if result is not None:
+            return result
+
+        lock_key = f"{key}:lock"
+        if not cache.add(lock_key, 1, PAYMENT_LOCK_TTL):
+            return None
+
+        try:
+            result = self.get_payment(payment_id)
+            ttl = PAYMENT_ERROR_CACHE_TTL if "error" in result else PAYMENT_CACHE_TTL
+            cache.set(key, result, ttl)
+            return result
+        finally:
+            cache.delete(lock_key)
+
     def verify_webhook_signature(self, body: bytes, signature: str) -> bool:
         """
         Проверка подписи webhook от YooKassa
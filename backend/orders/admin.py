@@ -1,8 +1,9 @@
 from unfold.admin import ModelAdmin, TabularInline
 from django.contrib import admin
 from django.contrib import messages
-from .models import Order, OrderItem, Coupon
-from .emails import send_order_shipped, send_order_paid
+from .models import Order, OrderItem, Coupon, StockReservation
+from .emails import send_order_shipped
+from .transitions import transition_orders
 
 
 class OrderItemInline(TabularInline):
@@ -16,10 +17,10 @@ class OrderAdmin(ModelAdmin):
     list_display = ("id", "user", "email", "phone", "status", "grand_total", "payment_method", "created_at")
     list_filter = ("status", "payment_method", "shipping_method", "created_at")
     search_fields = ("email", "phone", "user__email", "shipping_name")
-    readonly_fields = ("total", "discount_total", "grand_total", "created_at", "updated_at")
+    readonly_fields = ("total", "discount_total", "grand_total", "shipped_at", "delivered_at", "created_at", "updated_at")
     inlines = [OrderItemInline]
     ordering = ("-created_at",)
-    actions = ["mark_as_shipped", "mark_as_paid", "send_shipping_email"]
+    actions = ["mark_as_shipped", "mark_as_paid", "mark_as_delivered", "send_shipping_email"]
 
     fieldsets = (
         ("Основная информация", {
@@ -39,32 +40,36 @@ class OrderAdmin(ModelAdmin):
             "classes": ("collapse",)
         }),
         ("Даты", {
-            "fields": ("created_at", "updated_at"),
+            "fields": ("created_at", "updated_at", "shipped_at", "delivered_at"),
             "classes": ("collapse",)
         }),
     )
 
+    def _transition(self, request, queryset, target, label):
+        """Массовый переход статуса; письма уходят в очередь и отправляются в фоне"""
+        result = transition_orders(queryset, target)
+        message = f"{label}: {result.updated}"
+        if result.notified:
+            message += f", уведомлений в очереди: {result.notified}"
+        self.message_user(request, message, messages.SUCCESS)
+        if result.skipped:
+            self.message_user(
+                request,
+                f"Пропущено заказов в неподходящем статусе: {result.skipped}",
+                messages.WARNING,
+            )
+
     @admin.action(description="Отметить как отправленные")
     def mark_as_shipped(self, request, queryset):
-        updated = 0
-        for order in queryset.filter(status__in=[Order.STATUS_PAID, Order.STATUS_PROCESSING]):
-            order.status = Order.STATUS_SHIPPED
-            order.save(update_fields=["status", "updated_at"])
-            send_order_shipped(order)
-            updated += 1
-        self.message_user(request, f"Отправлено заказов: {updated}", messages.SUCCESS)
+        self._transition(request, queryset, Order.STATUS_SHIPPED, "Отправлено заказов")
 
     @admin.action(description="Отметить как оплаченные")
     def mark_as_paid(self, request, queryset):
-        from django.utils import timezone
-        updated = 0
-        for order in queryset.filter(status__in=[Order.STATUS_PLACED, Order.STATUS_CONFIRMED]):
-            order.status = Order.STATUS_PAID
-            order.paid_at = timezone.now()
-            order.save(update_fields=["status", "paid_at", "updated_at"])
-            send_order_paid(order)
-            updated += 1
-        self.message_user(request, f"Оплачено заказов: {updated}", messages.SUCCESS)
+        self._transition(request, queryset, Order.STATUS_PAID, "Оплачено заказов")
+
+    @admin.action(description="Отметить как доставленные")
+    def mark_as_delivered(self, request, queryset):
+        self._transition(request, queryset, Order.STATUS_DELIVERED, "Доставлено заказов")
 
     @admin.action(description="Отправить email об отправке")
     def send_shipping_email(self, request, queryset):
@@ -87,3 +92,12 @@ class CouponAdmin(ModelAdmin):
     list_display = ("code", "discount_type", "amount", "is_active", "starts_at", "ends_at", "min_total")
     list_filter = ("is_active", "discount_type")
     search_fields = ("code",)
+
+
+@admin.register(StockReservation)
+class StockReservationAdmin(ModelAdmin):
+    list_display = ("key", "variant", "qty", "user", "expires_at", "created_at")
+    search_fields = ("key", "variant__sku", "user__email")
+    list_select_related = ("variant", "user")
+    raw_id_fields = ("variant", "user")
+    ordering = ("-created_at",)
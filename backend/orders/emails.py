@@ -3,6 +3,8 @@ from django.conf import settings
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 
+from outbox.emails import enqueue_email, enqueue_emails
+
 logger = logging.getLogger("emails")
 
 
@@ -45,7 +47,8 @@ def _urls_for_order(order):
     return order_url, support_url
 
 
-def _send_multipart(*, subject: str, to_email: str, text_template: str, html_template: str, context: dict):
+def _build_multipart(*, subject: str, to_email: str, text_template: str, html_template: str, context: dict):
+    """Рендерит письмо с текстовой и HTML-версией"""
     text_body = render_to_string(text_template, context).strip()
     html_body = render_to_string(html_template, context).strip()
 
@@ -57,7 +60,42 @@ def _send_multipart(*, subject: str, to_email: str, text_template: str, html_tem
         reply_to=[getattr(settings, "SUPPORT_EMAIL", "info@opticplace.ru")],
     )
     msg.attach_alternative(html_body, "text/html")
-    msg.send(fail_silently=False)
+    return msg
+
+
+def _send_multipart(*, kind: str, **kwargs):
+    """
+    Рендерит письмо и ставит его в очередь (отправляет команда run_outbox).
+
+    Вызывается внутри транзакций оформления и смены статуса заказа:
+    запись в очередь идёт в savepoint (enqueue_email), поэтому ошибка,
+    перехваченная в send_order_*, откатывает только письмо, а не заказ.
+    """
+    enqueue_email(_build_multipart(**kwargs), kind=kind)
+
+
+def _send_many(orders, kind: str, build, description: str) -> int:
+    """
+    Рендерит письма по заказам и ставит их в очередь одним INSERT
+    (enqueue_emails, в savepoint). Заказы, письмо для которых не удалось
+    собрать, пропускаются. Возвращает количество писем в очереди.
+    """
+    messages = []
+    for order in orders:
+        try:
+            messages.append(build(order))
+        except Exception as e:
+            logger.error("Failed to build %s email for order #%s: %s", description, order.id, e)
+    if not messages:
+        return 0
+
+    try:
+        enqueue_emails(messages, kind=kind)
+    except Exception as e:
+        logger.error("Failed to queue %s %s emails: %s", len(messages), description, e)
+        return 0
+    logger.info("%s %s emails queued", len(messages), description)
+    return len(messages)
 
 
 def send_order_confirmation(order):
@@ -83,6 +121,7 @@ def send_order_confirmation(order):
         }
 
         _send_multipart(
+            kind="order_confirmation",
             subject=subject,
             to_email=order.email,
             text_template="emails/order_confirmation.txt",
@@ -90,74 +129,90 @@ def send_order_confirmation(order):
             context=ctx,
         )
 
-        logger.info("Order confirmation email sent for order #%s to %s", order.id, order.email)
+        logger.info("Order confirmation email queued for order #%s to %s", order.id, order.email)
         return True
     except Exception as e:
-        logger.error("Failed to send order confirmation email for order #%s: %s", order.id, e)
+        logger.error("Failed to queue order confirmation email for order #%s: %s", order.id, e)
         return False
 
 
-def send_order_paid(order):
-    try:
-        subject = f"Оплата заказа #{order.id} получена — OpticPlace"
-        order_url, support_url = _urls_for_order(order)
+def _build_order_paid(order):
+    subject = f"Оплата заказа #{order.id} получена — OpticPlace"
+    order_url, support_url = _urls_for_order(order)
 
-        ctx = {
-            "site_name": "OpticPlace",
-            "order": order,
-            "order_url": order_url,
-            "support_email": getattr(settings, "SUPPORT_EMAIL", "info@opticplace.ru"),
-            "support_phone": getattr(settings, "SUPPORT_PHONE", "+7 (495) 123-45-67"),
-            "support_phone_tel": getattr(settings, "SUPPORT_PHONE_TEL", "+74951234567"),
-            "support_url": support_url,
-        }
+    ctx = {
+        "site_name": "OpticPlace",
+        "order": order,
+        "order_url": order_url,
+        "support_email": getattr(settings, "SUPPORT_EMAIL", "info@opticplace.ru"),
+        "support_phone": getattr(settings, "SUPPORT_PHONE", "+7 (495) 123-45-67"),
+        "support_phone_tel": getattr(settings, "SUPPORT_PHONE_TEL", "+74951234567"),
+        "support_url": support_url,
+    }
 
-        _send_multipart(
-            subject=subject,
-            to_email=order.email,
-            text_template="emails/order_paid.txt",
-            html_template="emails/order_paid.html",
-            context=ctx,
-        )
+    return _build_multipart(
+        subject=subject,
+        to_email=order.email,
+        text_template="emails/order_paid.txt",
+        html_template="emails/order_paid.html",
+        context=ctx,
+    )
 
-        logger.info("Payment confirmation email sent for order #%s to %s", order.id, order.email)
+
+def send_order_paid(order):
+    try:
+        enqueue_email(_build_order_paid(order), kind="order_paid")
+        logger.info("Payment confirmation email queued for order #%s to %s", order.id, order.email)
         return True
     except Exception as e:
-        logger.error("Failed to send payment confirmation email for order #%s: %s", order.id, e)
+        logger.error("Failed to queue payment confirmation email for order #%s: %s", order.id, e)
         return False
 
 
-def send_order_shipped(order):
-    try:
-        subject = f"Заказ #{order.id} отправлен — OpticPlace"
-        order_url, support_url = _urls_for_order(order)
+def _build_order_shipped(order):
+    subject = f"Заказ #{order.id} отправлен — OpticPlace"
+    order_url, support_url = _urls_for_order(order)
 
-        ctx = {
-            "site_name": "OpticPlace",
-            "order": order,
-            "order_url": order_url,
-            "support_email": getattr(settings, "SUPPORT_EMAIL", "info@opticplace.ru"),
-            "support_phone": getattr(settings, "SUPPORT_PHONE", "+7 (495) 123-45-67"),
-            "support_phone_tel": getattr(settings, "SUPPORT_PHONE_TEL", "+74951234567"),
-            "support_url": support_url,
-            "shipping_method_name": _human_shipping_method(order.shipping_method),
-        }
+    ctx = {
+        "site_name": "OpticPlace",
+        "order": order,
+        "order_url": order_url,
+        "support_email": getattr(settings, "SUPPORT_EMAIL", "info@opticplace.ru"),
+        "support_phone": getattr(settings, "SUPPORT_PHONE", "+7 (495) 123-45-67"),
+        "support_phone_tel": getattr(settings, "SUPPORT_PHONE_TEL", "+74951234567"),
+        "support_url": support_url,
+        "shipping_method_name": _human_shipping_method(order.shipping_method),
+    }
+
+    return _build_multipart(
+        subject=subject,
+        to_email=order.email,
+        text_template="emails/order_shipped.txt",
+        html_template="emails/order_shipped.html",
+        context=ctx,
+    )
 
-        _send_multipart(
-            subject=subject,
-            to_email=order.email,
-            text_template="emails/order_shipped.txt",
-            html_template="emails/order_shipped.html",
-            context=ctx,
-        )
 
-        logger.info("Shipping notification email sent for order #%s to %s", order.id, order.email)
+def send_order_shipped(order):
+    try:
+        enqueue_email(_build_order_shipped(order), kind="order_shipped")
+        logger.info("Shipping notification email queued for order #%s to %s", order.id, order.email)
         return True
     except Exception as e:
-        logger.error("Failed to send shipping notification email for order #%s: %s", order.id, e)
+        logger.error("Failed to queue shipping notification email for order #%s: %s", order.id, e)
         return False
 
 
+def send_orders_paid(orders) -> int:
+    """Письма об оплате по набору заказов одним INSERT. Возвращает их количество"""
+    return _send_many(orders, "order_paid", _build_order_paid, "payment confirmation")
+
+
+def send_orders_shipped(orders) -> int:
+    """Письма об отправке по набору заказов одним INSERT. Возвращает их количество"""
+    return _send_many(orders, "order_shipped", _build_order_shipped, "shipping notification")
+
+
 def send_order_cancelled(order):
     try:
         subject = f"Заказ #{order.id} отменён — OpticPlace"
@@ -174,6 +229,7 @@ def send_order_cancelled(order):
         }
 
         _send_multipart(
+            kind="order_cancelled",
             subject=subject,
             to_email=order.email,
             text_template="emails/order_cancelled.txt",
@@ -181,8 +237,8 @@ def send_order_cancelled(order):
             context=ctx,
         )
 
-        logger.info("Cancellation email sent for order #%s to %s", order.id, order.email)
+        logger.info("Cancellation email queued for order #%s to %s", order.id, order.email)
         return True
     except Exception as e:
-        logger.error("Failed to send cancellation email for order #%s: %s", order.id, e)
+        logger.error("Failed to queue cancellation email for order #%s: %s", order.id, e)
         return False
@@ -0,0 +1,63 @@
+"""
+Команда для применения уведомлений YooKassa к заказам.
+
+Webhook (orders.payment_views.yookassa_webhook) только записывает
+уведомление в журнал YooKassaEvent. Команда разбирает журнал пачками:
+переводит заказы в оплаченные/возвращённые, возвращает остатки
+и ставит письма в очередь.
+
+Использование:
+    python manage.py process_yookassa_events
+    python manage.py process_yookassa_events --loop --interval 2
+
+Опции:
+    --loop              Работать постоянно, проверяя журнал
+    --interval N        Пауза между проверками журнала в секундах
+    --batch-size N      Количество уведомлений за один проход
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from orders.payment_events import process_events
+
+
+class Command(BaseCommand):
+    help = 'Применение уведомлений YooKassa к заказам'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Работать постоянно, проверяя журнал',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2,
+            help='Пауза между проверками журнала в секундах (по умолчанию 2)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Количество уведомлений за один проход (по умолчанию 100)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+
+        while True:
+            stats = process_events(batch_size)
+            if stats.events:
+                self.stdout.write(
+                    f'Уведомлений: {stats.events}, оплачено: {stats.paid}, '
+                    f'отменено платежей: {stats.canceled}, возвратов: {stats.refunded}, '
+                    f'ошибок: {stats.failed}'
+                )
+                # Если все уведомления пачки упали, ждём повтора по retry_at
+                if stats.failed < stats.events:
+                    continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
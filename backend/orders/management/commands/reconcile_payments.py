@@ -0,0 +1,163 @@
+"""
+Сверка статусов платежей с YooKassa.
+
+Находит заказы, уведомление об оплате которых потерялось: листает список
+платежей YooKassa за окно по created_at (страницами до 100 платежей
+через одну keep-alive сессию), сопоставляет платежи с заказами
+по metadata.order_id в памяти и применяет изменения пачкой - тем же
+кодом, что и обработчик уведомлений (по одному UPDATE на вид изменения).
+
+Проверка без настоящей YooKassa: запустить manage.py fake_yookassa
+и указать YOOKASSA_API_URL=http://127.0.0.1:8765/v3.
+
+Использование:
+    python manage.py reconcile_payments
+    python manage.py reconcile_payments --hours 72 --dry-run
+    python manage.py reconcile_payments --from 2026-01-01 --to 2026-01-08
+
+Опции:
+    --hours N       Окно сверки: последние N часов (по умолчанию 48)
+    --from DATE     Начало окна (ISO 8601), вместо --hours
+    --to DATE       Конец окна (ISO 8601), по умолчанию сейчас
+    --dry-run       Показать изменения без записи в БД
+"""
+import time
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from integrations.models import YooKassaEvent
+from integrations.yookassa import yookassa_client
+from orders.models import Order
+from orders.payment_events import (
+    EVENT_PAYMENT_CANCELED, EVENT_PAYMENT_SUCCEEDED, BatchStats, apply_payment_events,
+)
+
+# Статус платежа -> событие, которое пришло бы webhook'ом
+PAYMENT_EVENTS = {
+    "succeeded": EVENT_PAYMENT_SUCCEEDED,
+    "canceled": EVENT_PAYMENT_CANCELED,
+}
+
+
+class Command(BaseCommand):
+    help = 'Сверка статусов платежей с YooKassa'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=48,
+            help='Окно сверки: последние N часов (по умолчанию 48)',
+        )
+        parser.add_argument('--from', dest='date_from', help='Начало окна (ISO 8601)')
+        parser.add_argument('--to', dest='date_to', help='Конец окна (ISO 8601)')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Показать изменения без записи в БД',
+        )
+
+    def handle(self, *args, **options):
+        created_lt = self._parse_date(options['date_to']) or timezone.now()
+        created_gte = self._parse_date(options['date_from']) or created_lt - timedelta(hours=options['hours'])
+        if created_gte >= created_lt:
+            raise CommandError('Начало окна должно быть раньше конца')
+
+        self.stdout.write(f'Окно сверки: {created_gte:%d.%m.%Y %H:%M} - {created_lt:%d.%m.%Y %H:%M}')
+
+        started = time.perf_counter()
+        try:
+            payments, pages = self._fetch_payments(created_gte, created_lt)
+        finally:
+            yookassa_client.close()
+        self.stdout.write(
+            f'Платежей в YooKassa: {len(payments)} ({pages} стр., {time.perf_counter() - started:.1f} с)'
+        )
+
+        events = self._collect_changes(payments)
+        if not events:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+            return
+
+        for event in events:
+            self.stdout.write(f'  Заказ #{event.order_id}: платёж {event.object_id} - {event.object_status}')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Пробный запуск - расхождений: {len(events)}, изменения не записаны'))
+            return
+
+        stats = BatchStats(events=len(events))
+        with transaction.atomic():
+            apply_payment_events(events, stats)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Оплачено: {stats.paid}, отменено платежей: {stats.canceled}'
+        ))
+
+    def _parse_date(self, value):
+        if not value:
+            return None
+        try:
+            date = datetime.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f'Некорректная дата: {value}')
+        if timezone.is_naive(date):
+            date = timezone.make_aware(date)
+        return date
+
+    def _fetch_payments(self, created_gte, created_lt):
+        """Все платежи окна, страница за страницей по next_cursor"""
+        payments = []
+        pages = 0
+        cursor = None
+        while True:
+            page = yookassa_client.list_payments(created_gte, created_lt, cursor=cursor)
+            if "error" in page:
+                raise CommandError(f'YooKassa: {page["error"]}')
+            pages += 1
+            payments.extend(page["items"])
+            cursor = page.get("next_cursor")
+            if not cursor:
+                return payments, pages
+
+    def _collect_changes(self, payments):
+        """
+        Платежи с итоговым статусом, который ещё не отражён в заказе,
+        в виде несохранённых событий YooKassaEvent
+        """
+        candidates = {}
+        for payment in payments:
+            event_type = PAYMENT_EVENTS.get(payment.get("status"))
+            try:
+                order_id = int((payment.get("metadata") or {})["order_id"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if event_type:
+                candidates.setdefault(order_id, []).append(YooKassaEvent(
+                    event=event_type,
+                    object_id=payment["id"],
+                    payment_id=payment["id"],
+                    object_status=payment["status"],
+                    order_id=order_id,
+                ))
+
+        orders = Order.objects.filter(pk__in=candidates).only(
+            "id", "status", "payment_id", "payment_status"
+        ).in_bulk()
+
+        awaiting = (Order.STATUS_PLACED, Order.STATUS_CONFIRMED)
+        events = []
+        for order_id, order_events in candidates.items():
+            order = orders.get(order_id)
+            if order is None:
+                continue
+            for event in order_events:
+                if event.event == EVENT_PAYMENT_SUCCEEDED:
+                    if order.status in awaiting or order.payment_status != "succeeded":
+                        events.append(event)
+                elif order.payment_id == event.payment_id and order.payment_status != "canceled":
+                    events.append(event)
+        return events
@@ -0,0 +1,20 @@
+"""
+Удаление истёкших резервов остатков.
+
+Истёкшие резервы не учитываются при расчёте доступного остатка и без
+этой команды, она лишь не даёт таблице расти. Запускать по cron.
+
+Использование:
+    python manage.py release_expired_reservations
+"""
+from django.core.management.base import BaseCommand
+
+from orders.stock import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = 'Удаление истёкших резервов остатков'
+
+    def handle(self, *args, **options):
+        deleted = release_expired_reservations()
+        self.stdout.write(f'Удалено истёкших резервов: {deleted}')
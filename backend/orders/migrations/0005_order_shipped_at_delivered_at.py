@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 23:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_stockreservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='delivered_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дата доставки'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='shipped_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дата отправки'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-18 23:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_order_shipped_at_delivered_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='payment_status',
+            field=models.CharField(blank=True, help_text='Последний известный статус платежа в YooKassa', max_length=32, verbose_name='Статус платежа'),
+        ),
+    ]
@@ -1,6 +1,9 @@
+import uuid
+
 from django.db import models
 from django.conf import settings
 from catalog.models import Product, ProductVariant
+from integrations.woocommerce_stock import journal_stock_changes
 
 
 class Coupon(models.Model):
@@ -86,6 +89,12 @@ class Order(models.Model):
     # Оплата
     payment_method = models.CharField("Способ оплаты", max_length=50, blank=True)
     payment_id = models.CharField("ID платежа", max_length=100, blank=True, help_text="ID транзакции платёжной системы")
+    payment_status = models.CharField(
+        "Статус платежа",
+        max_length=32,
+        blank=True,
+        help_text="Последний известный статус платежа в YooKassa"
+    )
     paid_at = models.DateTimeField("Дата оплаты", null=True, blank=True)
 
     status = models.CharField(
@@ -114,6 +123,8 @@ class Order(models.Model):
 
     # Трекинг
     tracking_number = models.CharField("Номер отслеживания", max_length=100, blank=True)
+    shipped_at = models.DateTimeField("Дата отправки", null=True, blank=True)
+    delivered_at = models.DateTimeField("Дата доставки", null=True, blank=True)
 
     created_at = models.DateTimeField("Дата создания", auto_now_add=True)
     updated_at = models.DateTimeField("Дата обновления", auto_now=True)
@@ -136,11 +147,18 @@ class Order(models.Model):
 
     def restore_stock(self):
         """Восстановить остатки при отмене заказа"""
-        for item in self.items.all():
+        items = list(self.items.select_related("product", "variant"))
+        for item in items:
             if item.variant:
                 item.variant.stock += item.qty
                 item.variant.save(update_fields=["stock"])
 
+        # Возврат остатков также уходит в WooCommerce
+        journal_stock_changes(
+            [(item.product, item.variant, item.qty) for item in items],
+            reason=f"cancel:{self.pk}",
+        )
+
 
 class OrderItem(models.Model):
     """Позиция заказа"""
@@ -183,18 +201,62 @@ class OrderItem(models.Model):
     def save(self, *args, **kwargs):
         # Сохраняем снапшот данных при создании
         if not self.pk:
-            self.product_name = self.product.name
-            self.product_sku = self.variant.sku if self.variant else self.product.sku
-            if self.variant:
-                self.variant_attributes = {
-                    av.attribute.name: av.value
-                    for av in self.variant.attribute_values.select_related("attribute").all()
-                }
+            self.fill_snapshot()
         super().save(*args, **kwargs)
 
+    def fill_snapshot(self):
+        """
+        Заполняет снапшот товара и вариации.
+        Вызывается и перед bulk_create, где save() не выполняется.
+        Атрибуты берутся из prefetch_related("attribute_values__attribute"), если он был.
+        """
+        self.product_name = self.product.name
+        self.product_sku = self.variant.sku if self.variant else self.product.sku
+        if self.variant:
+            values = self.variant.attribute_values.all()
+            if "attribute_values" not in getattr(self.variant, "_prefetched_objects_cache", {}):
+                values = values.select_related("attribute")
+            self.variant_attributes = {av.attribute.name: av.value for av in values}
+
     def __str__(self):
         name = self.product_name or self.product.name
         if self.variant_attributes:
             attrs = ", ".join(f"{k}: {v}" for k, v in self.variant_attributes.items())
             return f"{name} ({attrs}) x{self.qty}"
         return f"{name} x{self.qty}"
+
+
+class StockReservation(models.Model):
+    """
+    Временный резерв остатка вариации под подтверждённую корзину.
+    Пока резерв не истёк, его количество недоступно другим покупателям;
+    при оформлении заказа резерв превращается в списание остатка.
+    """
+    key = models.UUIDField("Ключ корзины", default=uuid.uuid4, db_index=True)
+    variant = models.ForeignKey(
+        ProductVariant,
+        on_delete=models.CASCADE,
+        related_name="reservations",
+        verbose_name="Вариация"
+    )
+    qty = models.PositiveIntegerField("Количество")
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name="stock_reservations",
+        verbose_name="Пользователь"
+    )
+    expires_at = models.DateTimeField("Действует до", db_index=True)
+    created_at = models.DateTimeField("Дата создания", auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Резерв товара"
+        verbose_name_plural = "Резервы товаров"
+        indexes = [
+            models.Index(fields=["variant", "expires_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.variant} x{self.qty} до {self.expires_at:%d.%m.%Y %H:%M}"
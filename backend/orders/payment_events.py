@@ -0,0 +1,172 @@
+"""
+Применение уведомлений YooKassa из журнала YooKassaEvent к заказам.
+
+Пачка событий разбирается за один проход: заказы загружаются одним
+запросом, каждое изменение статуса применяется одним UPDATE на всю пачку
+(через transition_orders), остатки возвращённых заказов - одним UPDATE
+вариаций. Письма покупателям уходят в очередь outbox.
+
+Неподписанные уведомления перед применением сверяются с API YooKassa:
+применяется статус, который вернул API, а не присланный в уведомлении.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, CharField, F, Q, Value, When
+from django.utils import timezone
+
+from integrations.models import YooKassaEvent
+from integrations.yookassa import yookassa_client
+
+from .models import Order
+from .stock import restore_orders_stock
+from .transitions import transition_orders
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 8
+RETRY_DELAY = 30  # секунд, удваивается с каждой попыткой
+
+EVENT_PAYMENT_SUCCEEDED = "payment.succeeded"
+EVENT_PAYMENT_CANCELED = "payment.canceled"
+EVENT_REFUND_SUCCEEDED = "refund.succeeded"
+
+
+@dataclass
+class BatchStats:
+    events: int = 0
+    paid: int = 0
+    canceled: int = 0
+    refunded: int = 0
+    failed: int = 0
+
+
+def pending_events(batch_size: int):
+    now = timezone.now()
+    return list(
+        YooKassaEvent.objects
+        .filter(processed_at__isnull=True, attempts__lt=MAX_ATTEMPTS)
+        .filter(Q(retry_at__isnull=True) | Q(retry_at__lte=now))
+        .order_by("received_at")[:batch_size]
+    )
+
+
+def process_events(batch_size: int = 100) -> BatchStats:
+    """Обрабатывает очередную пачку уведомлений"""
+    events = pending_events(batch_size)
+    stats = BatchStats(events=len(events))
+    if not events:
+        return stats
+
+    failed = {}
+    confirmed = []
+    for event in events:
+        error = None if event.signed else _confirm_with_api(event)
+        if error:
+            failed[event.pk] = error
+        else:
+            confirmed.append(event)
+
+    with transaction.atomic():
+        apply_payment_events(confirmed, stats)
+        YooKassaEvent.objects.filter(pk__in=[e.pk for e in confirmed]).update(
+            processed_at=timezone.now(), last_error="",
+        )
+
+    now = timezone.now()
+    for event in events:
+        if event.pk in failed:
+            YooKassaEvent.objects.filter(pk=event.pk).update(
+                attempts=F("attempts") + 1,
+                retry_at=now + timedelta(seconds=RETRY_DELAY * 2 ** event.attempts),
+                last_error=failed[event.pk],
+            )
+            logger.warning(f"YooKassa event {event.event} {event.object_id}: {failed[event.pk]}")
+    stats.failed = len(failed)
+    return stats
+
+
+def _confirm_with_api(event) -> str:
+    """
+    Заменяет статус объекта в событии статусом из API YooKassa.
+    Возвращает текст ошибки или пустую строку.
+    """
+    if event.event.startswith("refund."):
+        result = yookassa_client.get_refund(event.object_id)
+        if "error" not in result:
+            event.payment_id = result.get("payment_id") or event.payment_id
+    else:
+        result = yookassa_client.get_payment(event.object_id)
+        if "error" not in result and event.order_id is None:
+            try:
+                event.order_id = int(result.get("metadata", {})["order_id"])
+            except (KeyError, TypeError, ValueError):
+                pass
+
+    if "error" in result:
+        return result["error"]
+    event.object_status = result.get("status") or ""
+    return ""
+
+
+def apply_payment_events(events, stats: BatchStats):
+    """
+    Применяет подтверждённые события к заказам, по одному UPDATE на вид изменения.
+    События не обязаны быть сохранены: сверка платежей передаёт сюда
+    несохранённые YooKassaEvent, собранные из списка платежей.
+    """
+    payment_ids = {e.payment_id for e in events if e.payment_id}
+    order_ids = {e.order_id for e in events if e.order_id}
+    orders = list(
+        Order.objects.filter(Q(pk__in=order_ids) | Q(payment_id__in=payment_ids))
+        .only("id", "payment_id")
+    )
+    by_id = {o.pk: o for o in orders}
+    by_payment = {o.payment_id: o for o in orders if o.payment_id}
+
+    def find_order(event):
+        return by_id.get(event.order_id) or by_payment.get(event.payment_id)
+
+    paid = {}  # order_id -> payment_id
+    canceled = set()
+    refunded = set()
+    for event in events:
+        order = find_order(event)
+        if order is None:
+            logger.warning(f"YooKassa event {event.event} {event.object_id}: order not found")
+            continue
+
+        if event.event == EVENT_PAYMENT_SUCCEEDED and event.object_status == "succeeded":
+            paid[order.pk] = event.payment_id
+        elif event.event == EVENT_PAYMENT_CANCELED and event.object_status == "canceled":
+            canceled.add(event.payment_id)
+        elif event.event == EVENT_REFUND_SUCCEEDED and event.object_status == "succeeded":
+            refunded.add(order.pk)
+
+    if paid:
+        result = transition_orders(
+            Order.objects.filter(pk__in=paid),
+            Order.STATUS_PAID,
+            payment_status="succeeded",
+            payment_id=Case(
+                *[When(pk=pk, then=Value(payment_id)) for pk, payment_id in paid.items()],
+                output_field=CharField(),
+            ),
+        )
+        stats.paid = result.updated
+        # Заказ уже оплачен или в другом статусе - фиксируем только статус платежа
+        Order.objects.filter(pk__in=paid).exclude(pk__in=result.order_ids).update(
+            payment_status="succeeded"
+        )
+
+    if canceled:
+        stats.canceled = Order.objects.filter(payment_id__in=canceled).update(
+            payment_status="canceled"
+        )
+
+    if refunded:
+        result = transition_orders(Order.objects.filter(pk__in=refunded), Order.STATUS_REFUNDED)
+        restore_orders_stock(result.order_ids, reason="refund")
+        stats.refunded = result.updated
@@ -3,7 +3,6 @@ Views для работы с платежами
 """
 import json
 import logging
-from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.http import JsonResponse, HttpResponse
 from rest_framework import status
@@ -12,11 +11,15 @@ from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from .models import Order
 from .serializers import OrderSerializer
-from .emails import send_order_paid
+from .transitions import transition_orders
+from integrations.models import YooKassaEvent
 from integrations.yookassa import yookassa_client
 
 logger = logging.getLogger(__name__)
 
+# Подпись уведомления: HMAC-SHA256 тела на секретном ключе магазина
+WEBHOOK_SIGNATURE_HEADER = "X-YooKassa-Signature"
+
 
 class CreatePaymentView(APIView):
     """Создание платежа для заказа"""
@@ -63,7 +66,8 @@ class CreatePaymentView(APIView):
 
         # Сохраняем ID платежа
         order.payment_id = result["payment_id"]
-        order.save(update_fields=["payment_id"])
+        order.payment_status = result.get("status") or ""
+        order.save(update_fields=["payment_id", "payment_status"])
 
         return Response({
             "payment_id": result["payment_id"],
@@ -72,14 +76,26 @@ class CreatePaymentView(APIView):
         })
 
 
+# Итоговые статусы платежа: после них YooKassa больше не опрашиваем
+FINAL_PAYMENT_STATUSES = ("succeeded", "canceled")
+
+
 class PaymentStatusView(APIView):
-    """Проверка статуса платежа"""
+    """
+    Проверка статуса платежа
+
+    Страница возврата опрашивает этот endpoint, пока платёж не завершится.
+    Итог обычно уже сохранён в заказе webhook'ом, и ответ собирается
+    из одной строки заказа. YooKassa запрашивается только для незавершённых
+    платежей, через короткий кэш с объединением одновременных запросов.
+    """
     permission_classes = [AllowAny]
 
     def get(self, request, order_id):
-        try:
-            order = Order.objects.get(pk=order_id)
-        except Order.DoesNotExist:
+        order = Order.objects.filter(pk=order_id).only(
+            "id", "status", "payment_id", "payment_status"
+        ).first()
+        if order is None:
             return Response(
                 {"detail": "Заказ не найден"},
                 status=status.HTTP_404_NOT_FOUND
@@ -93,33 +109,52 @@ class PaymentStatusView(APIView):
                 "paid": False,
             })
 
-        # Получаем статус из YooKassa
-        result = yookassa_client.get_payment(order.payment_id)
+        awaiting_payment = order.status in (Order.STATUS_PLACED, Order.STATUS_CONFIRMED)
+        if not awaiting_payment or order.payment_status in FINAL_PAYMENT_STATUSES:
+            return Response(self._stored_state(order))
+
+        result = yookassa_client.get_payment_cached(order.payment_id)
+        if result is None:
+            # Статус уже запрашивает другой процесс
+            return Response(self._stored_state(order))
 
         if "error" in result:
             return Response({
-                "order_id": order.id,
-                "order_status": order.status,
-                "payment_status": "unknown",
-                "paid": order.status == Order.STATUS_PAID,
+                **self._stored_state(order),
+                "payment_status": order.payment_status or "unknown",
                 "error": result["error"],
             })
 
-        # Если платёж успешен - обновляем заказ
-        if result.get("paid") and order.status != Order.STATUS_PAID:
-            order.status = Order.STATUS_PAID
-            order.paid_at = timezone.now()
-            order.save(update_fields=["status", "paid_at", "updated_at"])
-            logger.info(f"Order {order.id} marked as paid via status check")
-            send_order_paid(order)
+        self._apply_payment(order, result)
+        return Response(self._stored_state(order))
 
-        return Response({
+    def _stored_state(self, order):
+        return {
             "order_id": order.id,
             "order_status": order.status,
-            "payment_id": result.get("payment_id"),
-            "payment_status": result.get("status"),
-            "paid": result.get("paid", False),
-        })
+            "payment_id": order.payment_id,
+            "payment_status": order.payment_status or None,
+            "paid": order.status == Order.STATUS_PAID or order.payment_status == "succeeded",
+        }
+
+    def _apply_payment(self, order, result):
+        """Сохраняет в заказе статус платежа, полученный из YooKassa"""
+        payment_status = result.get("status") or ""
+
+        # Если платёж успешен - переводим заказ в оплаченные (письмо уходит в очередь)
+        if result.get("paid"):
+            transition = transition_orders(
+                Order.objects.filter(pk=order.pk),
+                Order.STATUS_PAID,
+                payment_status=payment_status,
+            )
+            if transition.updated:
+                order.status = Order.STATUS_PAID
+                logger.info(f"Order {order.id} marked as paid via status check")
+
+        if payment_status != order.payment_status:
+            Order.objects.filter(pk=order.pk).update(payment_status=payment_status)
+            order.payment_status = payment_status
 
 
 @csrf_exempt
@@ -128,61 +163,48 @@ def yookassa_webhook(request):
     Webhook для обработки уведомлений от YooKassa
 
     YooKassa отправляет POST запросы при изменении статуса платежа.
+    Уведомление только записывается в журнал YooKassaEvent и сразу
+    подтверждается, заказы обновляет команда process_yookassa_events.
+    Повторная доставка того же уведомления журнал не меняет.
     Документация: https://yookassa.ru/developers/using-api/webhooks
     """
     if request.method != "POST":
         return HttpResponse(status=405)
 
+    body = request.body
+    signature = request.headers.get(WEBHOOK_SIGNATURE_HEADER, "")
+    if signature and not yookassa_client.verify_webhook_signature(body, signature):
+        logger.warning("YooKassa webhook: invalid signature")
+        return HttpResponse(status=401)
+
     try:
-        body = request.body
         data = json.loads(body)
-    except json.JSONDecodeError:
+        event_type = data["event"]
+        payment_object = data["object"]
+        object_id = payment_object["id"]
+    except (json.JSONDecodeError, KeyError, TypeError):
         logger.error("YooKassa webhook: invalid JSON")
         return HttpResponse(status=400)
 
-    event_type = data.get("event")
-    payment_object = data.get("object", {})
-    payment_id = payment_object.get("id")
-    payment_status = payment_object.get("status")
-    metadata = payment_object.get("metadata", {})
-    order_id = metadata.get("order_id")
-
-    logger.info(f"YooKassa webhook: event={event_type}, payment={payment_id}, order={order_id}")
-
-    if not order_id:
-        logger.warning("YooKassa webhook: no order_id in metadata")
-        return HttpResponse(status=200)
-
+    metadata = payment_object.get("metadata") or {}
     try:
-        order = Order.objects.get(pk=int(order_id))
-    except (Order.DoesNotExist, ValueError):
-        logger.warning(f"YooKassa webhook: order {order_id} not found")
-        return HttpResponse(status=200)
-
-    # Обработка события
-    if event_type == "payment.succeeded":
-        if order.status != Order.STATUS_PAID:
-            order.status = Order.STATUS_PAID
-            order.payment_id = payment_id
-            order.paid_at = timezone.now()
-            order.save(update_fields=["status", "payment_id", "paid_at", "updated_at"])
-            logger.info(f"Order {order.id} marked as paid via webhook")
-
-            # Отправляем email с подтверждением оплаты
-            send_order_paid(order)
-
-    elif event_type == "payment.canceled":
-        # Платёж отменён - можно уведомить пользователя
-        logger.info(f"Payment canceled for order {order.id}")
-
-    elif event_type == "refund.succeeded":
-        # Возврат успешен
-        if order.status != Order.STATUS_REFUNDED:
-            order.status = Order.STATUS_REFUNDED
-            order.save(update_fields=["status", "updated_at"])
-
-            # Восстанавливаем остатки
-            order.restore_stock()
-            logger.info(f"Order {order.id} refunded via webhook")
+        order_id = int(metadata["order_id"])
+    except (KeyError, TypeError, ValueError):
+        order_id = None
+
+    is_refund = event_type.startswith("refund.")
+    YooKassaEvent.objects.bulk_create([
+        YooKassaEvent(
+            event=event_type,
+            object_id=object_id,
+            payment_id=payment_object.get("payment_id", "") if is_refund else object_id,
+            object_status=payment_object.get("status") or "",
+            order_id=order_id,
+            payload=data,
+            signed=bool(signature),
+        )
+    ], ignore_conflicts=True)
+
+    logger.info(f"YooKassa webhook: event={event_type}, object={object_id}, order={order_id}")
 
     return HttpResponse(status=200)
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from .models import Order, OrderItem, Coupon
-from catalog.serializers import ProductListSerializer
+from drf_spectacular.utils import extend_schema_field
 from catalog.models import Product, ProductVariant
 from django.utils import timezone
 import re
@@ -16,11 +16,30 @@ class CheckoutItemSerializer(serializers.Serializer):
     qty = serializers.IntegerField(min_value=1, max_value=100)
 
 
+class ReserveItemSerializer(serializers.Serializer):
+    variant_id = serializers.IntegerField()
+    qty = serializers.IntegerField(min_value=1, max_value=100)
+
+
+class ReserveSerializer(serializers.Serializer):
+    """Резерв остатков под корзину. Пустой список items снимает резерв"""
+    reservation_key = serializers.UUIDField(required=False, allow_null=True)
+    items = ReserveItemSerializer(many=True)
+
+
+class QuoteSerializer(serializers.Serializer):
+    """Пересчёт корзины по текущим ценам и остаткам"""
+    items = CheckoutItemSerializer(many=True)
+    coupon_code = serializers.CharField(required=False, allow_blank=True, max_length=40)
+    reservation_key = serializers.UUIDField(required=False, allow_null=True)
+
+
 class CheckoutSerializer(serializers.Serializer):
     email = serializers.EmailField()
     phone = serializers.CharField(required=False, allow_blank=True, max_length=32)
     coupon_code = serializers.CharField(required=False, allow_blank=True, max_length=40)
     items = CheckoutItemSerializer(many=True)
+    reservation_key = serializers.UUIDField(required=False, allow_null=True)
 
     # Адрес доставки
     shipping_name = serializers.CharField(required=False, allow_blank=True, max_length=200)
@@ -49,8 +68,24 @@ class CheckoutSerializer(serializers.Serializer):
         return attrs
 
 
+class OrderItemProductSerializer(serializers.ModelSerializer):
+    """Ссылка на товар из позиции заказа: название и состав берутся из снапшота"""
+    main_image_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Product
+        fields = ("id", "slug", "name", "main_image_url")
+
+    @extend_schema_field(serializers.CharField)
+    def get_main_image_url(self, obj) -> str:
+        request = self.context.get("request")
+        if obj.main_image and request:
+            return request.build_absolute_uri(obj.main_image.url)
+        return ''
+
+
 class OrderItemSerializer(serializers.ModelSerializer):
-    product = ProductListSerializer()
+    product = OrderItemProductSerializer()
     variant_attributes = serializers.JSONField(read_only=True)
 
     class Meta:
@@ -63,7 +98,8 @@ class OrderItemSerializer(serializers.ModelSerializer):
 
 class OrderListSerializer(serializers.ModelSerializer):
     """Сериализатор для списка заказов (без деталей позиций)"""
-    items_count = serializers.SerializerMethodField()
+    # Аннотация Count("items") в MyOrdersView
+    items_count = serializers.IntegerField(read_only=True)
     status_display = serializers.CharField(source="get_status_display", read_only=True)
 
     class Meta:
@@ -73,9 +109,6 @@ class OrderListSerializer(serializers.ModelSerializer):
             "created_at", "items_count"
         )
 
-    def get_items_count(self, obj):
-        return obj.items.count()
-
 
 class OrderSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True)
@@ -0,0 +1,171 @@
+"""
+Списание и резервирование остатков вариаций.
+
+Остаток списывается условным UPDATE (stock >= qty) без предварительной
+блокировки строк: параллельные заказы на одну вариацию не ждут друг друга
+всё время запроса, а продать больше, чем есть на складе, невозможно.
+
+Подтверждённая корзина может зарезервировать остаток на
+STOCK_RESERVATION_TTL секунд (StockReservation). Действующие резервы
+других корзин вычитаются из доступного остатка, а при оформлении заказа
+резерв корзины превращается в списание.
+"""
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from collections import defaultdict
+
+from django.db.models import Case, F, OuterRef, PositiveIntegerField, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from catalog.models import ProductVariant
+from integrations.woocommerce_stock import journal_stock_changes
+from .models import OrderItem, StockReservation
+
+
+class InsufficientStock(Exception):
+    """Остатка вариации не хватило в момент списания"""
+
+    def __init__(self, variant_id: int, requested: int):
+        self.variant_id = variant_id
+        self.requested = requested
+        super().__init__(f"Недостаточно остатка вариации {variant_id}: запрошено {requested}")
+
+
+def active_reservations(exclude_key=None):
+    """Действующие резервы, кроме резервов корзины exclude_key"""
+    reservations = StockReservation.objects.filter(expires_at__gt=timezone.now())
+    if exclude_key:
+        reservations = reservations.exclude(key=exclude_key)
+    return reservations
+
+
+def reserved_qty(variant_ids, exclude_key=None) -> dict:
+    """Зарезервированное количество по вариациям одним запросом: {variant_id: qty}"""
+    return dict(
+        active_reservations(exclude_key)
+        .filter(variant_id__in=variant_ids)
+        .values("variant_id")
+        .annotate(total=Sum("qty"))
+        .values_list("variant_id", "total")
+    )
+
+
+def available_stock(variants, exclude_key=None) -> dict:
+    """Доступный остаток вариаций с учётом чужих резервов: {variant_id: qty}"""
+    reserved = reserved_qty([v.pk for v in variants], exclude_key)
+    return {v.pk: max(0, v.stock - reserved.get(v.pk, 0)) for v in variants}
+
+
+def _reserved_subquery(exclude_key=None):
+    return Coalesce(
+        Subquery(
+            active_reservations(exclude_key)
+            .filter(variant_id=OuterRef("pk"))
+            .values("variant_id")
+            .annotate(total=Sum("qty"))
+            .values("total")[:1]
+        ),
+        Value(0),
+    )
+
+
+def claim_stock(quantities: dict, reservation_key=None):
+    """
+    Списывает остатки вариаций: {variant_id: количество}.
+
+    Списание проходит, только если после него остаётся не меньше,
+    чем зарезервировано другими корзинами. Резервы корзины
+    reservation_key после списания удаляются.
+
+    Вариации обновляются по возрастанию id, чтобы параллельные транзакции
+    брали блокировки строк в одном порядке и не попадали в deadlock.
+    Вызывается внутри transaction.atomic(): при нехватке остатка
+    выбрасывается InsufficientStock, и уже списанное откатывается вместе
+    с транзакцией.
+    """
+    for variant_id in sorted(quantities):
+        qty = quantities[variant_id]
+        updated = ProductVariant.objects.filter(
+            pk=variant_id,
+            stock__gte=_reserved_subquery(reservation_key) + qty,
+        ).update(stock=F("stock") - qty)
+        if not updated:
+            raise InsufficientStock(variant_id, qty)
+
+    if reservation_key:
+        StockReservation.objects.filter(key=reservation_key).delete()
+
+
+def reserve_stock(quantities: dict, key=None, user=None) -> tuple:
+    """
+    Резервирует остатки под корзину: {variant_id: количество}.
+    Прежние резервы корзины key заменяются новыми.
+
+    Вариации блокируются по возрастанию id только на время короткой
+    транзакции резервирования. Вызывается внутри transaction.atomic().
+
+    Returns:
+        (ключ корзины, срок действия)
+    """
+    expires_at = timezone.now() + timedelta(seconds=settings.STOCK_RESERVATION_TTL)
+    reservations = StockReservation.objects.filter(key=key) if key else StockReservation.objects.none()
+    reservations.delete()
+
+    variants = list(
+        ProductVariant.objects.filter(pk__in=quantities, is_active=True)
+        .select_for_update()
+        .order_by("id")
+    )
+    available = available_stock(variants, exclude_key=key)
+    for variant_id in sorted(quantities):
+        if available.get(variant_id, 0) < quantities[variant_id]:
+            raise InsufficientStock(variant_id, quantities[variant_id])
+
+    key = key or uuid.uuid4()
+    StockReservation.objects.bulk_create([
+        StockReservation(
+            key=key,
+            variant_id=variant_id,
+            qty=qty,
+            user=user,
+            expires_at=expires_at,
+        )
+        for variant_id, qty in quantities.items()
+    ])
+    return key, expires_at
+
+
+def release_expired_reservations() -> int:
+    """Удаляет истёкшие резервы одним запросом"""
+    deleted, _ = StockReservation.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
+
+
+def restore_orders_stock(order_ids, reason: str = "cancel"):
+    """
+    Возвращает на склад остатки позиций заказов одним UPDATE
+    и записывает возврат в журнал для WooCommerce ("{reason}:{id заказа}").
+    Набор заказов - аналог Order.restore_stock для пакетной обработки.
+    """
+    items = list(
+        OrderItem.objects.filter(order_id__in=order_ids).select_related("product", "variant")
+    )
+    restored = defaultdict(int)
+    by_order = defaultdict(list)
+    for item in items:
+        if item.variant_id:
+            restored[item.variant_id] += item.qty
+        by_order[item.order_id].append((item.product, item.variant, item.qty))
+
+    if restored:
+        ProductVariant.objects.filter(pk__in=restored).update(
+            stock=Case(
+                *[When(pk=pk, then=F("stock") + qty) for pk, qty in restored.items()],
+                output_field=PositiveIntegerField(),
+            )
+        )
+    for order_id, changes in by_order.items():
+        journal_stock_changes(changes, reason=f"{reason}:{order_id}")
@@ -1,3 +1,443 @@
-from django.test import TestCase
+import hashlib
+import hmac
+import io
+import json
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from http.server import ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import connections
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from catalog.models import Category, Product, ProductVariant
+from integrations.management.commands.fake_yookassa import FakeYooKassaHandler, _utc
+from integrations.models import WooCommerceStockDelta, YooKassaEvent
+from integrations.yookassa import yookassa_client
+from outbox.models import OutboxEmail
+
+from . import emails
+from .models import Coupon, Order, OrderItem, StockReservation
+from .payment_events import BatchStats, apply_payment_events, process_events
+from .transitions import transition_orders
+
+CHECKOUT_URL = "/api/orders/checkout/"
+RESERVE_URL = "/api/orders/reserve/"
+QUOTE_URL = "/api/orders/quote/"
+YOOKASSA_WEBHOOK_URL = "/api/orders/webhooks/yookassa/"
+
+
+class CheckoutStockTests(TransactionTestCase):
+    """Списание остатков при оформлении заказа: без перепродажи и с полным откатом"""
+
+    STOCK = 20
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Оправы", slug="frames")
+        self.product = Product.objects.create(
+            name="Оправа", slug="frame-1", sku="FRAME-1",
+            category=self.category, price=100, is_active=True,
+        )
+        self.variant = self.create_variant("FRAME-1-1", self.STOCK)
+
+    def create_variant(self, sku, stock):
+        return ProductVariant.objects.create(
+            product=self.product, sku=sku, price=100, stock=stock, is_active=True,
+        )
+
+    def checkout(self, *items):
+        payload = {
+            "email": "buyer@example.com",
+            "items": [
+                {"product_id": self.product.pk, "variant_id": variant.pk, "qty": qty}
+                for variant, qty in items
+            ],
+        }
+        return APIClient().post(CHECKOUT_URL, payload, format="json")
+
+    def sold(self, variant):
+        return OrderItem.objects.filter(variant=variant).aggregate(total=Sum("qty"))["total"] or 0
+
+    def test_sequential_orders_stop_at_stock(self):
+        statuses = Counter(self.checkout((self.variant, 3)).status_code for _ in range(10))
+
+        self.variant.refresh_from_db()
+        self.assertEqual(statuses, {201: 6, 400: 4})
+        self.assertEqual(self.sold(self.variant), 18)
+        self.assertEqual(self.variant.stock, 2)
+
+    @skipUnlessDBFeature("has_select_for_update")
+    def test_concurrent_orders_not_oversold(self):
+        # SQLite блокирует базу целиком и выполняет записи по одной,
+        # поэтому гонку проверяем только на PostgreSQL
+        results = Counter()
+        lock = threading.Lock()
+
+        def place_order(_):
+            try:
+                outcome = self.checkout((self.variant, 1)).status_code
+            except Exception as e:
+                outcome = type(e).__name__
+            finally:
+                connections.close_all()
+            with lock:
+                results[outcome] += 1
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(place_order, range(self.STOCK * 3)))
+
+        self.variant.refresh_from_db()
+        sold = self.sold(self.variant)
+        self.assertLessEqual(sold, self.STOCK)
+        self.assertEqual(sold + self.variant.stock, self.STOCK)
+        self.assertEqual(results[201], sold)
+        self.assertEqual(results[201] + results[400], self.STOCK * 3, results)
+
+    def test_failed_claim_rolls_back_whole_order(self):
+        second = self.create_variant("FRAME-1-2", 1)
+
+        # Остаток второй вариации закончился между проверкой и списанием:
+        # первая вариация к этому моменту уже списана
+        with mock.patch("orders.views.available_stock", return_value={self.variant.pk: 5, second.pk: 5}):
+            response = self.checkout((self.variant, 2), (second, 3))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("Недостаточно товара", response.json()["detail"])
+        self.variant.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((self.variant.stock, second.stock), (self.STOCK, 1))
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertFalse(WooCommerceStockDelta.objects.exists())
+        self.assertFalse(OutboxEmail.objects.exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.sales_count, 0)
+
+
+class StockReservationTests(TestCase):
+    """Резерв остатков под корзину: чужие резервы недоступны, истёкшие освобождаются"""
+
+    def setUp(self):
+        category = Category.objects.create(name="Оправы", slug="frames")
+        self.product = Product.objects.create(
+            name="Оправа", slug="frame-1", sku="FRAME-1", category=category, price=100, is_active=True,
+        )
+        self.variant = ProductVariant.objects.create(
+            product=self.product, sku="FRAME-1-1", price=100, stock=5, is_active=True,
+        )
+        self.api = APIClient()
+
+    def reserve(self, qty, key=None):
+        return self.api.post(RESERVE_URL, {
+            "reservation_key": key,
+            "items": [{"variant_id": self.variant.pk, "qty": qty}],
+        }, format="json")
+
+    def checkout(self, qty, key=None):
+        return self.api.post(CHECKOUT_URL, {
+            "email": "buyer@example.com",
+            "reservation_key": key,
+            "items": [{"product_id": self.product.pk, "variant_id": self.variant.pk, "qty": qty}],
+        }, format="json")
+
+    def test_reserved_stock_not_sold_to_others(self):
+        key = self.reserve(3).json()["reservation_key"]
+
+        self.assertEqual(self.reserve(3).status_code, 400)
+        self.assertEqual(self.checkout(3).status_code, 400)
+        self.assertEqual(self.checkout(2).status_code, 201)
+        self.assertEqual(self.checkout(3, key).status_code, 201)
+
+        self.variant.refresh_from_db()
+        self.assertEqual(self.variant.stock, 0)
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_repeated_reserve_replaces_cart(self):
+        key = self.reserve(3).json()["reservation_key"]
+
+        response = self.reserve(5, key)
+
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(StockReservation.objects.get().qty, 5)
+
+    def test_expired_reservation_releases_stock(self):
+        self.reserve(5)
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(self.checkout(5).status_code, 201)
+
+        stdout = io.StringIO()
+        call_command("release_expired_reservations", stdout=stdout)
+        self.assertIn("Удалено истёкших резервов: 1", stdout.getvalue())
+        self.assertFalse(StockReservation.objects.exists())
+
+
+class QuoteTests(TestCase):
+    """Пересчёт корзины совпадает с тем, что спишет оформление заказа"""
+
+    def setUp(self):
+        category = Category.objects.create(name="Линзы", slug="lenses")
+        self.lenses = Product.objects.create(
+            name="Линзы", slug="lenses-1", sku="LENS-1", category=category, price=Decimal("1200.00"),
+        )
+        self.inherited = ProductVariant.objects.create(product=self.lenses, sku="LENS-1-1", stock=10)
+        self.own_price = ProductVariant.objects.create(
+            product=self.lenses, sku="LENS-1-2", price=Decimal("1350.50"), stock=1,
+        )
+        self.solution = Product.objects.create(
+            name="Раствор", slug="solution", sku="SOL-1", category=category, price=Decimal("349.90"),
+        )
+        Coupon.objects.create(code="SALE10", discount_type=Coupon.DISCOUNT_PERCENT, amount=10)
+        self.items = [
+            {"product_id": self.lenses.pk, "variant_id": self.inherited.pk, "qty": 2},
+            {"product_id": self.lenses.pk, "variant_id": self.own_price.pk, "qty": 1},
+            {"product_id": self.solution.pk, "qty": 3},
+        ]
+        self.api = APIClient()
+
+    def quote(self, items):
+        response = self.api.post(QUOTE_URL, {"items": items, "coupon_code": "sale10"}, format="json")
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_totals_match_checkout(self):
+        quote = self.quote(self.items)
+
+        response = self.api.post(CHECKOUT_URL, {
+            "email": "buyer@example.com", "items": self.items, "coupon_code": "sale10",
+        }, format="json")
+
+        self.assertEqual(response.status_code, 201, response.content)
+        order = Order.objects.get()
+        self.assertTrue(quote["valid"])
+        self.assertEqual(
+            [Decimal(str(quote[field])) for field in ("total", "discount_total", "grand_total")],
+            [order.total, order.discount_total, order.grand_total],
+        )
+        self.assertEqual(
+            sorted(Decimal(str(line["line_total"])) for line in quote["items"]),
+            sorted(order.items.values_list("line_total", flat=True)),
+        )
+
+    def test_unavailable_line_reported_like_checkout(self):
+        items = self.items + [{"product_id": self.lenses.pk, "variant_id": self.own_price.pk, "qty": 1}]
+
+        quote = self.quote(items)
+
+        self.assertFalse(quote["valid"])
+        self.assertEqual(quote["items"][-1]["error"], "Доступно: 1, запрошено: 2")
+        self.assertEqual(quote["items"][-1]["available"], 1)
+
+        response = self.api.post(CHECKOUT_URL, {"email": "buyer@example.com", "items": items}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+
+class TransitionOrdersTests(TestCase):
+    """Массовая смена статуса ставит письма в очередь одной вставкой"""
+
+    def test_notifications_queued_in_one_insert(self):
+        orders = [
+            Order.objects.create(email=f"buyer{i}@example.com", status=Order.STATUS_PLACED, total=100, grand_total=100)
+            for i in range(3)
+        ]
+        Order.objects.create(email="done@example.com", status=Order.STATUS_DELIVERED, total=100, grand_total=100)
+
+        with mock.patch.object(emails, "enqueue_emails", wraps=emails.enqueue_emails) as enqueue:
+            result = transition_orders(Order.objects.all(), Order.STATUS_PAID)
+
+        enqueue.assert_called_once()
+        self.assertEqual((result.updated, result.skipped, result.notified), (3, 1, 3))
+        self.assertEqual(
+            sorted(OutboxEmail.objects.filter(kind="order_paid").values_list("to", flat=True)),
+            [[order.email] for order in orders],
+        )
+
+
+class FakeYooKassaTestCase(TestCase):
+    """Клиент YooKassa направлен на локальный сервер fake_yookassa"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.handler = type("Handler", (FakeYooKassaHandler,), {
+            "payments": [],
+            "log_message": lambda self, format, *args: None,
+        })
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), cls.handler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.addClassCleanup(cls.server.server_close)
+        cls.addClassCleanup(cls.server.shutdown)
+
+    def setUp(self):
+        for name, value in (
+            ("api_url", f"http://127.0.0.1:{self.server.server_port}/v3"),
+            ("shop_id", "test-shop"),
+            ("secret_key", "test-secret"),
+        ):
+            patcher = mock.patch.object(yookassa_client, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.handler.payments = []
+
+    def create_order(self, payment_id):
+        return Order.objects.create(
+            email="buyer@example.com", payment_id=payment_id, total=100, grand_total=100,
+        )
+
+    def payment(self, order, status):
+        return {
+            "id": order.payment_id,
+            "status": status,
+            "paid": status == "succeeded",
+            "created_at": _utc((timezone.now() - timedelta(hours=1)).isoformat()),
+            "metadata": {"order_id": str(order.pk)},
+        }
+
+
+class YooKassaWebhookTests(FakeYooKassaTestCase):
+    """Журнал уведомлений YooKassa и их применение к заказам"""
+
+    def setUp(self):
+        super().setUp()
+        self.order = self.create_order("pay-1")
+
+    def notify(self, event, status, signed=False):
+        body = json.dumps({
+            "type": "notification",
+            "event": event,
+            "object": {**self.payment(self.order, status), "status": status},
+        }).encode()
+        headers = {}
+        if signed:
+            headers["HTTP_X_YOOKASSA_SIGNATURE"] = hmac.new(b"test-secret", body, hashlib.sha256).hexdigest()
+        return self.client.post(YOOKASSA_WEBHOOK_URL, body, content_type="application/json", **headers)
+
+    def test_duplicate_delivery_recorded_once(self):
+        self.assertEqual(self.notify("payment.succeeded", "succeeded").status_code, 200)
+        self.assertEqual(self.notify("payment.succeeded", "succeeded").status_code, 200)
+
+        self.assertEqual(YooKassaEvent.objects.count(), 1)
+
+    def test_invalid_signature_rejected(self):
+        response = self.client.post(
+            YOOKASSA_WEBHOOK_URL, b"{}", content_type="application/json", HTTP_X_YOOKASSA_SIGNATURE="forged",
+        )
+
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(YooKassaEvent.objects.exists())
+
+    def test_forged_unsigned_event_not_applied(self):
+        # Уведомление без подписи утверждает, что платёж прошёл, API - что нет
+        self.handler.payments = [self.payment(self.order, "pending")]
+        self.notify("payment.succeeded", "succeeded")
+
+        stats = process_events()
+
+        self.order.refresh_from_db()
+        self.assertEqual((stats.events, stats.paid, stats.failed), (1, 0, 0))
+        self.assertEqual(self.order.status, Order.STATUS_PLACED)
+        self.assertIsNotNone(YooKassaEvent.objects.get().processed_at)
+
+    def test_unknown_unsigned_payment_retried(self):
+        self.notify("payment.succeeded", "succeeded")
+
+        stats = process_events()
+
+        event = YooKassaEvent.objects.get()
+        self.assertEqual(stats.failed, 1)
+        self.assertIsNone(event.processed_at)
+        self.assertEqual(event.attempts, 1)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.STATUS_PLACED)
+
+    def test_signed_event_applied_without_api(self):
+        self.notify("payment.succeeded", "succeeded", signed=True)
+
+        self.assertEqual(process_events().paid, 1)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.STATUS_PAID)
+
+    def test_succeeded_applied_once(self):
+        self.handler.payments = [self.payment(self.order, "succeeded")]
+        self.notify("payment.succeeded", "succeeded")
+        process_events()
+
+        events = list(YooKassaEvent.objects.all())
+        stats = BatchStats()
+        apply_payment_events(events, stats)
+
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.status, self.order.payment_status), (Order.STATUS_PAID, "succeeded"))
+        self.assertEqual(stats.paid, 0)
+        self.assertEqual(OutboxEmail.objects.filter(kind="order_paid").count(), 1)
+
+    def test_canceled_applied_once(self):
+        self.handler.payments = [self.payment(self.order, "canceled")]
+        self.notify("payment.canceled", "canceled")
+
+        self.assertEqual(process_events().canceled, 1)
+        self.assertEqual(process_events().events, 0)
+        apply_payment_events(list(YooKassaEvent.objects.all()), BatchStats())
+
+        self.order.refresh_from_db()
+        self.assertEqual((self.order.status, self.order.payment_status), (Order.STATUS_PLACED, "canceled"))
+        self.assertFalse(OutboxEmail.objects.exists())
+
+
+class ReconcilePaymentsTests(FakeYooKassaTestCase):
+    """Сверка платежей с локальным сервером fake_yookassa"""
+
+    def setUp(self):
+        super().setUp()
+        self.paid = self.create_order("pay-paid")
+        self.pending = self.create_order("pay-pending")
+        self.canceled = self.create_order("pay-canceled")
+        self.handler.payments = [
+            self.payment(self.paid, "succeeded"),
+            self.payment(self.pending, "pending"),
+            self.payment(self.canceled, "canceled"),
+        ]
+        # Платежи без заказов - чтобы список занял несколько страниц
+        self.handler.payments += [
+            {"id": f"foreign-{i}", "status": "succeeded", "created_at": _utc(timezone.now().isoformat())}
+            for i in range(120)
+        ]
+
+    def reconcile(self, *args):
+        stdout = io.StringIO()
+        call_command("reconcile_payments", *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_lost_notifications_applied(self):
+        output = self.reconcile()
+
+        self.assertIn("(2 стр.", output)
+        for order in (self.paid, self.pending, self.canceled):
+            order.refresh_from_db()
+        self.assertEqual((self.paid.status, self.paid.payment_status), (Order.STATUS_PAID, "succeeded"))
+        self.assertEqual(self.pending.status, Order.STATUS_PLACED)
+        self.assertEqual(self.canceled.payment_status, "canceled")
+
+        self.assertIn("Расхождений нет", self.reconcile())
+
+    def test_dry_run_changes_nothing(self):
+        output = self.reconcile("--dry-run")
+
+        self.assertIn(f"Заказ #{self.paid.pk}", output)
+        self.paid.refresh_from_db()
+        self.assertEqual(self.paid.status, Order.STATUS_PLACED)
+
+    def test_payments_outside_window_ignored(self):
+        week_ago = timezone.now() - timedelta(days=7)
+        self.reconcile("--from", (week_ago - timedelta(days=1)).isoformat(), "--to", week_ago.isoformat())
+
+        self.paid.refresh_from_db()
+        self.assertEqual(self.paid.status, Order.STATUS_PLACED)
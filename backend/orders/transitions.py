@@ -0,0 +1,92 @@
+"""
+Массовая смена статусов заказов.
+
+Переход применяется одним UPDATE на весь набор заказов: сначала
+отбираются заказы в допустимых исходных статусах, затем им
+проставляются новый статус и время перехода. Письма покупателям
+ставятся в очередь (outbox) в той же транзакции и отправляются
+командой run_outbox, поэтому действие в админке не ждёт SMTP.
+"""
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.utils import timezone
+
+from .emails import send_orders_paid, send_orders_shipped
+from .models import Order
+
+# Целевой статус -> допустимые исходные статусы
+TRANSITIONS = {
+    Order.STATUS_PAID: (Order.STATUS_PLACED, Order.STATUS_CONFIRMED),
+    Order.STATUS_SHIPPED: (Order.STATUS_PAID, Order.STATUS_PROCESSING),
+    Order.STATUS_DELIVERED: (Order.STATUS_SHIPPED,),
+    Order.STATUS_REFUNDED: (
+        Order.STATUS_PAID, Order.STATUS_PROCESSING, Order.STATUS_SHIPPED, Order.STATUS_DELIVERED,
+    ),
+}
+
+# Поле, в которое записывается время перехода
+TRANSITION_TIMESTAMPS = {
+    Order.STATUS_PAID: "paid_at",
+    Order.STATUS_SHIPPED: "shipped_at",
+    Order.STATUS_DELIVERED: "delivered_at",
+}
+
+# Уведомления покупателям о переходе (одна вставка в очередь на весь набор)
+TRANSITION_NOTIFICATIONS = {
+    Order.STATUS_PAID: send_orders_paid,
+    Order.STATUS_SHIPPED: send_orders_shipped,
+}
+
+
+@dataclass
+class TransitionResult:
+    """Итог массового перехода"""
+    target: str
+    order_ids: list = field(default_factory=list)
+    skipped: int = 0
+    notified: int = 0
+
+    @property
+    def updated(self) -> int:
+        return len(self.order_ids)
+
+
+def transition_orders(queryset, target: str, notify: bool = True, **values) -> TransitionResult:
+    """
+    Переводит заказы из queryset в статус target.
+    В values можно передать дополнительные поля для того же UPDATE.
+
+    Заказы в недопустимых для перехода статусах пропускаются.
+    Строки блокируются на время транзакции, поэтому параллельный
+    переход не применится к тем же заказам дважды.
+    """
+    if target not in TRANSITIONS:
+        raise ValueError(f"Переход в статус {target} не поддерживается")
+
+    now = timezone.now()
+    values.update(status=target, updated_at=now)
+    timestamp_field = TRANSITION_TIMESTAMPS.get(target)
+    if timestamp_field:
+        values[timestamp_field] = now
+
+    result = TransitionResult(target=target)
+    with transaction.atomic():
+        selected = Order.objects.filter(pk__in=queryset.values("pk"))
+        result.order_ids = list(
+            selected.filter(status__in=TRANSITIONS[target])
+            .select_for_update()
+            .order_by("pk")
+            .values_list("pk", flat=True)
+        )
+        result.skipped = selected.count() - result.updated
+        if not result.order_ids:
+            return result
+
+        Order.objects.filter(pk__in=result.order_ids).update(**values)
+
+        notification = TRANSITION_NOTIFICATIONS.get(target) if notify else None
+        if notification:
+            result.notified = notification(Order.objects.filter(pk__in=result.order_ids).order_by("pk"))
+
+    return result
@@ -1,6 +1,6 @@
 from django.urls import path
 from .views import (
-    CheckoutView, MyOrdersView, OrderDetailView,
+    CheckoutView, QuoteView, ReserveView, MyOrdersView, OrderDetailView,
     OrderCancelView, CouponValidateView
 )
 from .payment_views import CreatePaymentView, PaymentStatusView, yookassa_webhook
@@ -8,6 +8,8 @@ from .payment_views import CreatePaymentView, PaymentStatusView, yookassa_webhoo
 urlpatterns = [
     # Заказы
     path("checkout/", CheckoutView.as_view(), name="checkout"),
+    path("quote/", QuoteView.as_view(), name="quote"),
+    path("reserve/", ReserveView.as_view(), name="reserve"),
     path("my/", MyOrdersView.as_view(), name="my_orders"),
     path("my/<int:pk>/", OrderDetailView.as_view(), name="order_detail"),
     path("my/<int:pk>/cancel/", OrderCancelView.as_view(), name="order_cancel"),
@@ -1,24 +1,38 @@
 from rest_framework import generics, permissions, status
+from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.db import transaction
-from django.db.models import F
+from django.db.models import Case, Count, Exists, F, OuterRef, PositiveIntegerField, Prefetch, When
 from django.shortcuts import get_object_or_404
-from .models import Order, OrderItem, Coupon
+from .models import Order, OrderItem, Coupon, StockReservation
 from .serializers import (
-    CheckoutSerializer, OrderSerializer, OrderListSerializer, calc_discount
+    CheckoutSerializer, OrderSerializer, OrderListSerializer, QuoteSerializer, ReserveSerializer,
+    calc_discount
 )
 from catalog.models import Product, ProductVariant
+from integrations.woocommerce_stock import journal_stock_changes
 from .emails import send_order_confirmation, send_order_cancelled
+from .stock import InsufficientStock, available_stock, claim_stock, reserve_stock
 import logging
+from collections import defaultdict
 
 logger = logging.getLogger(__name__)
 
 
+class OrderCursorPagination(CursorPagination):
+    """Курсорная пагинация: глубина истории не влияет на скорость страницы"""
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = ("-created_at", "-id")
+
+
 class MyOrdersView(generics.ListAPIView):
     """Список заказов текущего пользователя"""
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = OrderListSerializer
+    pagination_class = OrderCursorPagination
     queryset = Order.objects.none()
 
     def get_queryset(self):
@@ -26,7 +40,11 @@ class MyOrdersView(generics.ListAPIView):
             user=self.request.user
         ).exclude(
             status=Order.STATUS_CART
-        ).prefetch_related("items")
+        ).only(
+            "id", "status", "grand_total", "created_at"
+        ).annotate(
+            items_count=Count("items")
+        )
 
 
 class OrderDetailView(generics.RetrieveAPIView):
@@ -35,13 +53,16 @@ class OrderDetailView(generics.RetrieveAPIView):
     serializer_class = OrderSerializer
 
     def get_queryset(self):
+        # Позиции отдаются из снапшота, от товара нужна только ссылка
+        items = OrderItem.objects.select_related("product").only(
+            "id", "order_id", "variant_id", "qty", "unit_price", "line_total",
+            "product_name", "product_sku", "variant_attributes",
+            "product__id", "product__slug", "product__name", "product__main_image",
+        ).order_by("id")
         return Order.objects.filter(
             user=self.request.user
         ).prefetch_related(
-            "items__product",
-            "items__product__category",
-            "items__product__brand",
-            "items__variant"
+            Prefetch("items", queryset=items)
         )
 
 
@@ -74,12 +95,23 @@ class OrderCancelView(APIView):
         return Response(OrderSerializer(order).data)
 
 
+def stock_error_message(error, reservation_key=None):
+    """Текст ошибки для InsufficientStock с актуальным доступным остатком"""
+    variant = ProductVariant.objects.select_related("product").filter(pk=error.variant_id).first()
+    if not variant:
+        return f"Вариация ID {error.variant_id} не найдена"
+    available = available_stock([variant], exclude_key=reservation_key)[variant.pk]
+    return (
+        f"Недостаточно товара '{variant.product.name}' на складе. "
+        f"Доступно: {available}, запрошено: {error.requested}"
+    )
+
+
 class CheckoutView(generics.GenericAPIView):
     """Оформление заказа"""
     permission_classes = [permissions.AllowAny]
     serializer_class = CheckoutSerializer
 
-    @transaction.atomic
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -87,6 +119,33 @@ class CheckoutView(generics.GenericAPIView):
 
         user = request.user if request.user.is_authenticated else None
 
+        try:
+            with transaction.atomic():
+                order, errors = self._place_order(data, user)
+        except InsufficientStock as e:
+            # Остаток закончился между проверкой и списанием, заказ откатен
+            order, errors = None, [stock_error_message(e, data.get("reservation_key"))]
+
+        if errors:
+            return Response(
+                {"detail": errors[0], "errors": errors},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(
+            OrderSerializer(order, context={"request": request}).data,
+            status=status.HTTP_201_CREATED
+        )
+
+    def _place_order(self, data, user):
+        """
+        Проверяет позиции, создаёт заказ и списывает остатки.
+        Вызывается внутри транзакции; если остатка не хватило
+        при списании, выбрасывает InsufficientStock.
+
+        Returns:
+            (заказ, None) или (None, список ошибок)
+        """
         # Получаем купон
         coupon = None
         coupon_code = (data.get("coupon_code") or "").strip()
@@ -103,10 +162,15 @@ class CheckoutView(generics.GenericAPIView):
         ).select_related("category", "brand")
         product_map = {p.id: p for p in products}
 
+        # Без блокировки: остаток здесь проверяется предварительно,
+        # окончательно его гарантирует условное списание в claim_stock
         variants = ProductVariant.objects.filter(
             id__in=variant_ids, is_active=True
-        ).select_for_update().prefetch_related("attribute_values__attribute")
+        ).prefetch_related("attribute_values__attribute")
         variant_map = {v.id: v for v in variants}
+        reservation_key = data.get("reservation_key")
+        # Остаток за вычетом резервов других корзин
+        available = available_stock(variant_map.values(), exclude_key=reservation_key)
 
         # Проверяем и собираем позиции заказа
         total = 0
@@ -135,10 +199,10 @@ class CheckoutView(generics.GenericAPIView):
 
             # Проверяем остаток
             if variant:
-                if variant.stock < qty:
+                if available[variant.pk] < qty:
                     errors.append(
                         f"Недостаточно товара '{product.name}' на складе. "
-                        f"Доступно: {variant.stock}, запрошено: {qty}"
+                        f"Доступно: {available[variant.pk]}, запрошено: {qty}"
                     )
                     continue
                 unit_price = variant.get_price()
@@ -160,10 +224,7 @@ class CheckoutView(generics.GenericAPIView):
             })
 
         if errors:
-            return Response(
-                {"detail": errors[0], "errors": errors},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+            return None, errors
 
         # Расчёт скидки
         discount = calc_discount(total, coupon)
@@ -193,36 +254,211 @@ class CheckoutView(generics.GenericAPIView):
             grand_total=grand_total,
         )
 
-        # Создаём позиции и списываем остатки
+        # Создаём позиции одним запросом (снапшот - из уже загруженных данных)
+        order_items = []
         for item_data in order_items_data:
-            OrderItem.objects.create(
-                order=order,
-                product=item_data["product"],
-                variant=item_data["variant"],
-                qty=item_data["qty"],
-                unit_price=item_data["unit_price"],
-                line_total=item_data["line_total"],
-            )
+            order_item = OrderItem(order=order, **item_data)
+            order_item.fill_snapshot()
+            order_items.append(order_item)
+        OrderItem.objects.bulk_create(order_items)
+
+        journal_stock_changes(
+            [(i["product"], i["variant"], -i["qty"]) for i in order_items_data],
+            reason=f"order:{order.id}",
+        )
+
+        # Письмо ставится в очередь в той же транзакции, что и заказ
+        send_order_confirmation(order)
 
-            # Списываем остаток с вариации
+        # Списываем остатки последними: блокировки строк вариаций
+        # держатся только до конца транзакции. Резерв корзины снимается
+        # вместе со списанием
+        stock_qty = defaultdict(int)
+        sales_qty = defaultdict(int)
+        for item_data in order_items_data:
             if item_data["variant"]:
-                ProductVariant.objects.filter(pk=item_data["variant"].pk).update(
-                    stock=F("stock") - item_data["qty"]
-                )
-                # Увеличиваем счётчик продаж товара
-                Product.objects.filter(pk=item_data["product"].pk).update(
-                    sales_count=F("sales_count") + item_data["qty"]
+                stock_qty[item_data["variant"].pk] += item_data["qty"]
+                sales_qty[item_data["product"].pk] += item_data["qty"]
+
+        claim_stock(stock_qty, reservation_key=reservation_key)
+
+        # Увеличиваем счётчики продаж товаров
+        if sales_qty:
+            Product.objects.filter(pk__in=sales_qty).update(
+                sales_count=Case(
+                    *[When(pk=pk, then=F("sales_count") + qty) for pk, qty in sales_qty.items()],
+                    output_field=PositiveIntegerField(),
                 )
+            )
 
         logger.info(f"Order #{order.id} created for {data['email']}, total: {grand_total}")
 
-        # Отправляем email подтверждения
-        send_order_confirmation(order)
+        return order, None
 
-        return Response(
-            OrderSerializer(order, context={"request": request}).data,
-            status=status.HTTP_201_CREATED
-        )
+
+class ReserveView(generics.GenericAPIView):
+    """
+    Резерв остатков под корзину на STOCK_RESERVATION_TTL секунд.
+
+    Повторный запрос с тем же reservation_key заменяет резерв
+    и продлевает его срок, пустой список items снимает резерв.
+    Ключ передаётся в checkout, где резерв превращается в списание.
+    """
+    permission_classes = [permissions.AllowAny]
+    serializer_class = ReserveSerializer
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        key = data.get("reservation_key")
+
+        if not data["items"]:
+            if key:
+                StockReservation.objects.filter(key=key).delete()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        quantities = defaultdict(int)
+        for item in data["items"]:
+            quantities[item["variant_id"]] += item["qty"]
+
+        user = request.user if request.user.is_authenticated else None
+        try:
+            with transaction.atomic():
+                key, expires_at = reserve_stock(quantities, key=key, user=user)
+        except InsufficientStock as e:
+            error = stock_error_message(e, key)
+            return Response(
+                {"detail": error, "errors": [error]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({
+            "reservation_key": key,
+            "expires_at": expires_at,
+            "items": [
+                {"variant_id": variant_id, "qty": qty}
+                for variant_id, qty in quantities.items()
+            ],
+        }, status=status.HTTP_201_CREATED)
+
+
+class QuoteView(generics.GenericAPIView):
+    """
+    Пересчёт корзины: текущие цены, суммы позиций, доступный остаток,
+    скидка по купону и итог.
+
+    Ничего не блокирует и не сохраняет: товары и вариации загружаются
+    одним запросом каждые, поэтому корзина и страница оформления могут
+    обновляться так часто, как нужно. Остаток окончательно проверяется
+    при оформлении заказа.
+    """
+    permission_classes = [permissions.AllowAny]
+    serializer_class = QuoteSerializer
+
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        product_ids = {item["product_id"] for item in data["items"]}
+        variant_ids = {item["variant_id"] for item in data["items"] if item.get("variant_id")}
+
+        product_map = Product.objects.filter(
+            id__in=product_ids, is_active=True
+        ).annotate(
+            has_active_variants=Exists(
+                ProductVariant.objects.filter(product=OuterRef("pk"), is_active=True)
+            )
+        ).only("id", "name", "slug", "sku", "price", "old_price").in_bulk()
+        variant_map = ProductVariant.objects.filter(
+            id__in=variant_ids, is_active=True
+        ).only("id", "product_id", "sku", "price", "old_price", "stock").in_bulk()
+        available = available_stock(variant_map.values(), exclude_key=data.get("reservation_key"))
+
+        # Одна вариация может встречаться в корзине несколько раз
+        requested = defaultdict(int)
+        for item in data["items"]:
+            if item.get("variant_id"):
+                requested[item["variant_id"]] += item["qty"]
+
+        total = 0
+        lines = []
+        for item in data["items"]:
+            line = self._quote_line(item, product_map, variant_map, available, requested)
+            if line["error"] is None:
+                total += line["line_total"]
+            lines.append(line)
+
+        coupon = None
+        coupon_code = (data.get("coupon_code") or "").strip()
+        if coupon_code:
+            coupon = Coupon.objects.filter(code__iexact=coupon_code, is_active=True).first()
+        discount = max(0, min(calc_discount(total, coupon), total))
+
+        # Стоимость доставки (пока 0, как при оформлении заказа)
+        shipping_cost = 0
+
+        return Response({
+            "items": lines,
+            "valid": all(line["error"] is None for line in lines),
+            "coupon": {
+                "code": coupon.code if coupon else coupon_code,
+                "valid": bool(discount),
+            } if coupon_code else None,
+            "total": total,
+            "discount_total": discount,
+            "shipping_cost": shipping_cost,
+            "grand_total": total - discount + shipping_cost,
+        })
+
+    def _quote_line(self, item, product_map, variant_map, available, requested):
+        """Позиция корзины по текущим данным; error - причина, по которой её нельзя заказать"""
+        qty = item["qty"]
+        variant_id = item.get("variant_id")
+        line = {
+            "product_id": item["product_id"],
+            "variant_id": variant_id,
+            "qty": qty,
+            "name": "",
+            "sku": "",
+            "unit_price": None,
+            "old_price": None,
+            "line_total": 0,
+            "available": 0,
+            "error": None,
+        }
+
+        product = product_map.get(item["product_id"])
+        if not product:
+            line["error"] = "Товар не найден"
+            return line
+        line["name"] = product.name
+
+        if variant_id:
+            variant = variant_map.get(variant_id)
+            if not variant or variant.product_id != product.id:
+                line["error"] = "Вариация не найдена"
+                return line
+            variant.product = product
+            line["sku"] = variant.sku
+            line["unit_price"] = variant.get_price()
+            line["old_price"] = variant.get_old_price()
+            line["available"] = available[variant.pk]
+        else:
+            if product.has_active_variants:
+                line["error"] = "Необходимо выбрать вариацию"
+                return line
+            line["sku"] = product.sku
+            line["unit_price"] = product.price
+            line["old_price"] = product.old_price
+            # У товара без вариаций остаток не учитывается, как и при оформлении
+            line["available"] = None
+
+        line["line_total"] = line["unit_price"] * qty
+        if variant_id and line["available"] < requested[variant_id]:
+            line["error"] = f"Доступно: {line['available']}, запрошено: {requested[variant_id]}"
+        return line
 
 
 class CouponValidateView(APIView):
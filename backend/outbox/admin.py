@@ -0,0 +1,23 @@
+from unfold.admin import ModelAdmin
+from django.contrib import admin, messages
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(ModelAdmin):
+    list_display = ("subject", "kind", "status", "attempts", "created_at", "sent_at")
+    list_filter = ("status", "kind")
+    search_fields = ("subject", "to")
+    readonly_fields = ("created_at", "sent_at", "last_error")
+    actions = ["requeue"]
+
+    @admin.action(description="Вернуть в очередь")
+    def requeue(self, request, queryset):
+        updated = queryset.exclude(status=OutboxEmail.STATUS_SENT).update(
+            status=OutboxEmail.STATUS_PENDING,
+            attempts=0,
+            next_attempt_at=timezone.now(),
+        )
+        self.message_user(request, f"Возвращено в очередь: {updated}", messages.SUCCESS)
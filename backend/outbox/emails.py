@@ -0,0 +1,144 @@
+"""
+Очередь исходящих писем (transactional outbox).
+
+Вместо отправки по SMTP внутри запроса письмо сохраняется в OutboxEmail
+в текущей транзакции: если транзакция откатится, письмо не уйдёт,
+а медленный почтовый сервер не задерживает ответ и не держит блокировки.
+Очередь разбирает команда run_outbox.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+logger = logging.getLogger("emails")
+
+MAX_ATTEMPTS = 6
+RETRY_DELAY = 60  # секунд, удваивается с каждой попыткой
+
+
+def enqueue_email(message: EmailMessage, kind: str = "") -> OutboxEmail:
+    """
+    Ставит письмо в очередь на отправку.
+
+    Запись идёт в savepoint: если вызывающий код перехватит ошибку вставки
+    (письмо не должно ломать заказ), его транзакция останется рабочей.
+    """
+    email = _outbox_email(message, kind)
+    with transaction.atomic():
+        email.save()
+    return email
+
+
+def enqueue_emails(messages, kind: str = "") -> list:
+    """Ставит пачку писем в очередь одним INSERT (в savepoint, как enqueue_email)"""
+    with transaction.atomic():
+        return OutboxEmail.objects.bulk_create([_outbox_email(m, kind) for m in messages])
+
+
+def _outbox_email(message: EmailMessage, kind: str) -> OutboxEmail:
+    html_body = ""
+    for content, mimetype in getattr(message, "alternatives", []):
+        if mimetype == "text/html":
+            html_body = content
+
+    return OutboxEmail(
+        kind=kind,
+        subject=message.subject,
+        body=message.body,
+        html_body=html_body,
+        from_email=message.from_email or "",
+        to=list(message.to),
+        reply_to=list(message.reply_to),
+    )
+
+
+def build_message(email: OutboxEmail, connection=None) -> EmailMultiAlternatives:
+    msg = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email or settings.DEFAULT_FROM_EMAIL,
+        to=email.to,
+        reply_to=email.reply_to or None,
+        connection=connection,
+    )
+    if email.html_body:
+        msg.attach_alternative(email.html_body, "text/html")
+    return msg
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Пауза перед следующей попыткой: 1, 2, 4, 8... минут"""
+    return timedelta(seconds=RETRY_DELAY * 2 ** max(0, attempts - 1))
+
+
+def send_pending(batch_size: int = 50) -> dict:
+    """
+    Отправляет очередную пачку писем через одно SMTP-соединение.
+    Письма блокируются (SKIP LOCKED), поэтому можно запускать несколько обработчиков.
+
+    Returns:
+        Статистика: sent, failed, dead
+    """
+    stats = {"sent": 0, "failed": 0, "dead": 0}
+
+    with transaction.atomic():
+        emails = list(
+            OutboxEmail.objects
+            .filter(status=OutboxEmail.STATUS_PENDING, next_attempt_at__lte=timezone.now())
+            .select_for_update(skip_locked=True)
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        if not emails:
+            return stats
+
+        connection = get_connection(fail_silently=False)
+        sent_ids = []
+        try:
+            for email in emails:
+                try:
+                    # Соединение открывается один раз на пачку (повторно - после ошибки)
+                    connection.open()
+                    build_message(email, connection).send(fail_silently=False)
+                except Exception as e:
+                    _mark_failed(email, e, stats)
+                    # После ошибки соединение может быть в неизвестном состоянии
+                    connection.close()
+                    continue
+                sent_ids.append(email.pk)
+        finally:
+            connection.close()
+
+        if sent_ids:
+            OutboxEmail.objects.filter(pk__in=sent_ids).update(
+                status=OutboxEmail.STATUS_SENT,
+                sent_at=timezone.now(),
+                last_error="",
+            )
+            stats["sent"] = len(sent_ids)
+
+    return stats
+
+
+def _mark_failed(email: OutboxEmail, error: Exception, stats: dict):
+    attempts = email.attempts + 1
+    if attempts >= MAX_ATTEMPTS:
+        status = OutboxEmail.STATUS_DEAD
+        stats["dead"] += 1
+        logger.error("Email #%s to %s moved to dead letters: %s", email.pk, email.to, error)
+    else:
+        status = OutboxEmail.STATUS_PENDING
+        stats["failed"] += 1
+        logger.warning("Email #%s to %s failed (attempt %s): %s", email.pk, email.to, attempts, error)
+
+    OutboxEmail.objects.filter(pk=email.pk).update(
+        status=status,
+        attempts=attempts,
+        next_attempt_at=timezone.now() + retry_delay(attempts),
+        last_error=str(error),
+    )
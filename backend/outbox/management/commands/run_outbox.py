@@ -0,0 +1,70 @@
+"""
+Отправка писем из очереди OutboxEmail.
+
+Письма отправляются пачками через одно SMTP-соединение. При ошибке письмо
+получает паузу перед повтором (1, 2, 4... минут), после MAX_ATTEMPTS попыток
+помечается как неотправленное (можно вернуть в очередь из админки).
+
+Использование:
+    python manage.py run_outbox
+    python manage.py run_outbox --loop --interval 10
+
+Опции:
+    --loop          Работать постоянно, проверяя очередь
+    --interval N    Пауза между проверками очереди в секундах
+    --batch-size N  Количество писем за одно соединение
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from outbox.emails import send_pending
+
+
+class Command(BaseCommand):
+    help = 'Отправка писем из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Работать постоянно, проверяя очередь',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=10,
+            help='Пауза между проверками очереди в секундах (по умолчанию 10)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Количество писем за одно соединение (по умолчанию 50)',
+        )
+
+    def handle(self, *args, **options):
+        total = {'sent': 0, 'failed': 0, 'dead': 0}
+        batch_size = max(1, options['batch_size'])
+
+        while True:
+            stats = send_pending(batch_size)
+            for key, value in stats.items():
+                total[key] += value
+
+            if any(stats.values()):
+                self.stdout.write(
+                    f'Отправлено: {stats["sent"]}, ошибок: {stats["failed"]}, '
+                    f'не отправлено: {stats["dead"]}'
+                )
+            # Полная пачка - сразу берём следующую
+            if stats['sent'] + stats['failed'] + stats['dead'] >= batch_size:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Итого отправлено: {total["sent"]}, ошибок: {total["failed"]}, '
+            f'не отправлено: {total["dead"]}'
+        ))
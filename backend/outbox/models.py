@@ -0,0 +1,46 @@
+from django.db import models
+from django.utils import timezone
+
+
+class OutboxEmail(models.Model):
+    """
+    Письмо в очереди на отправку.
+    Создаётся в той же транзакции, что и заказ/запись/токен,
+    отправляется командой run_outbox.
+    """
+    STATUS_PENDING = "pending"
+    STATUS_SENT = "sent"
+    STATUS_DEAD = "dead"
+
+    STATUSES = [
+        (STATUS_PENDING, "Ожидает отправки"),
+        (STATUS_SENT, "Отправлено"),
+        (STATUS_DEAD, "Не отправлено"),
+    ]
+
+    kind = models.CharField("Тип письма", max_length=50, blank=True)
+    subject = models.CharField("Тема", max_length=255)
+    body = models.TextField("Текст")
+    html_body = models.TextField("HTML", blank=True)
+    from_email = models.CharField("Отправитель", max_length=255, blank=True)
+    to = models.JSONField("Получатели", default=list)
+    reply_to = models.JSONField("Адрес для ответа", default=list, blank=True)
+
+    status = models.CharField("Статус", max_length=10, choices=STATUSES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField("Попыток отправки", default=0)
+    next_attempt_at = models.DateTimeField("Следующая попытка", default=timezone.now)
+    last_error = models.TextField("Последняя ошибка", blank=True)
+
+    created_at = models.DateTimeField("Дата создания", auto_now_add=True)
+    sent_at = models.DateTimeField("Дата отправки", null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Письмо"
+        verbose_name_plural = "Очередь писем"
+        ordering = ("-created_at",)
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)}"
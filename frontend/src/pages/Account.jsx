@@ -8,6 +8,7 @@ export default function Account() {
   const [orders, setOrders] = useState([]);
   const [loading, setLoading] = useState(false);
   const [ordersLoading, setOrdersLoading] = useState(false);
+  const [ordersNext, setOrdersNext] = useState(null);
   const [editing, setEditing] = useState(false);
   const [formData, setFormData] = useState({
     first_name: "",
@@ -41,7 +42,8 @@ export default function Account() {
           last_name: meResp.data.last_name || "",
           phone: meResp.data.phone || "",
         });
-        setOrders(ordersResp.data);
+        setOrders(ordersResp.data.results);
+        setOrdersNext(ordersResp.data.next);
       } catch (err) {
         console.error("Error fetching account data:", err);
       } finally {
@@ -52,6 +54,21 @@ export default function Account() {
     fetchData();
   }, [loggedIn]);
 
+  // Следующая страница истории заказов (курсорная пагинация)
+  const loadMoreOrders = async () => {
+    if (!ordersNext) return;
+    setOrdersLoading(true);
+    try {
+      const resp = await api.get(ordersNext);
+      setOrders((prev) => [...prev, ...resp.data.results]);
+      setOrdersNext(resp.data.next);
+    } catch (err) {
+      console.error("Error fetching orders:", err);
+    } finally {
+      setOrdersLoading(false);
+    }
+  };
+
   const handleLogout = async () => {
     await apiLogout();
     navigate("/login");
@@ -136,6 +153,9 @@ export default function Account() {
   const indexOfFirstOrder = indexOfLastOrder - ordersPerPage;
   const currentOrders = filteredOrders.slice(indexOfFirstOrder, indexOfLastOrder);
   const totalPages = Math.ceil(filteredOrders.length / ordersPerPage);
+  // Пока есть более ранние страницы, общее число заказов неизвестно:
+  // поиск и счётчики относятся только к загруженным заказам
+  const loadedOrdersLabel = ordersNext ? `${orders.length}+` : `${orders.length}`;
 
   // Обработчик изменения страницы
   const handlePageChange = (pageNumber) => {
@@ -467,8 +487,8 @@ export default function Account() {
               <div className="flex items-center justify-between mb-4 flex-wrap gap-2">
                 <div className="text-lg font-bold m-0" style={{ color: 'var(--text)' }}>
                   История заказов {filteredOrders.length !== orders.length ?
-                    `(${filteredOrders.length} из ${orders.length})` :
-                    `(${orders.length})`}
+                    `(${filteredOrders.length} из ${loadedOrdersLabel})` :
+                    `(${loadedOrdersLabel})`}
                 </div>
 
                 {orders.length > 0 && (
@@ -531,7 +551,9 @@ export default function Account() {
                     <path d="M21 21l-6-6m2-5a7 7 0 11-14 0 7 7 0 0114 0z"></path>
                   </svg>
                   <p className="m-0 mb-5 text-[15px]" style={{ color: 'var(--muted)' }}>
-                    По вашему запросу заказов не найдено
+                    {ordersNext
+                      ? "Среди загруженных заказов по вашему запросу ничего не найдено"
+                      : "По вашему запросу заказов не найдено"}
                   </p>
                   <button
                     onClick={() => {
@@ -543,6 +565,17 @@ export default function Account() {
                   >
                     Сбросить поиск
                   </button>
+                  {ordersNext && (
+                    <button
+                      type="button"
+                      onClick={loadMoreOrders}
+                      disabled={ordersLoading}
+                      className="inline-flex items-center justify-center ml-3 py-3 px-4.5 bg-transparent border border-[var(--border)] rounded-[10px] text-sm font-semibold cursor-pointer transition-all duration-200 hover:bg-[var(--bg)] disabled:opacity-60"
+                      style={{ color: 'var(--text)' }}
+                    >
+                      {ordersLoading ? "Загрузка..." : "Загрузить более ранние заказы"}
+                    </button>
+                  )}
                 </div>
               ) : (
                 <>
@@ -584,7 +617,23 @@ export default function Account() {
 
                   {filteredOrders.length > 0 && (
                     <div className="text-sm mt-4 pt-4 border-t text-center" style={{ borderColor: 'var(--border)', color: 'var(--muted)' }}>
-                      Показано {Math.min(indexOfLastOrder, filteredOrders.length)} из {filteredOrders.length} заказов
+                      {ordersNext
+                        ? `Показано ${Math.min(indexOfLastOrder, filteredOrders.length)} из загруженных заказов`
+                        : `Показано ${Math.min(indexOfLastOrder, filteredOrders.length)} из ${filteredOrders.length} заказов`}
+                    </div>
+                  )}
+
+                  {ordersNext && (
+                    <div className="mt-4 text-center">
+                      <button
+                        type="button"
+                        onClick={loadMoreOrders}
+                        disabled={ordersLoading}
+                        className="py-2 px-4 rounded-lg border text-sm font-medium transition-all duration-200 hover:border-[var(--primary)] disabled:opacity-60"
+                        style={{ background: 'var(--bg)', borderColor: 'var(--border)', color: 'var(--text)' }}
+                      >
+                        {ordersLoading ? "Загрузка..." : "Загрузить более ранние заказы"}
+                      </button>
                     </div>
                   )}
                 </>
@@ -1,21 +1,21 @@
-import { useMemo, useState } from "react";
+import { useEffect, useState } from "react";
 import { api } from "../api.js";
 
-function toIsoWithLocalTz(datetimeLocalValue) {
-  // datetimeLocalValue: "2026-01-16T14:00"
-  // Превращаем в Date в локальной TZ и отдаём ISO со смещением
-  if (!datetimeLocalValue) return "";
-  const d = new Date(datetimeLocalValue);
-  if (Number.isNaN(d.getTime())) return "";
-
-  // ISO всегда в UTC (Z). Если вашему бекенду нужно именно "+01:00",
-  // то можно отправлять Z — обычно это правильно.
-  return d.toISOString();
+function formatDay(date) {
+  // date: "2026-01-16"
+  return new Date(`${date}T00:00:00`).toLocaleDateString("ru-RU", {
+    weekday: "short",
+    day: "numeric",
+    month: "long",
+  });
 }
 
 export default function Booking() {
   const [service_type, setType] = useState("optometrist");
-  const [desired_dt_local, setDtLocal] = useState(""); // datetime-local
+  const [days, setDays] = useState([]); // [{date, slots: [{start, specialists}]}]
+  const [day, setDay] = useState("");
+  const [desired_datetime, setSlot] = useState(""); // ISO начала слота
+  const [slotsLoading, setSlotsLoading] = useState(false);
   const [full_name, setName] = useState("");
   const [phone, setPhone] = useState("");
   const [email, setEmail] = useState("");
@@ -23,18 +23,41 @@ export default function Booking() {
 
   const [status, setStatus] = useState({ type: "", text: "" }); // type: success|error|info
   const [submitting, setSubmitting] = useState(false);
+  const [slotsVersion, setSlotsVersion] = useState(0);
 
-  const desired_datetime = useMemo(
-    () => toIsoWithLocalTz(desired_dt_local),
-    [desired_dt_local]
-  );
+  useEffect(() => {
+    let cancelled = false;
+    setSlotsLoading(true);
+    setSlot("");
+    api
+      .get("/appointments/slots/", { params: { type: service_type } })
+      .then((resp) => {
+        if (cancelled) return;
+        const loaded = resp.data.days || [];
+        setDays(loaded);
+        setDay((current) =>
+          loaded.some((d) => d.date === current) ? current : loaded[0]?.date || ""
+        );
+      })
+      .catch(() => {
+        if (!cancelled) setDays([]);
+      })
+      .finally(() => {
+        if (!cancelled) setSlotsLoading(false);
+      });
+    return () => {
+      cancelled = true;
+    };
+  }, [service_type, slotsVersion]);
+
+  const daySlots = days.find((d) => d.date === day)?.slots || [];
 
   async function submit(e) {
     e.preventDefault();
     setStatus({ type: "", text: "" });
 
-    if (!desired_dt_local) {
-      setStatus({ type: "error", text: "Выберите дату и время записи." });
+    if (!desired_datetime) {
+      setStatus({ type: "error", text: "Выберите дату и свободное время записи." });
       return;
     }
     if (!full_name.trim()) {
@@ -48,7 +71,7 @@ export default function Booking() {
 
     const payload = {
       service_type,
-      desired_datetime, // ISO (UTC)
+      desired_datetime, // начало свободного слота
       full_name: full_name.trim(),
       phone: phone.trim(),
       email: email.trim(),
@@ -63,6 +86,7 @@ export default function Booking() {
         type: "success",
         text: `Заявка создана: #${resp.data.id}, статус: ${resp.data.status}`,
       });
+      setSlotsVersion((v) => v + 1);
 
       // опционально: очищаем форму после успеха
       // setDtLocal("");
@@ -72,11 +96,17 @@ export default function Booking() {
       // setComment("");
     } catch (err) {
       // если бекенд отдаёт детали — покажем
+      const data = err?.response?.data || {};
       const detail =
-        err?.response?.data?.detail ||
-        err?.response?.data?.message ||
+        data.detail ||
+        data.message ||
+        data.desired_datetime?.[0] ||
+        data.non_field_errors?.[0] ||
         "";
 
+      // Слот могли занять, пока форма была открыта
+      if (data.desired_datetime) setSlotsVersion((v) => v + 1);
+
       setStatus({
         type: "error",
         text:
@@ -114,8 +144,7 @@ export default function Booking() {
             className="text-[15px] text-center leading-[1.7] m-0"
             style={{ color: 'var(--muted)' }}
           >
-            Выберите специалиста, дату и время. Мы создадим заявку и передадим её в CRM.
-            Формат даты отправляется автоматически — вводить ISO вручную не нужно.
+            Выберите специалиста, дату и свободное время. Мы создадим заявку и передадим её в CRM.
           </p>
         </div>
 
@@ -148,17 +177,63 @@ export default function Booking() {
                 className="text-[13px] font-semibold"
                 style={{ color: 'var(--muted)' }}
               >
-                Дата и время
+                Дата
               </span>
-              <input
+              <select
                 className="w-full py-3 px-3.5 rounded-xl border text-[15px] transition-all duration-200 focus:outline-none focus:border-[var(--primary)] focus:shadow-[0_0_0_3px_rgba(37,99,235,0.12)]"
                 style={{ background: 'var(--bg)', borderColor: 'var(--border)', color: 'var(--text)' }}
-                type="datetime-local"
-                value={desired_dt_local}
-                onChange={(e) => setDtLocal(e.target.value)}
-              />
+                value={day}
+                onChange={(e) => {
+                  setDay(e.target.value);
+                  setSlot("");
+                }}
+                disabled={slotsLoading || days.length === 0}
+              >
+                {days.length === 0 && (
+                  <option value="">{slotsLoading ? "Загружаем..." : "Нет свободных дат"}</option>
+                )}
+                {days.map((d) => (
+                  <option key={d.date} value={d.date}>
+                    {formatDay(d.date)} — свободно {d.slots.length}
+                  </option>
+                ))}
+              </select>
             </label>
 
+            <div className="flex flex-col gap-2 col-span-full">
+              <span
+                className="text-[13px] font-semibold"
+                style={{ color: 'var(--muted)' }}
+              >
+                Время
+              </span>
+              <div className="flex flex-wrap gap-2">
+                {daySlots.map((slot) => {
+                  const selected = slot.start === desired_datetime;
+                  return (
+                    <button
+                      key={slot.start}
+                      type="button"
+                      className="py-2 px-3 rounded-xl border text-[14px] font-semibold cursor-pointer transition-all duration-200"
+                      style={{
+                        background: selected ? 'var(--primary)' : 'var(--bg)',
+                        borderColor: selected ? 'var(--primary)' : 'var(--border)',
+                        color: selected ? '#fff' : 'var(--text)',
+                      }}
+                      onClick={() => setSlot(slot.start)}
+                    >
+                      {slot.start.slice(11, 16)}
+                    </button>
+                  );
+                })}
+                {!slotsLoading && day && daySlots.length === 0 && (
+                  <span className="text-[14px]" style={{ color: 'var(--muted)' }}>
+                    На этот день свободного времени нет
+                  </span>
+                )}
+              </div>
+            </div>
+
             <label className="flex flex-col gap-2 col-span-full">
               <span
                 className="text-[13px] font-semibold"